@@ -10,7 +10,7 @@ from reportlab.lib import colors
 import tempfile, os
 from datetime import datetime, timedelta
 import gspread
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
+from gspread_dataframe import set_with_dataframe
 from reportlab.lib.enums import TA_CENTER
 from reportlab.platypus import Paragraph, Spacer, PageBreak
 from reportlab.platypus import KeepInFrame
@@ -21,13 +21,26 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from reportlab.platypus import KeepInFrame
 import json
+from pdf_cache import pdf_cache, pdf_cache_key
+from line_grid import GRID_EDITOR_THRESHOLD, apply_changes, grid_changes, grid_frame, same_lines
+from line_import import IMPORT_EXTENSIONS, IMPORT_MAX_LINES, import_lines, iter_rows
+from pricing import DEFAULT_VAT_RATE, MAX_ITEM_DISCOUNT, format_money, money, price_quotation
+from quotation import LineItem, as_line_items, line_item_dicts, quotation_hash
+from catalog import PLACEHOLDER, Catalog, catalog_revision, normalize_catalog
+from catalog_search import catalog_search_index
+from catalog_store import catalog_store
+from catalog_sync import catalog_sync
+from history_journal import HISTORY_ROW_HEADER, history_journal
+from history_store import history_store, sheet_record
+from local_sheet import LocalWorksheet
+from image_cache import (get_thumbnail_bytes, prefetch_images, prepare_page_background,
+                         thumbnail_cache, thumbnail_index)
 
 # ========== Page Config ==========
 st.set_page_config(page_title="Quotation Builder", page_icon="🪑", layout="wide")
 
 
 
-MAX_ITEM_DISCOUNT = 20.0
 MAX_OVERALL_DISCOUNT = 20.0
 QUOTE_VALIDITY_DAYS = 10
 def initialize_quotation_state():
@@ -354,38 +367,33 @@ def show_password_reset_form():
                     st.error("❌ Failed to update password. Please try again.")
 
 
-def load_user_history(user_email, sheet):
-    """Load user's quotation history from Google Sheet"""
-    if sheet is None:
-        return []
+def load_user_history_from_sheet(user_email, sheet):
+    """Load user's quotation history from the local history index and journal, synced from the Google Sheet"""
+    history = history_journal.user_history(user_email, sheet)
+    if history_store.last_error:
+        st.warning(f"⚠️ Could not sync history from Google Sheet, showing the last synced copy: "
+                   f"{history_store.last_error}")
+    return history
+
+def save_history_row(row):
+    """Save a quotation row to the local history journal; it is copied to the Google Sheet in the background"""
+    history_sheet = get_history_sheet()
     try:
-        df = get_as_dataframe(sheet)
-        df.dropna(how='all', inplace=True)  # Remove empty rows
-        # Filter by user email
-        user_rows = df[df["User Email"].str.lower() == user_email.lower()]
-        history = []
-        import json
-        for _, row in user_rows.iterrows():
-            try:
-                items = json.loads(row["Items JSON"])
-                history.append({
-                    "user_email": row["User Email"],
-                    "timestamp": row["Timestamp"],
-                    "company_name": row["Company Name"],
-                    "contact_phone": row["Contact Phone"],
-                    "contact_person": row["Contact Person"],
-                    "total": float(row["Total"]),
-                    "items": items,
-                    "pdf_filename": row["PDF Filename"],
-                    "hash": row["Quotation Hash"]
-                })
-            except Exception as e:
-                # st.warning(f"⚠️ Skipping malformed row: {e}")
-                continue
-        return history
+        record = history_journal.append(row, history_sheet)
     except Exception as e:
-        st.error(f"❌ Failed to load history: {e}")
-        return []
+        record = sheet_record(row, HISTORY_ROW_HEADER)
+        if record is not None:
+            st.session_state.history.append(record)
+        st.warning(f"⚠️ Saved to this session only, could not save the quotation history: {e}")
+        return
+    # The session history is updated in place; no need to download the sheet again
+    st.session_state.history.append(record)
+    error = "no connection" if history_sheet is None else history_journal.failing()
+    if error:
+        st.warning(f"⚠️ Quotation saved. Google Sheet is unreachable right now, it will be copied there "
+                   f"automatically: {error}")
+    else:
+        st.success("✅ Quotation saved to your history!")
 
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def load_users_from_sheet():
@@ -590,37 +598,64 @@ def get_gsheet_connection():
         st.exception(e)
         return None
 
-@st.cache_data(ttl=300)
+def invalidate_catalog():
+    """Make the next catalog load go back to the sheet (manual refresh, admin edits)"""
+    catalog_sync.invalidate()
+    catalog_store.invalidate()
+
+# Short TTL: the local store decides when to go back to the sheet, this only bounds how
+# long a session keeps its copy after a background refresh lands.
+@st.cache_data(ttl=30)
 def get_sheet_data(_sheet):
-    """Cached sheet data retrieval"""
+    """Catalog from the local store, refreshed from the sheet by the incremental sync"""
     if _sheet is None:
         return None
     try:
-        df = get_as_dataframe(_sheet)
-        df["Selling Price"] = df["Selling Price"].astype(str).str.replace("EGP", "", regex=False).str.replace(",", "").str.strip()
-        df["Selling Price"] = pd.to_numeric(df["Selling Price"], errors="coerce").fillna(0.0)
-        if 'CF.image url' in df.columns:
-            df['CF.image url'] = df['CF.image url'].apply(convert_google_drive_url_for_storage)
+        df = catalog_store.get(
+            lambda: (catalog_sync.refresh(_sheet, normalize=normalize_catalog), catalog_sync.revision)
+        )
+        if "catalog_revision" not in df.attrs:
+            df.attrs["catalog_revision"] = catalog_revision(df)
         return df
     except Exception as e:
         st.error(f"Error loading sheet data: {e}")
         return None
 
+# One revision at a time: every Catalog patches the shared search index to its own products
+@st.cache_resource(max_entries=1)
+def get_catalog(_df, revision):
+    """Catalog index shared by all sessions, rebuilt only when the sheet content changes"""
+    catalog = Catalog(_df, revision=revision, search_index=catalog_search_index)
+    # Pre-generate editor thumbnails in the background
+    thumbnail_index.rebuild(catalog.image_urls())
+    return catalog
+
 # ========== Image Display Functions ==========
-@st.cache_data(show_spinner=False)
 def fetch_image_bytes(url):
-    resp = requests.get(url, timeout=5)
-    resp.raise_for_status()
-    return resp.content
+    """Thumbnail bytes from the byte-bounded LRU in image_cache (memory, then disk)"""
+    img_bytes = get_thumbnail_bytes(url)
+    if img_bytes is None:
+        raise RuntimeError("Image download failed")
+    return img_bytes
 
 def display_product_image(c2, prod, image_url, width=100):
     img_url = convert_google_drive_url_for_display(image_url)
     with c2:
         if img_url:
+            # Catalog items are served from the thumbnail index built at load time
+            status, img_bytes = thumbnail_index.lookup(prod, img_url)
+            if status == "ready":
+                st.image(img_bytes, caption=prod, width=100)
+                return
+            if status == "failed":
+                st.error("❌ Image Error")
+                return
+            if status == "pending":
+                st.info("⏳ Loading image...")
+                return
             try:
                 img_bytes = fetch_image_bytes(img_url)
-                img = PILImage.open(BytesIO(img_bytes))
-                st.image(img, caption=prod, width=100)
+                st.image(img_bytes, caption=prod, width=100)
             except Exception as e:
                 st.error("❌ Image Error")
                 st.caption(str(e))
@@ -641,6 +676,228 @@ def display_admin_preview(image_url, caption="Image Preview"):
     else:
         st.info("📷 Enter an image URL above to see preview")
 
+def widget_default(key, value):
+    """`value=` for a keyed widget, left out when session state already holds the key
+
+    The grid editor, the line import and the history page set qty_/disc_ and
+    grid_editor directly; passing value= as well makes Streamlit warn and
+    the two values can disagree.
+    """
+    return {} if key in st.session_state else {"value": value}
+
+def render_line_grid(catalog):
+    """Catalog lines of the quotation edited in a single grid; returns their LineItems.
+
+    Rows typed at the bottom of the grid (product name or SKU, plus optional
+    quantity, price, discount and description) are added in bulk. Uses the
+    same session state as the row editor (selected_products, qty_/disc_ keys,
+    price_edits, description_edits), so the two can be switched freely.
+    """
+    state = st.session_state
+    # One picker adds products instead of one picker per row
+    p1, p2, p3 = st.columns([3.0, 5.0, 1.2])
+    query = p1.text_input("", key="grid_search", placeholder="🔍 Name, SKU or description",
+                          label_visibility="collapsed")
+    matches, match_count = catalog.search(query)
+    pick = p2.selectbox("", [PLACEHOLDER] + matches, key="grid_pick", label_visibility="collapsed")
+    if match_count > len(matches):
+        p2.caption(f"Showing {len(matches)} of {match_count} matches, type to narrow")
+    if p3.button("➕ Add", key="grid_add", use_container_width=True) and pick != PLACEHOLDER:
+        idx = max(state.row_indices, default=-1) + 1
+        state.row_indices.append(idx)
+        state.selected_products[f"prod_{idx}"] = pick
+
+    def current_lines():
+        lines = []
+        for idx in state.row_indices:
+            prod = state.selected_products.get(f"prod_{idx}", PLACEHOLDER)
+            if prod == PLACEHOLDER:
+                continue
+            if prod not in state.description_edits:
+                state.description_edits[prod] = catalog.get(prod, "description")
+            if prod not in state.price_edits:
+                state.price_edits[prod] = catalog.price(prod)
+            # Re-assigned so the values outlive the row editor's widgets
+            state[f"qty_{idx}"] = state.get(f"qty_{idx}", 1)
+            state[f"disc_{idx}"] = state.get(f"disc_{idx}", 0.0)
+            lines.append({
+                "idx": idx,
+                "item": prod,
+                "image": catalog.get(prod, "image_display"),
+                "sku": catalog.get(prod, "sku"),
+                "description": state.description_edits[prod],
+                "price": float(state.price_edits[prod]),
+                "quantity": int(state[f"qty_{idx}"]),
+                "discount": float(state[f"disc_{idx}"]),
+            })
+        return lines
+
+    def set_line(idx, prod, cells):
+        if "Description" in cells:
+            state.description_edits[prod] = cells["Description"]
+        if "Price" in cells:
+            state.price_edits[prod] = cells["Price"]
+        if "Qty" in cells:
+            state[f"qty_{idx}"] = cells["Qty"]
+        if "Disc %" in cells:
+            state[f"disc_{idx}"] = cells["Disc %"]
+
+    def add_line(prod, cells):
+        idx = max(state.row_indices, default=-1) + 1
+        state.row_indices.append(idx)
+        state.selected_products[f"prod_{idx}"] = prod
+        set_line(idx, prod, cells)
+
+    # Apply the diff from the last edit to the editor state in one go
+    grid = state.get("line_grid")
+    changes, removed, added = {}, [], []
+    unknown, unresolved, lines_added, pending_changed = [], [], 0, False
+    # Rows typed into the grid that are not catalog products yet (shown with idx -1, -2, ...)
+    pending = [dict(cells) for cells in (grid or {}).get("pending", [])]
+    if grid is not None:
+        changes, removed, added = grid_changes(grid["frame"], state.get(f"line_grid_{grid['version']}"))
+        for idx, cells in changes.items():
+            if idx < 0:
+                pending[-1 - idx].update(cells)
+                continue
+            if "Item" in cells:
+                prod = catalog.resolve(cells["Item"])
+                if prod is None:
+                    unknown.append(cells["Item"])
+                else:
+                    state.selected_products[f"prod_{idx}"] = prod
+            set_line(idx, state.selected_products.get(f"prod_{idx}", PLACEHOLDER), cells)
+        for idx in removed:
+            if idx < 0:
+                pending[-1 - idx] = None
+                continue
+            prod = state.selected_products.pop(f"prod_{idx}", None)
+            state.row_indices.remove(idx)
+            state.price_edits.pop(prod, None)
+            state.discount_edits.pop(prod, None)
+            state.description_edits.pop(prod, None)
+        still_pending = []
+        for cells in pending:
+            if cells is None:
+                continue
+            prod = catalog.resolve(cells["Item"]) if "Item" in cells else None
+            if prod is None:
+                still_pending.append(cells)
+            else:
+                add_line(prod, cells)
+                lines_added += 1
+        pending_changed = len(still_pending) != len(pending)
+        pending = still_pending
+        for cells in added:
+            prod = catalog.resolve(cells["Item"]) if "Item" in cells else None
+            if prod is None:
+                unresolved.append(cells)   # Unknown, or still being filled in
+            else:
+                add_line(prod, cells)
+                lines_added += 1
+
+    lines = current_lines()
+    frame = grid_frame(lines, pending)
+    # Keep the grid's frame (and so the widget) unless lines were added, removed or changed elsewhere
+    if (grid is None or removed or lines_added or pending_changed
+            or not same_lines(frame, apply_changes(grid["frame"], changes))):
+        if grid is not None:
+            # A new grid widget starts without the old one's added rows; keep the unresolved ones
+            pending, unresolved = pending + unresolved, []
+            frame = grid_frame(lines, pending)
+        grid = {"version": (grid or {}).get("version", 0) + 1, "frame": frame, "pending": pending}
+        state.line_grid = grid
+    unknown += [cells["Item"] for cells in grid["pending"] + unresolved if "Item" in cells]
+    if unknown:
+        st.warning("⚠ Not found in the catalog (check the name or SKU, or delete the row): "
+                   + ", ".join(dict.fromkeys(unknown)))
+
+    st.data_editor(
+        grid["frame"],
+        key=f"line_grid_{grid['version']}",
+        hide_index=True,
+        use_container_width=True,
+        num_rows="dynamic",
+        disabled=["Image", "SKU"],
+        column_config={
+            "Image": st.column_config.ImageColumn("Image", width="small"),
+            "Item": st.column_config.TextColumn("Product / SKU", width="medium",
+                                                help="Type a product name or SKU in a new row to add it"),
+            "Description": st.column_config.TextColumn("Description", width="large"),
+            "Price": st.column_config.NumberColumn("Price per 1", min_value=0.0, format="%.2f"),
+            "Qty": st.column_config.NumberColumn("Quantity", min_value=1, step=1),
+            "Disc %": st.column_config.NumberColumn("Discount %", min_value=0.0, max_value=100.0, step=1.0),
+        },
+    )
+
+    items = []
+    for line in lines:
+        discount = line["discount"]
+        if discount > MAX_ITEM_DISCOUNT:
+            st.warning(f"⚠ Max {MAX_ITEM_DISCOUNT:g}% discount allowed for '{line['item']}'. Ignoring discount.")
+            discount = 0.0
+        items.append(LineItem(
+            line["item"],
+            quantity=line["quantity"],
+            price=line["price"],
+            discount=discount,
+            description=line["description"],
+            color=catalog.get(line["item"], "color"),
+            dimensions=catalog.get(line["item"], "dimensions"),
+            image=line["image"],
+            sku=line["sku"],
+            warranty=catalog.get(line["item"], "warranty"),
+        ))
+    return items
+
+
+def render_line_import(catalog):
+    """Add the lines of an uploaded CSV/Excel sheet (SKU and quantity per row) to the quotation.
+
+    The file is only read when the button is pressed, and all its lines are
+    added with one state update, so a tender of thousands of lines costs a
+    single rerun. Must run before the grid editor toggle, which it switches on.
+    """
+    state = st.session_state
+    with st.expander("📥 Import lines from CSV / Excel"):
+        st.caption("One line per row: SKU (or product name) and quantity, optionally price, discount % "
+                   f"and description. Headers are detected; up to {IMPORT_MAX_LINES} lines per file.")
+        version = state.get("line_import_version", 0)
+        upload = st.file_uploader("", type=list(IMPORT_EXTENSIONS), key=f"line_import_{version}",
+                                  label_visibility="collapsed")
+        if upload is None or not st.button("➕ Add lines to quotation", key="line_import_add"):
+            return
+        try:
+            result = import_lines(iter_rows(upload.getvalue(), upload.name), catalog.resolve)
+        except Exception as e:
+            st.error(f"❌ Could not read {upload.name}: {e}")
+            return
+
+        first = max(state.row_indices, default=-1) + 1
+        indices = list(range(first, first + len(result.lines)))
+        for idx, line in zip(indices, result.lines):
+            prod = line["item"]
+            state.selected_products[f"prod_{idx}"] = prod
+            state[f"qty_{idx}"] = line["quantity"]
+            state[f"disc_{idx}"] = line.get("discount", 0.0)
+            if "price" in line:
+                state.price_edits[prod] = line["price"]
+            if "description" in line:
+                state.description_edits[prod] = line["description"]
+        state.row_indices.extend(indices)
+        if len(state.row_indices) > GRID_EDITOR_THRESHOLD:
+            state.grid_editor = True
+        state.line_import_version = version + 1   # Clears the uploader
+
+        st.success(f"✅ Added {len(result.lines)} of {result.rows} lines from {upload.name}")
+        if result.truncated:
+            st.warning(f"⚠ Only the first {IMPORT_MAX_LINES} lines were imported.")
+        for title, rows in (("Not found in the catalog", result.unknown), ("Skipped", result.invalid)):
+            if rows:
+                shown = "\n".join(f"- row {number}: {text}" for number, text in rows[:20])
+                more = f"\n- ...and {len(rows) - 20} more" if len(rows) > 20 else ""
+                st.warning(f"⚠ {title} ({len(rows)}):\n{shown}{more}")
+
 
 
 # ========== Login Interface ==========
@@ -754,46 +1011,8 @@ if not st.session_state.logged_in:
                         st.session_state.username = user["username"]
                         st.session_state.role = user["role"]
 
-                        # 👉 Load quotation history from Google Sheet
-                        try:
-                            # Connect to Google Sheets
-                            creds_dict = st.secrets["gcp_service_account"]
-                            gc = gspread.service_account_from_dict(creds_dict)
-                            # Open the history spreadsheet by ID
-                            sh = gc.open_by_key("1RxKb_qj5JgXPy8bz9Fur1Jj6178fEXrP5d0W6BqwjDw")
-                            worksheet = sh.sheet1  # Assumes history is in first sheet
-
-                            # Load all data into DataFrame
-                            df = get_as_dataframe(worksheet)
-                            df.dropna(how='all', inplace=True)  # Remove completely empty rows
-
-                            # Filter by user email (case-insensitive)
-                            user_records = df[df["User Email"].str.lower() == email.lower()]
-
-                            history = []
-                            import json
-                            for _, row in user_records.iterrows():
-                                try:
-                                    items = json.loads(row["Items JSON"])
-                                    history.append({
-                                        "timestamp": row["Timestamp"],
-                                        "company_name": row["Company Name"],
-                                        "contact_phone": row["Contact Phone"],
-                                        "contact_person": row["Contact Person"],
-                                        "total": float(row["Total"]),
-                                        "items": items,
-                                        "pdf_filename": row["PDF Filename"],
-                                        "hash": row["Quotation Hash"]
-                                    })
-                                except Exception as e:
-                                    # st.warning(f"⚠️ Skipping malformed row in history: {e}")
-                                    continue
-
-                            # Save to session state
-                            st.session_state.history = history
-                        except Exception as e:
-                            st.error(f"⚠️ Could not load history: {e}")
-                            st.session_state.history = []  # Fallback: empty history
+                        # 👉 Load quotation history (indexed by user, synced from the Google Sheet)
+                        st.session_state.history = load_user_history_from_sheet(email, get_history_sheet())
 
                         st.success(f"✅ Welcome back, {user['username']}!")
                         time.sleep(1)
@@ -849,6 +1068,34 @@ if not st.session_state.logged_in:
 # ========== Logout & History Sidebar ==========
 st.sidebar.success(f"Logged in as: {st.session_state.user_email} ({st.session_state.role})")
 
+if st.session_state.role == "admin":
+    cache_stats = thumbnail_cache.stats()
+    index_stats = thumbnail_index.stats()
+    st.sidebar.caption(
+        f"🖼 Thumbnail cache: {cache_stats['entries']} images, "
+        f"{cache_stats['bytes'] / 1024 / 1024:.1f}/{cache_stats['max_bytes'] / 1024 / 1024:.0f} MB · "
+        f"hits {cache_stats['hits']} · misses {cache_stats['misses']} · evictions {cache_stats['evictions']}"
+    )
+    st.sidebar.caption(
+        f"🗂 Thumbnail index: {index_stats['ready']} ready · "
+        f"{index_stats['pending']} pending · {index_stats['failed']} failed"
+    )
+    store_stats = catalog_store.stats()
+    if store_stats["source"]:
+        synced = datetime.fromtimestamp(store_stats["synced_at"]).strftime("%H:%M:%S")
+        st.sidebar.caption(
+            f"💾 Catalog store: {store_stats['rows']} rows from {store_stats['source']} · synced {synced}"
+            + (" · refreshing" if store_stats["refreshing"] else "")
+            + (f" · last error: {store_stats['error']}" if store_stats["error"] else "")
+        )
+    sync_stats = catalog_sync.stats()
+    if sync_stats.get("mode"):
+        st.sidebar.caption(
+            f"🔁 Catalog sync: {sync_stats['mode']} · {sync_stats['rows']} rows · "
+            f"{sync_stats['rows_fetched']} fetched · {sync_stats['rows_parsed']} parsed · "
+            f"{sync_stats['seconds'] * 1000:.0f} ms"
+        )
+
 # 📜 History Button (Visible to all logged-in users)
 if st.session_state.role in ["buyer", "admin"]:
     if st.sidebar.button("📜 Quotation History"):
@@ -865,12 +1112,14 @@ st.title("🧾 Price Generator")
 
 # Refresh button
 if st.button("🔄 Refresh Sheet Data"):
+    invalidate_catalog()
     st.cache_data.clear()
     st.cache_resource.clear()
     st.rerun()
 
 # ========== Get Sheet Data ==========
-sheet = get_gsheet_connection()
+local_sheet_path = os.environ.get("CATALOG_LOCAL_SHEET")
+sheet = LocalWorksheet(local_sheet_path) if local_sheet_path else get_gsheet_connection()
 if sheet is None:
     st.error("Cannot connect to Google Sheets")
     st.stop()
@@ -882,6 +1131,7 @@ required_columns = ['Item Name', 'Selling Price']
 if not all(col in df.columns for col in required_columns):
     st.error(f"❌ Required columns {required_columns} not found in the sheet.")
     st.stop()
+catalog = get_catalog(df, df.attrs.get("catalog_revision") or catalog_revision(df))
 
 
 
@@ -962,6 +1212,7 @@ if st.session_state.role == "admin":
                             
                             try:
                                 set_with_dataframe(sheet, df)
+                                invalidate_catalog()
                                 st.cache_data.clear()
                                 st.success(f"✅ '{new_item}' added successfully!")
                                 st.rerun()
@@ -1019,6 +1270,7 @@ if st.session_state.role == "admin":
                             row_index = matching_rows.index[0] + 2 
                             try:
                                 sheet.delete_rows(int(row_index))
+                                invalidate_catalog()
                                 st.cache_data.clear()
                                 st.success(f"✅ '{product_to_delete}' deleted successfully!")
                                 st.rerun()
@@ -1089,6 +1341,7 @@ if st.session_state.role == "admin":
                             
                             try:
                                 set_with_dataframe(sheet, df)
+                                invalidate_catalog()
                                 st.cache_data.clear()
                                 st.success(f"✅ '{selected_product}' updated successfully!")
                                 st.rerun()
@@ -1185,6 +1438,8 @@ if st.session_state.role == "admin":
                         st.session_state.selected_items = []
                     if 'pdf_data' in st.session_state:
                         st.session_state.pdf_data = []
+                    if 'line_grid' in st.session_state:
+                        st.session_state.line_grid["pending"] = []   # Unresolved grid rows
                     keys_to_clear = [key for key in st.session_state.keys() if 'selected_' in key or 'item_' in key or 'qty_' in key or 'disc_' in key]
                     for key in keys_to_clear:
                         del st.session_state[key]
@@ -1463,6 +1718,8 @@ elif st.session_state.role == "buyer":
                         st.session_state.selected_items = []
                     if 'pdf_data' in st.session_state:
                         st.session_state.pdf_data = []
+                    if 'line_grid' in st.session_state:
+                        st.session_state.line_grid["pending"] = []   # Unresolved grid rows
                     keys_to_clear = [key for key in st.session_state.keys() if 'selected_' in key or 'item_' in key]
                     for key in keys_to_clear:
                         del st.session_state[key]
@@ -1711,121 +1968,123 @@ if ((st.session_state.role == "buyer") or
     if 'description_edits' not in st.session_state:
         st.session_state.description_edits = {}
 
-    products = df['Item Name'].tolist()
-    price_map = dict(zip(df['Item Name'], df['Selling Price']))
-    desc_map = dict(zip(df['Item Name'], df.get('Sales Description', '')))
-    color_map = dict(zip(df['Item Name'], df.get('CF.Colors', '')))
-    dim_map = dict(zip(df['Item Name'], df.get('CF.Dimensions', '')))
-    image_map = dict(zip(df['Item Name'], df.get('CF.image url', ''))) if 'CF.image url' in df.columns else {}
-    Warranty_map = dict(zip(df['Item Name'], df.get('CF.Warranty', '')))
-    SKU_map = dict(zip(df['Item Name'], df.get('SKU', '')))
+    output_data = []
+    line_total_cells = []   # Filled in once the whole quotation is priced
 
-    cols = st.columns([3.0, 3.0, 1.8, 1.4, 2.5, 2.0, 2.0, 2.0, 2.0, 0.8])
-    headers = ["Product", "Description", "SKU", "Warranty", "Image", "Price per 1", "Quantity", "Discount %", "Total", "Clear"]
-    for i, header in enumerate(headers):
-        cols[i].markdown(f"**{header}**")
+    render_line_import(catalog)
 
-    output_data = []
-    total_sum = 0
-    checkDiscount = False
-    basePrice = 0.0
-    
-    for idx in st.session_state.row_indices:
-        c1, c2, c3, c4, c5, c6, c7, c8, c9, c10 = st.columns([3.0, 3.0, 1.8, 1.4, 2.5, 2.0, 2.0, 2.0, 2.0, 0.8])
+    # Long quotations are edited in one grid: a cell edit then reruns one widget, not a dozen per line
+    use_grid = st.toggle("🧮 Grid editor", key="grid_editor",
+                         **widget_default("grid_editor", len(st.session_state.row_indices) > GRID_EDITOR_THRESHOLD),
+                         help="Edit all catalog lines in one table; much faster for long quotations")
+    if use_grid:
+        output_data += render_line_grid(catalog)
+        line_total_cells += [None] * len(output_data)
+    else:
+        cols = st.columns([3.0, 3.0, 1.8, 1.4, 2.5, 2.0, 2.0, 2.0, 2.0, 0.8])
+        headers = ["Product", "Description", "SKU", "Warranty", "Image", "Price per 1", "Quantity", "Discount %", "Total", "Clear"]
+        for i, header in enumerate(headers):
+            cols[i].markdown(f"**{header}**")
+
+        for idx in st.session_state.row_indices:
+            c1, c2, c3, c4, c5, c6, c7, c8, c9, c10 = st.columns([3.0, 3.0, 1.8, 1.4, 2.5, 2.0, 2.0, 2.0, 2.0, 0.8])
         
-        prod_key = f"prod_{idx}"
-        if prod_key not in st.session_state.selected_products:
-            st.session_state.selected_products[prod_key] = "-- Select --"
-        current_selection = st.session_state.selected_products[prod_key]
-        prod = c1.selectbox("", ["-- Select --"] + products, key=prod_key, label_visibility="collapsed",
-                            index=products.index(current_selection) + 1 if current_selection in products else 0)
-        st.session_state.selected_products[prod_key] = prod
+            prod_key = f"prod_{idx}"
+            if prod_key not in st.session_state.selected_products:
+                st.session_state.selected_products[prod_key] = "-- Select --"
+            current_selection = st.session_state.selected_products[prod_key]
+            # Only the top matches for the row's search text are sent to the browser
+            query = c1.text_input("", key=f"search_{idx}", placeholder="🔍 Name, SKU or description",
+                                  label_visibility="collapsed")
+            matches, match_count = catalog.search(query)
+            options = [PLACEHOLDER]
+            if current_selection != PLACEHOLDER and current_selection not in matches:
+                options.append(current_selection)
+            options += matches
+            prod = c1.selectbox("", options, key=prod_key, label_visibility="collapsed",
+                                index=options.index(current_selection) if current_selection in options else 0)
+            if match_count > len(matches):
+                c1.caption(f"Showing {len(matches)} of {match_count} matches, type to narrow")
+            st.session_state.selected_products[prod_key] = prod
         
-        if c10.button("X", key=f"clear_{idx}"):
-            st.session_state.row_indices.remove(idx)
-            st.session_state.selected_products.pop(prod_key, None)
-            if prod in st.session_state.price_edits:
-                del st.session_state.price_edits[prod]
-            if prod in st.session_state.discount_edits:
-                del st.session_state.discount_edits[prod]
-            if prod in st.session_state.description_edits:
-                del st.session_state.description_edits[prod]
-            st.rerun()
+            if c10.button("X", key=f"clear_{idx}"):
+                st.session_state.row_indices.remove(idx)
+                st.session_state.selected_products.pop(prod_key, None)
+                if prod in st.session_state.price_edits:
+                    del st.session_state.price_edits[prod]
+                if prod in st.session_state.discount_edits:
+                    del st.session_state.discount_edits[prod]
+                if prod in st.session_state.description_edits:
+                    del st.session_state.description_edits[prod]
+                st.rerun()
         
-        if prod != "-- Select --":
-            if prod not in st.session_state.description_edits:
-                st.session_state.description_edits[prod] = desc_map.get(prod, "")
+            if prod != "-- Select --":
+                if prod not in st.session_state.description_edits:
+                    st.session_state.description_edits[prod] = catalog.get(prod, "description")
             
-            description = c2.text_area("", 
-                            value=st.session_state.description_edits[prod], 
-                            key=f"desc_{idx}",
-                            label_visibility="collapsed",
-                            height=68)
-            st.session_state.description_edits[prod] = description
+                description = c2.text_area("", 
+                                value=st.session_state.description_edits[prod], 
+                                key=f"desc_{idx}",
+                                label_visibility="collapsed",
+                                height=68)
+                st.session_state.description_edits[prod] = description
             
-            original_price = price_map[prod]
-            if prod not in st.session_state.price_edits:
-                st.session_state.price_edits[prod] = original_price
-            edited_price = c6.number_input(
-                "", 
-                min_value=0.0, 
-                value=float(st.session_state.price_edits[prod]), 
-                format="%.2f",
-                key=f"price_{idx}",
-                label_visibility="collapsed"
-            )
-            st.session_state.price_edits[prod] = edited_price
-            qty = c7.number_input(
-                "", 
-                min_value=1, 
-                value=st.session_state.get(f"qty_{idx}", 1),
-                step=1, 
-                key=f"qty_{idx}", 
-                label_visibility="collapsed"
-            )
-            discount = c8.number_input(
-                "", 
-                min_value=0.0, 
-                max_value=100.0, 
-                value=st.session_state.get(f"disc_{idx}", 0.0),
-                step=1.0, 
-                key=f"disc_{idx}", 
-                label_visibility="collapsed"
-            )
-            valid_discount = 0.0 if discount > 20 else discount
-            if discount > 20:
-                st.warning(f"⚠ Max 20% discount allowed for '{prod}'. Ignoring discount.")
-            if valid_discount > 0:
-                checkDiscount = True
-            basePrice += edited_price * qty
-            discounted_price = edited_price * (1 - valid_discount / 100)
-            line_total = discounted_price * qty
-            image_url = image_map.get(prod, "")
-            display_product_image(c5, prod, image_url)
-            c9.write(f"{line_total:.2f} EGP")
-            c3.write(f"{SKU_map.get(prod, 'N/A')}")
-            c4.write(f"{Warranty_map.get(prod, 'N/A')}")
-            output_data.append({
-                "Item": prod,
-                "Description": description,
-                "Color": color_map.get(prod, ""),
-                "Dimensions": dim_map.get(prod, ""),
-                "Image": convert_google_drive_url_for_display(image_url) if image_url else "",
-                "Quantity": qty,
-                "Price per item": edited_price,
-                "Discount %": valid_discount,
-                "Total price": line_total,
-                "SKU": SKU_map.get(prod, ""),
-                "Warranty": Warranty_map.get(prod, ""),
-            })
-            total_sum += line_total
-        else:
-            for col in [c2, c3, c4, c5, c6, c7, c8, c9]:
-                col.write("—")
+                original_price = catalog.price(prod)
+                if prod not in st.session_state.price_edits:
+                    st.session_state.price_edits[prod] = original_price
+                edited_price = c6.number_input(
+                    "", 
+                    min_value=0.0, 
+                    value=float(st.session_state.price_edits[prod]), 
+                    format="%.2f",
+                    key=f"price_{idx}",
+                    label_visibility="collapsed"
+                )
+                st.session_state.price_edits[prod] = edited_price
+                qty = c7.number_input(
+                    "", 
+                    min_value=1, 
+                    step=1, 
+                    **widget_default(f"qty_{idx}", 1),
+                    key=f"qty_{idx}", 
+                    label_visibility="collapsed"
+                )
+                discount = c8.number_input(
+                    "", 
+                    min_value=0.0, 
+                    max_value=100.0, 
+                    step=1.0, 
+                    **widget_default(f"disc_{idx}", 0.0),
+                    key=f"disc_{idx}", 
+                    label_visibility="collapsed"
+                )
+                valid_discount = 0.0 if discount > MAX_ITEM_DISCOUNT else discount
+                if discount > MAX_ITEM_DISCOUNT:
+                    st.warning(f"⚠ Max {MAX_ITEM_DISCOUNT:g}% discount allowed for '{prod}'. Ignoring discount.")
+                image_url = catalog.get(prod, "image")
+                display_product_image(c5, prod, image_url)
+                line_total_cells.append(c9.empty())
+                c3.write(f"{catalog.get(prod, 'sku', 'N/A')}")
+                c4.write(f"{catalog.get(prod, 'warranty', 'N/A')}")
+                output_data.append(LineItem(
+                    prod,
+                    quantity=qty,
+                    price=edited_price,
+                    discount=valid_discount,
+                    description=description,
+                    color=catalog.get(prod, "color"),
+                    dimensions=catalog.get(prod, "dimensions"),
+                    image=catalog.get(prod, "image_display") if image_url else "",
+                    sku=catalog.get(prod, "sku"),
+                    warranty=catalog.get(prod, "warranty"),
+                ))
+            else:
+                for col in [c2, c3, c4, c5, c6, c7, c8, c9]:
+                    col.write("—")
 
-    if st.button("➕ Add Product"):
-        st.session_state.row_indices.append(max(st.session_state.row_indices, default=-1) + 1)
-        st.rerun()
+        if st.button("➕ Add Product"):
+            st.session_state.row_indices.append(max(st.session_state.row_indices, default=-1) + 1)
+            st.rerun()
     
     # ********************************** Custom Product *************************************
     st.markdown("---")
@@ -1909,39 +2168,42 @@ if ((st.session_state.role == "buyer") or
         st.session_state.custom_products[idx]["Price per item"] = edited_price
         qty = c7.number_input("", min_value=1, value=1, step=1, key=f"custom_qty_{idx}", label_visibility="collapsed")
         discount = c8.number_input("", min_value=0.0, max_value=100.0, value=0.0, step=1.0, key=f"custom_disc_{idx}", label_visibility="collapsed")
-        valid_discount = 0.0 if discount > 20 else discount
-        if discount > 20:
-            st.warning(f"⚠ Max 20% discount allowed for '{custom_product['Item']}'. Ignoring discount.")
-        if valid_discount > 0:
-            checkDiscount = True
-        basePrice += edited_price * qty
-        discounted_price = edited_price * (1 - valid_discount / 100)
-        line_total = discounted_price * qty
-        c9.write(f"{line_total:.2f} EGP")
+        valid_discount = 0.0 if discount > MAX_ITEM_DISCOUNT else discount
+        if discount > MAX_ITEM_DISCOUNT:
+            st.warning(f"⚠ Max {MAX_ITEM_DISCOUNT:g}% discount allowed for '{custom_product['Item']}'. Ignoring discount.")
+        line_total_cells.append(c9.empty())
         if c10.button("X", key=f"custom_clear_{idx}"):
             st.session_state.custom_products.pop(idx)
             st.rerun()
 
-        output_data.append({
-            "Item": custom_product["Item"],
-            "Description": description,
-            "Color": custom_product.get("Color", ""),
-            "Dimensions": custom_product.get("Dimensions", ""),
-            "Image": convert_google_drive_url_for_display(image_url) if image_url else "",
-            "Quantity": qty,
-            "Price per item": edited_price,
-            "Discount %": valid_discount,
-            "Total price": line_total,
-            "SKU": "N/A",
-            "Warranty": custom_product.get("Warranty", ""),
-            "is_custom": True
-        })
-        total_sum += line_total
+        output_data.append(LineItem(
+            custom_product["Item"],
+            quantity=qty,
+            price=edited_price,
+            discount=valid_discount,
+            description=description,
+            color=custom_product.get("Color", ""),
+            dimensions=custom_product.get("Dimensions", ""),
+            image=convert_google_drive_url_for_display(image_url) if image_url else "",
+            sku="N/A",
+            warranty=custom_product.get("Warranty", ""),
+            is_custom=True,
+        ))
 
         st.markdown("---")
+
+    # ====== PRICING ======
+    # One pass over all lines; every total below (and in the PDFs and Zoho) comes from price_quotation
+    priced = price_quotation(output_data)
+    for item, cell, line_total in zip(output_data, line_total_cells, priced.line_totals):
+        item.total = money(line_total)
+        if cell is not None:
+            cell.write(f"{format_money(line_total)} EGP")
+    total_sum = money(priced.subtotal_after)
     final_total = total_sum
+    applied_overall_discount = 0.0
 
-    if not checkDiscount:
+    if not priced.has_item_discounts:
         overall_discount = st.number_input(
         "🧮 Overall Quotation Discount (%)",
         min_value=0.0,
@@ -1963,16 +2225,20 @@ if ((st.session_state.role == "buyer") or
                     time.sleep(1)
                     st.success("✅ AI Negotiator Approved: 17.3% Discount Activated!")
                     st.balloons()
-                    final_total = total_sum * (1 - 17.3 / 100)
                     approved_overall_discount = 17.3
+                    applied_overall_discount = approved_overall_discount
                     st.session_state.overall_discount = approved_overall_discount
-                st.markdown(f"📉 **Overall Discount Amount:** {total_sum * (approved_overall_discount/100):.2f} EGP ({approved_overall_discount:.1f}%)")
+                discounted = priced.apply(overall_discount=applied_overall_discount)
+                final_total = money(discounted.final_total)
+                st.markdown(f"📉 **Overall Discount Amount:** {format_money(discounted.overall_discount_amount)} EGP ({approved_overall_discount:.1f}%)")
             else:
                 st.warning("💡 Try clicking 'Request AI Approval' for discounts over 15%!")
         else:
             if overall_discount > 0:
-                final_total = total_sum * (1 - overall_discount / 100)
-                st.markdown(f"📉 **Overall Discount Amount:** {total_sum * (overall_discount/100):.2f} EGP ({overall_discount:.1f}%)")
+                applied_overall_discount = overall_discount
+                discounted = priced.apply(overall_discount=applied_overall_discount)
+                final_total = money(discounted.final_total)
+                st.markdown(f"📉 **Overall Discount Amount:** {format_money(discounted.overall_discount_amount)} EGP ({overall_discount:.1f}%)")
         
         if overall_discount > 0 and overall_discount <= 15.0:
             st.markdown(f"🧾 **Final Total:** {final_total:.2f} EGP")
@@ -1981,11 +2247,11 @@ if ((st.session_state.role == "buyer") or
         else:
             st.markdown(f"🧾 **Final Total:** {final_total:.2f} EGP")
     else:
-        total_discount_amount = basePrice - total_sum
+        total_discount_amount = priced.item_discount
         
         st.markdown("### 📊 Discount Summary (Item-Level)")
-        st.markdown(f"💰 **Total Before Discount:** {basePrice:.2f} EGP")
-        st.markdown(f"📉 **Total Discount Amount:** {total_discount_amount:.2f} EGP ({(total_discount_amount/basePrice*100):.1f}%)")
+        st.markdown(f"💰 **Total Before Discount:** {format_money(priced.subtotal_before)} EGP")
+        st.markdown(f"📉 **Total Discount Amount:** {format_money(total_discount_amount)} EGP ({(total_discount_amount/priced.subtotal_before*100):.1f}%)")
         st.markdown(f"🧾 **Subtotal After Discounts:** {final_total:.2f} EGP")
         st.warning("⚠ You cannot add an overall discount when individual product discounts are already applied")
 
@@ -2010,8 +2276,10 @@ if ((st.session_state.role == "buyer") or
     st.session_state.shipping_fee = shipping_fee
     st.session_state.installation_fee = installation_fee
 
-    # Calculate total with additional fees - final_total is now guaranteed to be defined
-    total_with_fees = final_total + shipping_fee + installation_fee
+    vat_rate = company_details.get("vat_rate", DEFAULT_VAT_RATE)
+    totals = priced.apply(overall_discount=applied_overall_discount, shipping_fee=shipping_fee,
+                          installation_fee=installation_fee, vat_rate=vat_rate)
+    final_total = money(totals.final_total)
 
     # Display the additional fees in the summary if they're not zero
     if shipping_fee > 0 or installation_fee > 0:
@@ -2022,9 +2290,8 @@ if ((st.session_state.role == "buyer") or
             st.markdown(f"🔧 **Installation Fee:** {installation_fee:.2f} EGP")
 
     # ====== VAT CALCULATION ======
-    vat_rate = company_details.get("vat_rate", 0.14) 
-    vat = (final_total + shipping_fee) * vat_rate
-    grand_total = final_total + shipping_fee + installation_fee + vat
+    vat = money(totals.vat)
+    grand_total = money(totals.grand_total)
 
     st.markdown("### 📊 Final Calculation")
     st.markdown(f"💰 **Subtotal:** {final_total:.2f} EGP")
@@ -2032,36 +2299,18 @@ if ((st.session_state.role == "buyer") or
         st.markdown(f"📦 **Shipping Fee:** {shipping_fee:.2f} EGP")
     if installation_fee > 0:
         st.markdown(f"🔧 **Installation Fee:** {installation_fee:.2f} EGP")
-    st.markdown(f" taxpound **VAT ({vat_rate*100:.0f}%):** {vat:.2f} EGP")
-    st.markdown(f"💵 **GRAND TOTAL:** {grand_total:.2f} EGP")
+    st.markdown(f" taxpound **VAT ({vat_rate*100:.0f}%):** {format_money(totals.vat)} EGP")
+    st.markdown(f"💵 **GRAND TOTAL:** {format_money(totals.grand_total)} EGP")
     
     if output_data:
-        st.dataframe(pd.DataFrame(output_data), use_container_width=True)
+        st.dataframe(pd.DataFrame(line_item_dicts(output_data)), use_container_width=True)
 
 # ========== PDF Generation Functions ==========
+@st.cache_resource
+def get_page_background(path):
+    """Downscaled/recompressed copy of a full-page template image, prepared once per process"""
+    return prepare_page_background(path)
 
-def download_image_for_pdf(url, max_size=(300, 300)):
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        img = PILImage.open(BytesIO(response.content)).convert("RGB")
-        img_ratio = img.width / img.height
-        max_width, max_height = max_size
-        if img.width > max_width or img.height > max_height:
-            if img_ratio > 1:
-                new_width = max_width
-                new_height = int(max_width / img_ratio)
-            else:
-                new_height = max_height
-                new_width = int(max_height * img_ratio)
-            img = img.resize((new_width, new_height), PILImage.Resampling.LANCZOS)
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        img.save(temp_file, format="PNG")
-        temp_file.close()
-        return temp_file.name
-    except Exception as e:
-        print(f"Image download/resize failed: {e}")
-        return None
 
 
 
@@ -2088,18 +2337,16 @@ def download_image_for_pdf(url, max_size=(300, 300)):
 
 
 # **************************** PDF Generations*****************************
-@st.cache_data
-def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_path="footer (1).png",
+def build_pdf_cached(data, total, company_details, hdr_path="q2.png", ftr_path="footer (1).png",
                      intro_path="FT-Quotation-Temp-financial.jpg", closure_path="FT-Quotation-Temp-2.jpg",
                      bg_path="FT Quotation Temp[1](1).jpg"):
+    """Financial quotation PDF bytes, served from the bounded PDF cache when the same quotation was built before"""
     
     def build_pdf(data, total, company_details, hdr_path, ftr_path, intro_path, closure_path, bg_path):
-        # Create temp file
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        pdf_path = tmp.name
-        tmp.close()
+        # Build into memory; the bytes go straight to the cache and the download button
+        buffer = BytesIO()
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=A3,
             topMargin=100,
             leftMargin=40,
@@ -2216,21 +2463,20 @@ def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_p
             return "" if is_empty(val) else str(val)
         def safe_float(val):
             return "" if is_empty(val) else f"{float(val):.2f}"
-        data_from_hash = data
-        has_discounts = any(float(item.get('Discount %', 0)) > 0 for item in data_from_hash)
-        # Calculate subtotals
-        subtotal_before = 0.0
-        subtotal_after = 0.0
-        for r in data_from_hash:
-            unit_price = float(r.get('Price per item', 0))
-            qty = float(r.get('Quantity', 1))
-            disc_pct = float(r.get('Discount %', 0))
-            discounted_price = unit_price * (1 - disc_pct / 100)
-            subtotal_before += unit_price * qty
-            subtotal_after += discounted_price * qty
-        discount_amount = subtotal_before - subtotal_after
-        overall_disc_amount = max(subtotal_after - total, 0.0) if abs(subtotal_after - total) > 0.01 else 0.0
-        total_after_discount = total if overall_disc_amount > 0 else subtotal_after
+        data_from_hash = as_line_items(data)
+        # Same pricing pass as the editor, so the summary matches it to the piaster
+        totals = price_quotation(
+            data_from_hash,
+            shipping_fee=float(company_details.get("shipping_fee", 0.0)),
+            installation_fee=float(company_details.get("installation_fee", 0.0)),
+            vat_rate=company_details.get("vat_rate", DEFAULT_VAT_RATE),
+            final_total=total,
+        )
+        has_discounts = totals.has_item_discounts
+        subtotal_before = totals.subtotal_before
+        discount_amount = totals.item_discount
+        overall_disc_amount = totals.overall_discount_amount
+        total_after_discount = totals.final_total
         # === Headers ===
         base_headers = ["Ser.", "Item", "Image", "SKU", "Specs", "QTY", "B.D.", "Net Price", "Total"]
         if has_discounts:
@@ -2242,37 +2488,28 @@ def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_p
         else:
             col_widths[4] += 55
         total_table_width = sum(col_widths)
-        temp_files = []
+        # === Prefetch all distinct product images in parallel ===
+        image_paths = prefetch_images(
+            [convert_google_drive_url_for_storage(r.image) for r in data_from_hash if r.image],
+            max_size=(300, 300)
+        )
         # === Estimate Paragraph Height ===
         def estimate_paragraph_height(text, style, width):
             para = Paragraph(text, style)
             used_width, used_height = para.wrap(width, 1000)
             return used_height
-        # === Build Product Row with Optimized Images ===
-        def create_product_row(r, idx):
-            img_element = Paragraph("No Image", styleN)
-            if r.get("Image"):
-                download_url = convert_google_drive_url_for_storage(r["Image"])
-                temp_img_path = download_image_for_pdf(download_url, max_size=(300, 300))
+        # === Prepare Product Rows (resolve images and measure once) ===
+        def prepare_product_row(r):
+            img_path = None
+            if r.image:
+                temp_img_path = image_paths.get(convert_google_drive_url_for_storage(r.image))
                 if temp_img_path and os.path.exists(temp_img_path):
-                    try:
-                        img = RLImage(temp_img_path)
-                        img.drawWidth = 145  # Match column width
-                        img.drawHeight = 120  # Reasonable height
-                        img.hAlign = 'CENTER'
-                        img.vAlign = 'MIDDLE'
-                        img.preserveAspectRatio = True
-                        img_component = KeepInFrame(145, 120, [img], mode='shrink')
-                        img_element = img_component
-                        temp_files.append(temp_img_path)
-                    except Exception as e:
-                        print(f"Error creating image element for {r.get('Item', 'Unknown')}: {e}")
-                        img_element = Paragraph("Image Error", styleN)
+                    img_path = temp_img_path
             # Build description with conditional Dimensions
-            desc_text = safe_str(r.get('Description'))
-            color_text = safe_str(r.get('Color'))
-            warranty_text = safe_str(r.get('Warranty'))
-            dimensions_text = safe_str(r.get('Dimensions'))
+            desc_text = safe_str(r.description)
+            color_text = safe_str(r.color)
+            warranty_text = safe_str(r.warranty)
+            dimensions_text = safe_str(r.dimensions)
            
             details_parts = [
                 f"<b>Description:</b> {desc_text}",
@@ -2283,29 +2520,46 @@ def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_p
                 details_parts.append(f"<b>Dimensions:</b> {dimensions_text}")
                
             details_text = "<br/>".join(details_parts)
-            details_para = Paragraph(details_text, desc_style)
             # Estimate the height needed for the description cell
             details_height = estimate_paragraph_height(details_text, desc_style, col_widths[4])
-            unit_price = float(r.get('Price per item', 0))
-            disc_pct = float(r.get('Discount %', 0))
-            net_price = unit_price * (1 - disc_pct / 100)
-            item_name = safe_str(r.get('Item'))
+            return img_path, details_text, details_height
+        # === Build Product Row from a prepared row ===
+        def create_product_row(r, idx, prepared):
+            img_path, details_text, details_height = prepared
+            img_element = Paragraph("No Image", styleN)
+            if img_path:
+                try:
+                    img = RLImage(img_path)
+                    img.drawWidth = 145  # Match column width
+                    img.drawHeight = 120  # Reasonable height
+                    img.hAlign = 'CENTER'
+                    img.vAlign = 'MIDDLE'
+                    img.preserveAspectRatio = True
+                    img_component = KeepInFrame(145, 120, [img], mode='shrink')
+                    img_element = img_component
+                except Exception as e:
+                    print(f"Error creating image element for {r.item}: {e}")
+                    img_element = Paragraph("Image Error", styleN)
+            details_para = Paragraph(details_text, desc_style)
+            unit_price = format_money(totals.prices[idx - 1])
+            net_price = format_money(totals.unit_net[idx - 1])
+            item_name = safe_str(r.item)
             if len(item_name) > 35:
                 item_name = item_name[:35] + "..."
             row = [
                 str(idx),
                 Paragraph(item_name, styleN),
                 img_element,
-                Paragraph(safe_str(r.get('SKU')).upper(), styleN),
+                Paragraph(safe_str(r.sku).upper(), styleN),
                 details_para,
-                Paragraph(safe_str(r.get('Quantity')), styleN),
-                Paragraph(f"{unit_price:.2f}", styleN),
-                Paragraph(f"{net_price:.2f}", styleN),
+                Paragraph(safe_str(r.quantity), styleN),
+                Paragraph(unit_price, styleN),
+                Paragraph(net_price, styleN),
             ]
             if has_discounts:
-                discount_val = safe_float(r.get('Discount %'))
+                discount_val = safe_float(r.discount)
                 row.insert(8, Paragraph(f"{discount_val}%", styleN))
-            row.append(Paragraph(safe_float(r.get('Total price')), styleN))
+            row.append(Paragraph(format_money(totals.line_totals[idx - 1]), styleN))
             return row, details_height
         # === Calculate maximum rows per page based on available space ===
         page_height = A3[1]
@@ -2331,35 +2585,35 @@ def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_p
                 max_rows = 1  # Try to fit at least one row if possible
             return min(max_rows, 8)
         # === Build Summary Table Data ===
-        vat_rate = company_details.get("vat_rate", 0.14)
-        shipping_fee = float(company_details.get("shipping_fee", 0.0))
-        installation_fee = float(company_details.get("installation_fee", 0.0))
-        vat = (shipping_fee + total_after_discount) * vat_rate
-        grand_total = total_after_discount + shipping_fee + installation_fee + vat
+        vat_rate = totals.vat_rate
+        shipping_fee = totals.shipping_fee
+        installation_fee = totals.installation_fee
+        vat = totals.vat
+        grand_total = totals.grand_total
         summary_data = []
         has_any_discount = (discount_amount > 0 or overall_disc_amount > 0)
         if has_any_discount:
-            summary_data.append(["Subtotal Before Discounts", f"{subtotal_before:.2f} EGP"])
+            summary_data.append(["Subtotal Before Discounts", f"{format_money(subtotal_before)} EGP"])
             if discount_amount > 0:
-                summary_data.append(["Special Discount", f"- {discount_amount:.2f} EGP"])
+                summary_data.append(["Special Discount", f"- {format_money(discount_amount)} EGP"])
             if overall_disc_amount > 0:
-                summary_data.append(["Overall Discount", f"- {overall_disc_amount:.2f} EGP"])
-            summary_data.append(["Total After Discounts", f"{total_after_discount:.2f} EGP"])
+                summary_data.append(["Overall Discount", f"- {format_money(overall_disc_amount)} EGP"])
+            summary_data.append(["Total After Discounts", f"{format_money(total_after_discount)} EGP"])
         else:
-            summary_data.append(["Total", f"{total_after_discount:.2f} EGP"])
+            summary_data.append(["Total", f"{format_money(total_after_discount)} EGP"])
         if shipping_fee > 0:
-            summary_data.append(["Shipping Fee", f"{shipping_fee:.2f} EGP"])
+            summary_data.append(["Shipping Fee", f"{format_money(shipping_fee)} EGP"])
         if installation_fee > 0:
-            summary_data.append(["Installation Fee", f"{installation_fee:.2f} EGP"])
-        summary_data.append([f"VAT ({int(vat_rate * 100)}%)", f"{vat:.2f} EGP"])
-        summary_data.append(["Grand Total", f"{grand_total:.2f} EGP"])
+            summary_data.append(["Installation Fee", f"{format_money(installation_fee)} EGP"])
+        summary_data.append([f"VAT ({int(vat_rate * 100)}%)", f"{format_money(vat)} EGP"])
+        summary_data.append(["Grand Total", f"{format_money(grand_total)} EGP"])
         # Split products into chunks with dynamic row heights
         product_chunks = []
         remaining_products = data_from_hash[:]
         row_heights = []
-        # Pre-calculate row heights for all products
-        for idx, r in enumerate(data_from_hash, start=1):
-            _, details_height = create_product_row(r, idx)
+        # Pre-calculate row heights for all products (single download/measure pass)
+        prepared_rows = [prepare_product_row(r) for r in data_from_hash]
+        for _, _, details_height in prepared_rows:
             dynamic_height = max(details_height + 20, 120)
             row_heights.append(dynamic_height)
         current_idx = 0
@@ -2382,7 +2636,7 @@ def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_p
             chunk_row_heights = [header_height]  # First row = header
             chunk_idx_start = sum(len(c[0]) for c in product_chunks[:chunk_idx]) + 1
             for local_idx, r in enumerate(chunk, start=chunk_idx_start):
-                row, details_height = create_product_row(r, local_idx)
+                row, details_height = create_product_row(r, local_idx, prepared_rows[local_idx - 1])
                 chunk_table_data.append(row)
                 # Use max to ensure minimum readability
                 actual_row_height = max(details_height + 20, 120)  # +20 for padding, min 120
@@ -2467,26 +2721,24 @@ def build_pdf_cached(data_hash, total, company_details, hdr_path="q2.png", ftr_p
         except Exception as e:
             print(f"PDF build failed: {e}")
             raise
-        finally:
-            for temp_file in temp_files:
-                try:
-                    if os.path.exists(temp_file):
-                        os.unlink(temp_file)
-                except Exception as e:
-                    print(f"Failed to delete temp file: {e}")
-        return pdf_path
-    st.session_state.pdf_data = st.session_state.get('pdf_data', [])
-    return build_pdf(st.session_state.pdf_data, total, company_details, hdr_path, ftr_path,
-                     intro_path, closure_path, bg_path)
+        return buffer.getvalue()
+    assets = (hdr_path, ftr_path, intro_path, closure_path, bg_path)
+    cache_key = pdf_cache_key("financial", data, total, company_details, assets)
+    pdf_bytes = pdf_cache.get(cache_key)
+    if pdf_bytes is None:
+        intro_path, closure_path, bg_path = (get_page_background(p) for p in (intro_path, closure_path, bg_path))
+        pdf_bytes = build_pdf(data, total, company_details, hdr_path, ftr_path,
+                              intro_path, closure_path, bg_path)
+        pdf_cache.put(cache_key, pdf_bytes)
+    return pdf_bytes
 
 # #################### technical offer###################
-@st.cache_data
-def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png", ftr_path="footer (1).png", 
+def build_pdf_cached_tech(data, total, company_details, hdr_path="q2.png", ftr_path="footer (1).png", 
                          intro_path="FT-Quotation-Temp-1.jpg", closure_path="FT-Quotation-Temp-2.jpg",
                          bg_path="FT Quotation Temp[1](1).jpg"):
+    """Technical offer PDF bytes, served from the bounded PDF cache when the same quotation was built before"""
     
     def build_pdf(data, total, company_details, hdr_path, ftr_path, intro_path, closure_path, bg_path):
-        import tempfile
         from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle, Flowable
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import A3
@@ -2496,13 +2748,11 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
         import pandas as pd
         import re
 
-        # Create temp file
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        pdf_path = tmp.name
-        tmp.close()
+        # Build into memory; the bytes go straight to the cache and the download button
+        buffer = BytesIO()
 
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=A3,
             topMargin=100,
             leftMargin=40,
@@ -2584,56 +2834,14 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
             else:
                 return url
 
-        def download_image_for_pdf(url, max_size=(300, 300)):
-            """Download and resize image for PDF inclusion"""
-            try:
-                import requests
-                from PIL import Image as PILImage
-                from io import BytesIO
-                import tempfile
-                
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                img = PILImage.open(BytesIO(response.content)).convert("RGB")
-                img_ratio = img.width / img.height
-                max_width, max_height = max_size
-                
-                if img.width > max_width or img.height > max_height:
-                    if img_ratio > 1:
-                        new_width = max_width
-                        new_height = int(max_width / img_ratio)
-                    else:
-                        new_height = max_height
-                        new_width = int(max_height * img_ratio)
-                    img = img.resize((new_width, new_height), PILImage.Resampling.LANCZOS)
-                
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-                img.save(temp_file, format="PNG")
-                temp_file.close()
-                return temp_file.name
-            except Exception as e:
-                print(f"Image download/resize failed: {e}")
-                return None
-
-        data_from_hash = data
-        has_discounts = any(float(item.get('Discount %', 0)) > 0 for item in data_from_hash)
-
-        # Calculate subtotals
-        subtotal_before = 0.0
-        subtotal_after = 0.0
-        for r in data_from_hash:
-            unit_price = float(r.get('Price per item', 0))
-            qty = float(r.get('Quantity', 1))
-            disc_pct = float(r.get('Discount %', 0))
-            discounted_price = unit_price * (1 - disc_pct / 100)
-            subtotal_before += unit_price * qty
-            subtotal_after += discounted_price * qty
-
-        discount_amount = subtotal_before - subtotal_after
-        overall_disc_amount = max(subtotal_after - total, 0.0) if abs(subtotal_after - total) > 0.01 else 0.0
-        total_after_discount = total if overall_disc_amount > 0 else subtotal_after
+        data_from_hash = as_line_items(data)
+        totals = price_quotation(data_from_hash, final_total=total)
 
-        temp_files = []
+        # Prefetch all distinct product images in parallel before layout starts
+        image_paths = prefetch_images(
+            [convert_google_drive_url_for_storage(r.image) for r in data_from_hash if r.image],
+            max_size=(300, 300)
+        )
 
         # Define styles for product pages
         product_name_style = ParagraphStyle(
@@ -2728,15 +2936,14 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
                 elems.append(PageBreak())
 
             # Product Overview with Image side by side, including name and details
-            description = r.get('Description', 'No description available.')
+            description = r.description or 'No description available.'
             overview_title = Paragraph("Product Overview", overview_title_style)
             overview_para = Paragraph(description, overview_text_style)
 
             # Create image with proper error handling
             img_element = Paragraph("No Image", styles['Normal'])
-            if r.get("Image"):
-                download_url = convert_google_drive_url_for_storage(r["Image"])
-                temp_img_path = download_image_for_pdf(download_url, max_size=(300, 300)) 
+            if r.image:
+                temp_img_path = image_paths.get(convert_google_drive_url_for_storage(r.image))
                 if temp_img_path and os.path.exists(temp_img_path):
                     try:
                         # Create a custom flowable with rounded border
@@ -2766,7 +2973,6 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
                                 img.drawOn(self.canv, 4, 4)
                         
                         img_element = BorderedImage(temp_img_path)
-                        temp_files.append(temp_img_path)
                     except Exception as e:
                         print(f"Error creating bordered image: {e}")
                         # Fallback to regular image without border
@@ -2811,10 +3017,10 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
             ]))
 
             # Product Name
-            product_name_para = Paragraph(safe_str(r.get('Item', 'Product Name')), product_name_style)
+            product_name_para = Paragraph(safe_str(r.item), product_name_style)
 
             # Category and Warranty with bold labels
-            cat_warr_text = f"<b>Category:</b> Reception & Seating<br/><b>Warranty:</b> {safe_str(r.get('Warranty', '2 Years'))}"
+            cat_warr_text = f"<b>Category:</b> Reception & Seating<br/><b>Warranty:</b> {safe_str(r.warranty or '2 Years')}"
             cat_warr_para = Paragraph(cat_warr_text, cat_warr_style)
 
             # Right column content: flakeekeke image, hr, spacer, name, cat_warr, overview title, overview
@@ -2953,18 +3159,14 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
             warranty_label = Paragraph("Warranty", bar_label_style)
             total_bar_width = 300
             warranty_years = 0  # Default to 0
-            if r.get('Warranty') is not None:
-                warranty_value = r['Warranty']
+            if r.warranty:
                 try:
-                    if isinstance(warranty_value, (int, float)):
-                        warranty_years = float(warranty_value)
-                    elif isinstance(warranty_value, str):
-                        # Extract numeric part from strings like "1year", "1 Year", "1 yrs"
-                        match = re.match(r'(\d+\.?\d*)\s*(?:year|yrs)?', safe_str(warranty_value), re.IGNORECASE)
-                        warranty_years = float(match.group(1)) if match else 0
-                    print(f"Parsed warranty_years: {warranty_years} for product {r.get('Item', 'Unknown')}")
+                    # Extract numeric part from strings like "1year", "1 Year", "1 yrs"
+                    match = re.match(r'(\d+\.?\d*)\s*(?:year|yrs)?', r.warranty, re.IGNORECASE)
+                    warranty_years = float(match.group(1)) if match else 0
+                    print(f"Parsed warranty_years: {warranty_years} for product {r.item}")
                 except Exception as e:
-                    print(f"Error parsing warranty for product {r.get('Item', 'Unknown')}: {e}")
+                    print(f"Error parsing warranty for product {r.item}: {e}")
                     warranty_years = 0
 
             # Ensure filled_width is positive and not exceeding total_bar_width
@@ -3089,9 +3291,9 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
             elems.append(Spacer(1, 24))
 
             # Bottom price, quantity, total boxes
-            price_text = f"Price<br/>{safe_float(r.get('Price per item', 0))} LE"
-            quantity_text = f"Quantity<br/>{safe_str(r.get('Quantity', ''))}"
-            total_text = f"Total<br/>{safe_float(r.get('Total price', 0))} LE"
+            price_text = f"Price<br/>{safe_float(r.price)} LE"
+            quantity_text = f"Quantity<br/>{safe_str(r.quantity)}"
+            total_text = f"Total<br/>{format_money(totals.line_totals[idx - 1])} LE"
             bottom_data = [[Paragraph(price_text, bottom_box_style),
                             Paragraph(quantity_text, bottom_box_style),
                             Paragraph(total_text, bottom_box_style)]]
@@ -3117,213 +3319,132 @@ def build_pdf_cached_tech(data_hash, total, company_details, hdr_path="q2.png",
         except Exception as e:
             print(f"PDF build failed: {e}")
             raise
-        finally:
-            for temp_file in temp_files:
-                try:
-                    os.unlink(temp_file)
-                except Exception as e:
-                    print(f"Failed to delete temp file: {e}")
-
-        return pdf_path
 
-    # Ensure data is in session state
-    import streamlit as st
-    st.session_state.pdf_data = st.session_state.get('pdf_data', [])
+        return buffer.getvalue()
 
-    # Pass the actual data
-    return build_pdf(st.session_state.pdf_data, total, company_details, hdr_path, ftr_path, 
-                    intro_path, closure_path, bg_path)
+    assets = (hdr_path, ftr_path, intro_path, closure_path, bg_path)
+    cache_key = pdf_cache_key("technical", data, total, company_details, assets)
+    pdf_bytes = pdf_cache.get(cache_key)
+    if pdf_bytes is None:
+        intro_path, closure_path, bg_path = (get_page_background(p) for p in (intro_path, closure_path, bg_path))
+        pdf_bytes = build_pdf(data, total, company_details, hdr_path, ftr_path, 
+                              intro_path, closure_path, bg_path)
+        pdf_cache.put(cache_key, pdf_bytes)
+    return pdf_bytes
 
 
 
-def load_user_history_from_sheet(user_email, sheet):
-    """Load user's quotation history from Google Sheet with fallbacks"""
-    if sheet is None:
-        return []
-    try:
-        df = get_as_dataframe(sheet)
-        df.dropna(how='all', inplace=True)  # Remove completely empty rows
-        user_rows = df[df["User Email"].str.lower() == user_email.lower()]
-        history = []
-        import json
-        for _, row in user_rows.iterrows():
-            try:
-                items = json.loads(row["Items JSON"])
-                overall_discount = 0.0
-                if "Overall Discount" in df.columns:
-                    val = row.get("Overall Discount", 0.0)
-                    try:
-                        overall_discount = float(val) if not pd.isna(val) else 0.0
-                    except:
-                        overall_discount = 0.0
-                company_details_raw = row.get("Company Details JSON", "{}")
-                try:
-                    company_details = json.loads(company_details_raw) if pd.notna(company_details_raw) and company_details_raw.strip() != "" else {}
-                except:
-                    company_details = {}
-
-                # 🔐 Generate fallback hash if not present
-                stored_hash = str(row.get("Quotation Hash", "")).strip()
-                if not stored_hash or stored_hash.lower() == "nan":
-                    # Create deterministic fallback hash
-                    fallback_data = f"{row['Company Name']}{row['Timestamp']}{row['Total']}"
-                    stored_hash = hashlib.md5(fallback_data.encode()).hexdigest()
-
-                history.append({
-                    "user_email": row["User Email"],
-                    "timestamp": row["Timestamp"],
-                    "company_name": row["Company Name"],
-                    "contact_phone": row["Contact Phone"],
-                    "contact_person": row["Contact Person"],
-                    "total": float(row["Total"]),
-                    "items": items,
-                    "pdf_filename": row["PDF Filename"],
-                    "hash": stored_hash,  # Always ensure this exists
-                    "company_details": company_details,
-                    "overall_discount": overall_discount
-                })
-            except Exception as e:
-                # st.warning(f"⚠️ Skipping malformed row (Company: {row.get('Company Name', 'Unknown')}): {e}")
-                continue
-        return history
-    except Exception as e:
-        st.error(f"❌ Failed to load history: {e}")
-        return []
-
-
 # Before generating PDF
 
 if st.button("📅 Generate Financial Quotation") and output_data:
     with st.spinner("Generating PDF and saving to cloud history..."):
         st.session_state.pdf_data = output_data
-        data_str = str(output_data) + str(final_total) + str(company_details)
-        data_hash = hashlib.md5(data_str.encode()).hexdigest()
         pdf_filename = f"{company_details['company_name']}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
         company_details = st.session_state.company_details.copy()
         company_details["shipping_fee"] = st.session_state.shipping_fee
         company_details["installation_fee"] = st.session_state.installation_fee
+        data_hash = quotation_hash(output_data, final_total, company_details, kind="financial")
         
-        pdf_file = build_pdf_cached(data_hash, final_total, company_details)
-
-        # 👉 Prepare record
-        new_record = {
-            "user_email": st.session_state.user_email,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "company_name": company_details["company_name"],
-            "contact_person": company_details["contact_person"],
-            "total": round(final_total, 2),
-            "items": output_data.copy(),
-            "pdf_filename": pdf_filename,
-            "quotation_hash": data_hash
-        }
-
-        # 👉 Save to session state
-        st.session_state.history.append(new_record)
+        pdf_bytes = build_pdf_cached(output_data, final_total, company_details)
 
-        # 👉 Save to Google Sheet
-        history_sheet = get_history_sheet()
-        if history_sheet:
-            try:
-                import json
-                row = [
-                    new_record["user_email"],
-                    new_record["timestamp"],
-                    new_record["company_name"],
-                    new_record["contact_person"],
-                    new_record["total"],
-                    json.dumps(new_record["items"]),
-                    new_record["pdf_filename"],
-                    new_record["quotation_hash"],
-                    json.dumps(company_details)
-                ]
-                row.append(st.session_state.get("overall_discount", 0.0))
-                history_sheet.append_row(row)
-                st.success("✅ Quotation saved to session and Google Sheet!")
-            except Exception as e:
-                st.warning(f"⚠️ Saved locally, but failed to save to Google Sheet: {e}")
-        else:
-            st.warning("⚠️ Could not connect to Google Sheet. Quotation saved locally only.")
-        history_sheet = get_history_sheet()
-        if history_sheet:
-            st.session_state.history = load_user_history_from_sheet(st.session_state.user_email, history_sheet)
-            st.success("✅ History refreshed from Google Sheet!")
+        # 👉 Skip saving if this exact quotation is already in the history
+        already_saved = any(
+            str(q.get("hash", q.get("quotation_hash", ""))) == data_hash
+            for q in st.session_state.history
+        )
+        if already_saved:
+            st.info("ℹ️ This quotation is already in your history.")
         else:
-            st.error("Failed to connect to Google Sheets.")
+            # 👉 Prepare record
+            new_record = {
+                "user_email": st.session_state.user_email,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "company_name": company_details["company_name"],
+                "contact_person": company_details["contact_person"],
+                "total": round(final_total, 2),
+                "items": line_item_dicts(output_data),
+                "pdf_filename": pdf_filename,
+                "quotation_hash": data_hash
+            }
+
+            # 👉 Save to session state and the history journal (copied to Google Sheet in the background)
+            import json
+            row = [
+                new_record["user_email"],
+                new_record["timestamp"],
+                new_record["company_name"],
+                new_record["contact_person"],
+                new_record["total"],
+                json.dumps(new_record["items"]),
+                new_record["pdf_filename"],
+                new_record["quotation_hash"],
+                json.dumps(company_details)
+            ]
+            row.append(st.session_state.get("overall_discount", 0.0))
+            save_history_row(row)
         # Offer download
-        with open(pdf_file, "rb") as f:
-            st.download_button(
-                label="⬇ Click to Download PDF",
-                data=f,
-                file_name=pdf_filename,
-                mime="application/pdf",
-                key=f"download_pdf_{data_hash}"
-            )
+        st.download_button(
+            label="⬇ Click to Download PDF",
+            data=pdf_bytes,
+            file_name=pdf_filename,
+            mime="application/pdf",
+            key=f"download_pdf_{data_hash}"
+        )
 
 if st.button("📅 Generate technical Quotation ") and output_data:
     with st.spinner("Generating PDF and saving to cloud history..."):
         st.session_state.pdf_data = output_data
-        data_str = str(output_data) + str(final_total) + str(company_details)
-        data_hash = hashlib.md5(data_str.encode()).hexdigest()
         pdf_filename = f"{company_details['company_name']}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
         company_details = st.session_state.company_details.copy()
         company_details["shipping_fee"] = st.session_state.shipping_fee
         company_details["installation_fee"] = st.session_state.installation_fee
+        data_hash = quotation_hash(output_data, final_total, company_details, kind="technical")
         
-        pdf_file = build_pdf_cached_tech(data_hash, final_total, company_details)
-
-        # 👉 Prepare record
-        new_record = {
-            "user_email": st.session_state.user_email,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "company_name": company_details["company_name"],
-            "contact_person": company_details["contact_person"],
-            "total": round(final_total, 2),
-            "items": output_data.copy(),
-            "pdf_filename": pdf_filename,
-            "quotation_hash": data_hash
-        }
-
-        # 👉 Save to session state
-        st.session_state.history.append(new_record)
+        pdf_bytes = build_pdf_cached_tech(output_data, final_total, company_details)
 
-        # 👉 Save to Google Sheet
-        history_sheet = get_history_sheet()
-        if history_sheet:
-            try:
-                import json
-                row = [
-                    new_record["user_email"],
-                    new_record["timestamp"],
-                    new_record["company_name"],
-                    new_record["contact_person"],
-                    new_record["total"],
-                    json.dumps(new_record["items"]),
-                    new_record["pdf_filename"],
-                    new_record["quotation_hash"],
-                    json.dumps(company_details)
-                ]
-                row.append(st.session_state.get("overall_discount", 0.0))
-                history_sheet.append_row(row)
-                st.success("✅ Quotation saved to session and Google Sheet!")
-            except Exception as e:
-                st.warning(f"⚠️ Saved locally, but failed to save to Google Sheet: {e}")
-        else:
-            st.warning("⚠️ Could not connect to Google Sheet. Quotation saved locally only.")
-        history_sheet = get_history_sheet()
-        if history_sheet:
-            st.session_state.history = load_user_history_from_sheet(st.session_state.user_email, history_sheet)
-            st.success("✅ History refreshed from Google Sheet!")
+        # 👉 Skip saving if this exact quotation is already in the history
+        already_saved = any(
+            str(q.get("hash", q.get("quotation_hash", ""))) == data_hash
+            for q in st.session_state.history
+        )
+        if already_saved:
+            st.info("ℹ️ This quotation is already in your history.")
         else:
-            st.error("Failed to connect to Google Sheets.")
+            # 👉 Prepare record
+            new_record = {
+                "user_email": st.session_state.user_email,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "company_name": company_details["company_name"],
+                "contact_person": company_details["contact_person"],
+                "total": round(final_total, 2),
+                "items": line_item_dicts(output_data),
+                "pdf_filename": pdf_filename,
+                "quotation_hash": data_hash
+            }
+
+            # 👉 Save to session state and the history journal (copied to Google Sheet in the background)
+            import json
+            row = [
+                new_record["user_email"],
+                new_record["timestamp"],
+                new_record["company_name"],
+                new_record["contact_person"],
+                new_record["total"],
+                json.dumps(new_record["items"]),
+                new_record["pdf_filename"],
+                new_record["quotation_hash"],
+                json.dumps(company_details)
+            ]
+            row.append(st.session_state.get("overall_discount", 0.0))
+            save_history_row(row)
         # Offer download
-        with open(pdf_file, "rb") as f:
-            st.download_button(
-                label="⬇ Click to Download PDF",
-                data=f,
-                file_name=pdf_filename,
-                mime="application/pdf",
-                key=f"download_pdf_{data_hash}"
-            )
+        st.download_button(
+            label="⬇ Click to Download PDF",
+            data=pdf_bytes,
+            file_name=pdf_filename,
+            mime="application/pdf",
+            key=f"download_pdf_{data_hash}"
+        )
 
 
 def create_zoho_quote(company_details, items, final_total, shipping_fee=0, installation_fee=0):
@@ -3363,29 +3484,22 @@ def create_zoho_quote(company_details, items, final_total, shipping_fee=0, insta
         st.error(f"❌ Account '{company_details['company_name']}' not found in Zoho CRM.")
         return None
 
+    items = as_line_items(items)
+    totals = price_quotation(items, shipping_fee=shipping_fee, installation_fee=installation_fee,
+                             final_total=final_total)
     product_details = []
-    for item in items:
-        sku = item.get("SKU")
-        product_id = get_zoho_product_id(sku)
+    for item, unit_price, line_discount in zip(items, totals.prices, totals.line_discounts):
+        product_id = get_zoho_product_id(item.sku)
         
         if not product_id:
-            st.warning(f"⚠️ Skipping product '{item['Item']}' (SKU: {sku}) - not found in Zoho CRM.")
-            continue
-
-        try:
-            quantity = float(item["Quantity"])
-            unit_price = float(item["Price per item"])
-            total = float(item["Total price"])
-            discount_amount = max(0, (unit_price * quantity) - total)
-        except Exception as e:
-            st.error(f"❌ Invalid data for '{item['Item']}': {e}")
+            st.warning(f"⚠️ Skipping product '{item.item}' (SKU: {item.sku}) - not found in Zoho CRM.")
             continue
 
         product_details.append({
             "product": {"id": product_id},
-            "quantity": quantity,
-            "unit_price": round(unit_price, 2),
-            "Discount": round(discount_amount, 2)
+            "quantity": float(item.quantity),
+            "unit_price": money(unit_price),
+            "Discount": money(line_discount)
         })
 
     if not product_details:
@@ -3406,8 +3520,8 @@ def create_zoho_quote(company_details, items, final_total, shipping_fee=0, insta
                 "Valid_Until": (datetime.now() + timedelta(days=10)).strftime("%Y-%m-%d"),
                 "Currency": "EGP",
                 "Exchange_Rate": 1.0,
-                "Adjustment": round(shipping_fee + installation_fee, 2),
-                "Grand_Total": round(final_total + shipping_fee + installation_fee, 2),
+                "Adjustment": money(totals.shipping_fee + totals.installation_fee),
+                "Grand_Total": money(totals.final_total + totals.shipping_fee + totals.installation_fee),
                 "Shipping_Street": street,
                 "Shipping_City": city,
                 "Shipping_Country": country,
@@ -0,0 +1,97 @@
+"""Benchmark: catalog normalisation, old per-row pipeline vs catalog.normalize_catalog.
+
+The old pipeline is the chained Selling Price string cleaning plus a per-row
+regex for Drive image links that get_sheet_data used to run; "+ text" adds
+the per-cell is_empty/safe_str clean-up the editor and PDF builders did on
+text fields, which normalize_catalog now does once per load. Run from the
+repo root:
+
+    python benchmarks/bench_catalog_normalize.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from catalog import normalize_catalog  # noqa: E402
+
+SIZES = [10_000, 100_000]
+REPEATS = 3
+PRICES = ["EGP 1,250", "3400", "1,999.50 EGP", "L.E. 12,000", "", "٢٬٥٠٠ جنيه", "750.00"]
+
+
+def make_sheet(rows, seed=3):
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        "Item Name": [f"Chair {i}" for i in range(rows)],
+        "SKU": [f"FT-{i:06d}" if i % 5 else float(i) for i in range(rows)],
+        "Selling Price": [rnd.choice(PRICES) if i % 4 else float(rnd.randint(100, 9000)) for i in range(rows)],
+        "Sales Description": [np.nan if i % 7 == 0 else "mesh back, steel base" for i in range(rows)],
+        "CF.Colors": [np.nan if i % 3 == 0 else "black" for i in range(rows)],
+        "CF.Dimensions": ["60x60x110 cm"] * rows,
+        "CF.Warranty": [np.nan if i % 2 else "2 years" for i in range(rows)],
+        "CF.image url": [
+            np.nan if i % 6 == 0 else f"https://drive.google.com/file/d/{rnd.getrandbits(64):016x}/view?usp=sharing"
+            for i in range(rows)
+        ],
+    }).astype(object)
+
+
+def legacy_storage_url(url):
+    if not url or pd.isna(url):
+        return url
+    match = re.search(r'https://drive\.google\.com/file/d/([a-zA-Z0-9_-]+)/view', url)
+    if match:
+        return f"https://drive.google.com/uc?export=download&id={match.group(1)}"
+    return url
+
+
+def legacy_normalize(df):
+    df["Selling Price"] = df["Selling Price"].astype(str).str.replace("EGP", "", regex=False).str.replace(",", "").str.strip()
+    df["Selling Price"] = pd.to_numeric(df["Selling Price"], errors="coerce").fillna(0.0)
+    df["CF.image url"] = df["CF.image url"].apply(legacy_storage_url)
+    return df
+
+
+def legacy_is_empty(val):
+    return pd.isna(val) or val is None or str(val).lower() == 'nan' or str(val).strip() == ''
+
+
+def legacy_normalize_with_text(df):
+    legacy_normalize(df)
+    for column in ("Item Name", "SKU", "Sales Description", "CF.Colors", "CF.Dimensions", "CF.Warranty"):
+        df[column] = df[column].apply(lambda v: "" if legacy_is_empty(v) else str(v))
+    return df
+
+
+def measure(fn, sheet):
+    best = float("inf")
+    for _ in range(REPEATS):
+        df = sheet.copy()
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'rows':>8} {'legacy ms':>10} {'+ text ms':>10} {'vectorised ms':>14} {'zero prices legacy/new':>24}")
+    for rows in SIZES:
+        sheet = make_sheet(rows)
+        legacy = measure(legacy_normalize, sheet)
+        legacy_text = measure(legacy_normalize_with_text, sheet)
+        vectorised = measure(normalize_catalog, sheet)
+        zero_legacy = (legacy_normalize(sheet.copy())["Selling Price"] == 0).sum()
+        zero_new = (normalize_catalog(sheet.copy())["Selling Price"] == 0).sum()
+        print(f"{rows:>8} {legacy * 1000:10.1f} {legacy_text * 1000:10.1f} {vectorised * 1000:14.1f} "
+              f"{f'{zero_legacy}/{zero_new}':>24}")
+
+
+if __name__ == "__main__":
+    main()
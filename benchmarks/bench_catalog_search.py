@@ -0,0 +1,87 @@
+"""Benchmark: catalog search index build, incremental sync and query latency.
+
+Generates a synthetic furniture catalog (50k products by default), indexes
+it with catalog_search.CatalogSearchIndex and times exact, prefix, typo,
+SKU and substring queries, plus the short and numeric ones typed on the
+way to a SKU. Run from the repo root:
+
+    python benchmarks/bench_catalog_search.py [products]
+"""
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from catalog_search import CatalogSearchIndex  # noqa: E402
+
+PRODUCTS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+CHANGED = 500
+REPEATS = 50
+QUERIES = {
+    "exact": "office chair",
+    "prefix": "exec des",
+    "typo": "ergnomic chiar",
+    "sku": "ft-01234",
+    "colour": "walnut",
+    "no match": "zzzz qqqq",
+    "substring": "chair",
+    "1 char": "1",
+    "2 digits": "12",
+    "digit+sp": "0 ",
+    "number": "123",
+}
+
+KINDS = ["chair", "desk", "table", "cabinet", "sofa", "bench", "stool", "shelf", "workstation", "drawer"]
+STYLES = ["office", "executive", "ergonomic", "meeting", "reception", "visitor", "gaming", "manager", "lounge", "modular"]
+MATERIALS = ["mesh", "leather", "fabric", "oak", "beech", "steel", "glass", "melamine", "veneer", "aluminium"]
+COLORS = ["black", "white", "grey", "walnut", "oak", "blue", "red", "beige", "cherry", "green"]
+
+
+def make_record(i, rnd):
+    style, kind, material = rnd.choice(STYLES), rnd.choice(KINDS), rnd.choice(MATERIALS)
+    return f"{style.title()} {kind.title()} {material} {i}", {
+        "name": f"{style.title()} {kind.title()} {material} {i}",
+        "sku": f"FT-{i:05d}",
+        "description": f"{material} {kind} with {rnd.choice(MATERIALS)} finish, model {rnd.randint(100, 999)}",
+        "color": f"{rnd.choice(COLORS)}/{rnd.choice(COLORS)}",
+        "dimensions": f"{rnd.randint(40, 240)}x{rnd.randint(40, 120)}x{rnd.randint(40, 120)} cm",
+    }
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main():
+    rnd = random.Random(7)
+    records = dict(make_record(i, rnd) for i in range(PRODUCTS))
+    index = CatalogSearchIndex()
+
+    start = time.perf_counter()
+    index.sync(records)
+    print(f"{PRODUCTS} products, {index.stats()['tokens']} tokens")
+    print(f"full build:        {time.perf_counter() - start:8.3f} s")
+
+    changed = dict(records)
+    for key in rnd.sample(list(records), CHANGED):
+        changed[key] = dict(changed[key], description=changed[key]["description"] + " refurbished")
+    start = time.perf_counter()
+    counts = index.sync(changed)
+    print(f"sync {CHANGED} changed: {time.perf_counter() - start:8.3f} s  (added, updated, removed) = {counts}")
+
+    print(f"\n{'query':<10} {'p50 ms':>8} {'p95 ms':>8} {'hits':>7}  top result")
+    for label, query in QUERIES.items():
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            keys, total = index.search(query, limit=50)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<10} {percentile(timings, 0.5):8.2f} {percentile(timings, 0.95):8.2f} "
+              f"{total:7d}  {keys[0] if keys else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: script rerun time of the quotation editor vs number of lines.
+
+"rows" renders each line the way the row editor does (ten columns with a
+search box, product picker, description, price/quantity/discount inputs and
+a thumbnail image); "grid" renders the same lines as one st.data_editor the
+way the grid editor does. Every edit reruns the whole script, so the time of
+one rerun is the latency of typing a quantity. Runs the scripts headless with
+Streamlit's AppTest (needs pyarrow, as st.data_editor does). Run from the
+repo root:
+
+    python benchmarks/bench_editor_rerun.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+SIZES = [5, 20, 50, 100]
+REPEATS = 5
+
+SETUP = f"""
+import io, sys
+sys.path.insert(0, {ROOT!r})
+import streamlit as st
+from PIL import Image
+
+LINES = int(st.query_params.get("lines", 10))
+
+@st.cache_resource
+def thumbnail():
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 300), (180, 120, 60)).save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+"""
+
+ROWS_SCRIPT = SETUP + """
+options = ["-- Select --"] + [f"Chair {i}" for i in range(50)]
+for idx in range(LINES):
+    c1, c2, c3, c4, c5, c6, c7, c8, c9, c10 = st.columns([3.0, 3.0, 1.8, 1.4, 2.5, 2.0, 2.0, 2.0, 2.0, 0.8])
+    c1.text_input("search", key=f"search_{idx}", label_visibility="collapsed")
+    prod = c1.selectbox("product", options, index=idx % 50 + 1, key=f"prod_{idx}", label_visibility="collapsed")
+    c10.button("X", key=f"clear_{idx}")
+    c2.text_area("description", value="mesh back, steel base", key=f"desc_{idx}",
+                 label_visibility="collapsed", height=68)
+    price = c6.number_input("price", min_value=0.0, value=1250.0, format="%.2f", key=f"price_{idx}",
+                            label_visibility="collapsed")
+    qty = c7.number_input("qty", min_value=1, value=1, step=1, key=f"qty_{idx}", label_visibility="collapsed")
+    disc = c8.number_input("disc", min_value=0.0, max_value=100.0, value=0.0, step=1.0, key=f"disc_{idx}",
+                           label_visibility="collapsed")
+    with c5:
+        st.image(thumbnail(), caption=prod, width=100)
+    c9.write(f"{price * qty * (1 - disc / 100):.2f} EGP")
+    c3.write(f"FT-{idx:05d}")
+    c4.write("2 years")
+"""
+
+GRID_SCRIPT = SETUP + """
+from line_grid import grid_frame
+
+lines = [{
+    "idx": idx, "item": f"Chair {idx % 50}", "sku": f"FT-{idx:05d}", "description": "mesh back, steel base",
+    "image": f"https://drive.google.com/thumbnail?id={idx:08d}&sz=w300-h300",
+    "price": 1250.0, "quantity": 1, "discount": 0.0,
+} for idx in range(LINES)]
+if "frame" not in st.session_state:
+    st.session_state.frame = grid_frame(lines)
+st.text_input("search", key="grid_search", label_visibility="collapsed")
+st.selectbox("product", ["-- Select --"] + [f"Chair {i}" for i in range(50)], key="grid_pick",
+             label_visibility="collapsed")
+st.button("Add", key="grid_add")
+st.data_editor(st.session_state.frame, key="line_grid_1", hide_index=True, disabled=["Image", "Item", "SKU"],
+               column_config={"Image": st.column_config.ImageColumn("Image", width="small")})
+"""
+
+
+def rerun_time(script, lines, edit=None):
+    app = AppTest.from_string(script, default_timeout=120)
+    app.query_params["lines"] = lines
+    app.run()
+    best = float("inf")
+    for i in range(REPEATS):
+        if edit:
+            edit(app, i)
+        start = time.perf_counter()
+        app.run()
+        best = min(best, time.perf_counter() - start)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return best
+
+
+def edit_quantity(app, i):
+    app.number_input(key="qty_0").set_value(i + 2)
+
+
+def main():
+    print(f"{'lines':>6} {'rows ms':>9} {'grid ms':>9} {'speed-up':>9}")
+    for lines in SIZES:
+        rows = rerun_time(ROWS_SCRIPT, lines, edit_quantity)
+        grid = rerun_time(GRID_SCRIPT, lines)
+        print(f"{lines:>6} {rows * 1000:9.1f} {grid * 1000:9.1f} {rows / grid:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark: loading one user's quotation history, whole-sheet scan vs history_store.
+
+"scan" is what login used to do: the whole sheet as a DataFrame, filtered
+by User Email, then iterrows + json.loads per matching row (the download
+itself is not timed). "index" is HistoryStore.user_history reading the
+local SQLite index, which leaves each record's JSON undecoded until it is
+used; "decoded" also reads every record's items and company details.
+"sync" is the incremental sync after one new row. The
+user always has 50 quotations while the company's total grows. Run from the
+repo root:
+
+    python benchmarks/bench_history_load.py
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from history_store import HistoryStore  # noqa: E402
+
+SIZES = [1_000, 10_000, 50_000]
+USER_ROWS = 50
+REPEATS = 5
+HEADER = ["User Email", "Timestamp", "Company Name", "Contact Person", "Total", "Items JSON", "PDF Filename",
+          "Quotation Hash", "Company Details JSON", "Overall Discount"]
+
+
+class MemoryWorksheet:
+    """Just enough of gspread.Worksheet for HistoryStore: values, tail ranges and the header."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_values(self, *args, **kwargs):
+        return [list(row) for row in self.rows]
+
+    def batch_get(self, ranges, **kwargs):
+        result = []
+        for a1 in ranges:
+            if a1 == "1:1":
+                result.append([list(self.rows[0])])
+            else:
+                first = int(a1.split(":")[0][1:])
+                result.append([list(row) for row in self.rows[first - 1:]])
+        return result
+
+
+def make_row(i, email, rnd):
+    items = [{"Item": f"Chair {rnd.randrange(500)}", "Quantity": rnd.randint(1, 20), "Price per item": 1250.0}
+             for _ in range(rnd.randint(1, 15))]
+    return [email, f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00", f"Company {i}", "Contact", 1000.0 + i,
+            json.dumps(items), f"q{i}.pdf", f"hash{i}", json.dumps({"company_name": f"Company {i}"}), 0.0]
+
+
+def make_sheet(total, seed=7):
+    rnd = random.Random(seed)
+    user_rows = set(rnd.sample(range(total), USER_ROWS))
+    return [HEADER] + [make_row(i, "me@example.com" if i in user_rows else f"user{i % 40}@example.com", rnd)
+                       for i in range(total)]
+
+
+def scan(df, email):
+    user_rows = df[df["User Email"].str.lower() == email.lower()]
+    history = []
+    for _, row in user_rows.iterrows():
+        history.append({"items": json.loads(row["Items JSON"]), "total": float(row["Total"]),
+                        "company_details": json.loads(row["Company Details JSON"])})
+    return history
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'sheet rows':>10} {'scan ms':>9} {'index ms':>9} {'decoded ms':>11} {'sync ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for total in SIZES:
+            rows = make_sheet(total)
+            df = pd.DataFrame(rows[1:], columns=HEADER)
+            sheet = MemoryWorksheet(rows)
+            store = HistoryStore(os.path.join(tmp, f"history_{total}.sqlite"), sync_seconds=0)
+            store.refresh(sheet)
+            assert len(store.user_history("me@example.com")) == len(scan(df, "me@example.com")) == USER_ROWS
+            scan_time = best_of(lambda: scan(df, "me@example.com"))
+            index_time = best_of(lambda: store.user_history("me@example.com"))
+            decoded_time = best_of(lambda: [(r.items, r.company_details) for r in store.user_history("me@example.com")])
+            rows.append(make_row(total, "me@example.com", random.Random(total)))
+            start = time.perf_counter()
+            store.refresh(sheet)
+            sync_time = time.perf_counter() - start
+            print(f"{total:>10} {scan_time * 1000:9.2f} {index_time * 1000:9.2f} {decoded_time * 1000:11.2f} "
+                  f"{sync_time * 1000:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
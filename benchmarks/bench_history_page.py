@@ -0,0 +1,67 @@
+"""Benchmark: one history page vs the whole history, as a user's quotation count grows.
+
+"all" is what the history page used to build on every rerun: every record
+plus a DataFrame of its items. "page" is HistoryStore.user_page for the
+first page and "deep page" is the last page reached through the cursors;
+both build DataFrames only for the page's records. Run from the repo root:
+
+    python benchmarks/bench_history_page.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bench_history_load import MemoryWorksheet, make_sheet  # noqa: E402
+from history_store import HISTORY_PAGE_SIZE, HistoryStore  # noqa: E402
+
+SIZES = [100, 1_000, 5_000]
+REPEATS = 5
+EMAIL = "me@example.com"
+
+
+def render_all(store):
+    return [pd.DataFrame(record["items"]) for record in store.user_history(EMAIL)]
+
+
+def render_page(store, cursor):
+    records, _ = store.user_page(EMAIL, HISTORY_PAGE_SIZE, cursor)
+    return [pd.DataFrame(record["items"]) for record in records]
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'quotations':>10} {'all ms':>9} {'page ms':>9} {'deep page ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in SIZES:
+            rows = make_sheet(count)
+            for row in rows[1:]:
+                row[0] = EMAIL
+            store = HistoryStore(os.path.join(tmp, f"history_{count}.sqlite"), sync_seconds=0)
+            store.refresh(MemoryWorksheet(rows))
+            cursor = last = None
+            while True:
+                _, cursor = store.user_page(EMAIL, HISTORY_PAGE_SIZE, cursor)
+                if cursor is None:
+                    break
+                last = cursor
+            all_time = best_of(lambda: render_all(store))
+            page_time = best_of(lambda: render_page(store, None))
+            deep_time = best_of(lambda: render_page(store, last))
+            print(f"{count:>10} {all_time * 1000:9.1f} {page_time * 1000:9.1f} {deep_time * 1000:13.1f}")
+
+
+if __name__ == "__main__":
+    main()
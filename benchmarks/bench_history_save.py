@@ -0,0 +1,102 @@
+"""Benchmark: saving a quotation to the history, sheet write + reload vs the local journal.
+
+"sheet" is what the Generate buttons used to do: append_row, then download
+the whole history sheet again and rebuild the user's history from it.
+"journal" is HistoryJournal.append (committed and fsynced locally) with the
+record added to the session history in place; the sheet write happens in
+the background. The worksheet below answers every API call after
+SHEET_LATENCY seconds, roughly a Google Sheets round trip. "calls" is how
+many append_rows requests the replicator needed for BURST quick saves. Run
+from the repo root:
+
+    python benchmarks/bench_history_save.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from history_journal import HISTORY_ROW_HEADER, HistoryJournal  # noqa: E402
+
+SIZES = [1_000, 10_000, 50_000]
+SHEET_LATENCY = 0.4
+SAVES = 5
+BURST = 50
+
+
+class SlowWorksheet:
+    """In-memory stand-in for gspread.Worksheet that waits SHEET_LATENCY on every call."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.append_calls = 0
+
+    def append_row(self, row):
+        time.sleep(SHEET_LATENCY)
+        self.rows.append(list(row))
+
+    def append_rows(self, rows):
+        time.sleep(SHEET_LATENCY)
+        self.append_calls += 1
+        self.rows.extend(list(row) for row in rows)
+
+    def get_values(self, *args, **kwargs):
+        time.sleep(SHEET_LATENCY)
+        return [list(row) for row in self.rows]
+
+
+def make_row(i, email="me@example.com"):
+    items = [{"Item": f"Chair {i % 500}", "SKU": f"FT-{i % 500:05d}", "Quantity": 2, "Price per item": 1250.0}]
+    return [email, "2025-08-01 10:00", f"Company {i}", "Contact", 1000.0 + i, json.dumps(items), f"q{i}.pdf",
+            f"hash{i}", json.dumps({"company_name": f"Company {i}"}), 0.0]
+
+
+def save_to_sheet(sheet, row):
+    sheet.append_row(row)
+    values = sheet.get_values()
+    df = pd.DataFrame(values[1:], columns=values[0])
+    user_rows = df[df["User Email"].str.lower() == row[0]]
+    return [{"items": json.loads(r["Items JSON"]), "total": float(r["Total"])} for _, r in user_rows.iterrows()]
+
+
+def wait_replicated(journal, timeout=60):
+    deadline = time.time() + timeout
+    while journal.pending_count() and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def main():
+    print(f"{'sheet rows':>10} {'sheet ms':>9} {'journal ms':>11} {'burst calls':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for total in SIZES:
+            rows = [HISTORY_ROW_HEADER] + [make_row(i, f"user{i % 40}@example.com") for i in range(total)]
+            sheet = SlowWorksheet(rows)
+            start = time.perf_counter()
+            for i in range(SAVES):
+                save_to_sheet(sheet, make_row(total + i))
+            sheet_time = (time.perf_counter() - start) / SAVES
+
+            journal = HistoryJournal(os.path.join(tmp, f"journal_{total}.sqlite"))
+            history = []
+            start = time.perf_counter()
+            for i in range(SAVES):
+                history.append(journal.append(make_row(total + SAVES + i), sheet))
+            journal_time = (time.perf_counter() - start) / SAVES
+            wait_replicated(journal)
+
+            sheet.append_calls = 0
+            for i in range(BURST):
+                journal.append(make_row(total + 2 * SAVES + i), sheet)
+            wait_replicated(journal)
+            assert len(sheet.rows) == total + 1 + 2 * SAVES + BURST
+            print(f"{total:>10} {sheet_time * 1000:9.1f} {journal_time * 1000:11.2f} "
+                  f"{sheet.append_calls:>7} / {BURST}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark: history search over 100k quotations, linear scan vs the indexed search.
+
+"scan" is the old search, a substring test on every company name, extended
+to the other fields and filters the way it would have to be: decode every
+quotation's items and test names, SKUs, dates and totals in Python. "page"
+is HistoryStore.user_page (the FTS5 index plus the date/total columns) and
+"count" the user_count shown above the results (capped at
+HISTORY_COUNT_LIMIT). One user owns all quotations, the worst
+case for a per-user query. Run from the repo root:
+
+    python benchmarks/bench_history_search.py
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bench_history_load import HEADER, MemoryWorksheet  # noqa: E402
+from history_search import parse_query  # noqa: E402
+from history_store import HISTORY_COUNT_LIMIT, HistoryStore  # noqa: E402
+
+QUOTATIONS = 100_000
+REPEATS = 5
+EMAIL = "me@example.com"
+TODAY = date(2025, 12, 31)
+QUERIES = [
+    "acme",
+    "sku:FT-00123",
+    "sku FT-00123 in q3 above 100k egp",
+    "chair contact:mona 2025-08",
+    "q3 2025 >100k",
+    "between 50k and 60k",
+]
+WORDS = ["acme", "nile", "delta", "pyramid", "cairo", "alex", "giza", "sphinx", "lotus", "horus"]
+
+
+def make_rows(count, seed=7):
+    rnd = random.Random(seed)
+    rows = [HEADER]
+    for i in range(count):
+        items = [{"Item": f"{rnd.choice(['Chair', 'Desk', 'Cabinet', 'Sofa'])} {rnd.randrange(300)}",
+                  "SKU": f"FT-{rnd.randrange(2_000):05d}", "Quantity": rnd.randint(1, 20)}
+                 for _ in range(rnd.randint(1, 12))]
+        day = date.fromordinal(date(2024, 1, 1).toordinal() + rnd.randrange(730))
+        company = f"{rnd.choice(WORDS).title()} {rnd.choice(WORDS).title()} Co {i}"
+        rows.append([EMAIL, f"{day.isoformat()} 10:00", company, rnd.choice(["Mona", "Ahmed", "Sara", "Omar"]),
+                     round(rnd.uniform(1_000, 250_000), 2), json.dumps(items), f"q{i}.pdf", f"hash{i}", "{}", 0])
+    return rows
+
+
+def scan(records, text):
+    query = parse_query(text, TODAY)
+    hits = []
+    for record in records:
+        items = json.loads(record[5])
+        fields = {"company_name": record[2].lower(), "contact_person": record[3].lower(),
+                  "item_names": " ".join(i["Item"] for i in items).lower(),
+                  "skus": " ".join(i["SKU"] for i in items).lower()}
+        if not all(any(term in fields[f] for f in ([field] if field else fields)) for field, term in query.terms):
+            continue
+        day = record[1][:10]
+        if query.date_from and day < query.date_from or query.date_to and day >= query.date_to:
+            continue
+        if query.min_total is not None and record[4] < query.min_total:
+            continue
+        if query.max_total is not None and record[4] > query.max_total:
+            continue
+        hits.append(record)
+    return hits
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rows = make_rows(QUOTATIONS)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.sqlite"), sync_seconds=0)
+        start = time.perf_counter()
+        store.refresh(MemoryWorksheet(rows))
+        print(f"indexed {QUOTATIONS} quotations in {time.perf_counter() - start:.1f} s\n")
+        print(f"{'query':<38} {'hits':>7} {'scan ms':>9} {'page ms':>9} {'count ms':>9}")
+        for text in QUERIES:
+            query = parse_query(text, TODAY)
+            hits = store.user_count(EMAIL, query)
+            assert hits == len(scan(rows[1:], text)), text
+            scan_time = best_of(lambda: scan(rows[1:], text))
+            page_time = best_of(lambda: store.user_page(EMAIL, 20, None, query))
+            count_time = best_of(lambda: store.user_count(EMAIL, query, limit=HISTORY_COUNT_LIMIT + 1))
+            print(f"{text:<38} {hits:>7} {scan_time * 1000:9.1f} {page_time * 1000:9.1f} {count_time * 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: sequential vs parallel image fetching for PDF builds.
+
+Stubs ``requests.get`` with an injected per-image latency so the numbers do
+not depend on Google Drive. Each run starts from an empty image cache. Run from the repo root:
+
+    python benchmarks/bench_image_prefetch.py
+"""
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import requests
+from PIL import Image as PILImage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_cache  # noqa: E402
+
+ITEM_COUNTS = [10, 40, 100]
+LATENCIES = [0.0, 0.05, 0.2]  # Seconds per image request
+
+_buf = BytesIO()
+PILImage.new("RGB", (1200, 900), (180, 120, 60)).save(_buf, format="JPEG")
+SAMPLE_IMAGE = _buf.getvalue()
+
+
+def make_fake_get(latency):
+    def fake_get(url, timeout=None, **kwargs):
+        time.sleep(latency)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = SAMPLE_IMAGE
+        return response
+    return fake_get
+
+
+def run_sequential(urls):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        image_cache.IMAGE_CACHE_DIR = cache_dir
+        for url in urls:
+            image_cache.download_image_for_pdf(url)
+
+
+def run_prefetch(urls):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        image_cache.IMAGE_CACHE_DIR = cache_dir
+        image_cache.prefetch_images(urls)
+
+
+def main():
+    print(f"{'items':>6} {'latency(s)':>11} {'sequential(s)':>14} {'prefetch(s)':>12} {'speedup':>8}")
+    for latency in LATENCIES:
+        image_cache.requests.get = make_fake_get(latency)
+        for count in ITEM_COUNTS:
+            urls = [f"https://drive.google.com/uc?export=download&id=item{i}" for i in range(count)]
+            start = time.perf_counter()
+            run_sequential(urls)
+            sequential = time.perf_counter() - start
+            start = time.perf_counter()
+            run_prefetch(urls)
+            parallel = time.perf_counter() - start
+            print(f"{count:>6} {latency:>11.2f} {sequential:>14.2f} {parallel:>12.2f} {sequential / parallel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark: reading and resolving a CSV of SKUs and quantities with line_import.
+
+Times iter_rows + import_lines (csv parsing, validation and one catalog
+lookup per row) against a synthetic catalog, for tender sizes up to the
+import limit. Run from the repo root:
+
+    python benchmarks/bench_line_import.py
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from catalog import Catalog, normalize_catalog  # noqa: E402
+from line_import import import_lines, iter_rows  # noqa: E402
+
+CATALOG_SIZE = 5_000
+SIZES = [100, 1_000, 5_000]
+REPEATS = 5
+
+
+def make_catalog(count):
+    return Catalog(normalize_catalog(pd.DataFrame({
+        "Item Name": [f"Chair {i}" for i in range(count)],
+        "Selling Price": [str(100 + i) for i in range(count)],
+        "SKU": [f"FT-{i:05d}" for i in range(count)],
+        "Sales Description": ["mesh back, steel base"] * count,
+    }).astype(object)))
+
+
+def make_csv(lines, seed=7):
+    rnd = random.Random(seed)
+    rows = ["SKU,Quantity,Discount %"]
+    for _ in range(lines):
+        sku = f"FT-{rnd.randrange(CATALOG_SIZE):05d}" if rnd.random() > 0.02 else "UNKNOWN"
+        rows.append(f"{sku.lower() if rnd.random() < 0.3 else sku},{rnd.randint(1, 40)},{rnd.choice([0, 0, 5, 10])}")
+    return "\n".join(rows).encode()
+
+
+def main():
+    catalog = make_catalog(CATALOG_SIZE)
+    print(f"{'lines':>6} {'import ms':>10} {'lines/s':>10} {'unknown':>8}")
+    for lines in SIZES:
+        data = make_csv(lines)
+        best = float("inf")
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            result = import_lines(iter_rows(data, "tender.csv"), catalog.resolve)
+            best = min(best, time.perf_counter() - start)
+        print(f"{lines:>6} {best * 1000:10.2f} {lines / best:10.0f} {len(result.unknown):>8}")
+
+
+if __name__ == "__main__":
+    main()
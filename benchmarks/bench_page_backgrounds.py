@@ -0,0 +1,82 @@
+"""Benchmark: PDF build time and size with original vs pre-processed page backgrounds.
+
+Builds the same cover / content / closure layout the quotation PDFs use,
+once with the original template JPGs and once with the copies produced by
+image_cache.prepare_page_background. Run from the repo root:
+
+    python benchmarks/bench_page_backgrounds.py
+"""
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A3
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+import image_cache  # noqa: E402
+
+BUILDS = 10
+CONTENT_PAGES = [1, 5, 20]
+ASSETS = {
+    "financial": ("FT-Quotation-Temp-financial.jpg", "FT-Quotation-Temp-2.jpg", "FT Quotation Temp[1](1).jpg"),
+    "technical": ("FT-Quotation-Temp-1.jpg", "FT-Quotation-Temp-2.jpg", "FT Quotation Temp[1](1).jpg"),
+}
+
+
+def build(intro_path, closure_path, bg_path, content_pages):
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A3, topMargin=100, leftMargin=40, rightMargin=70, bottomMargin=250)
+    closure_page_num = content_pages + 2
+
+    def header_footer(canvas, doc):
+        canvas.saveState()
+        page_num = canvas.getPageNumber()
+        if page_num == 1:
+            canvas.drawImage(intro_path, 0, 0, width=A3[0], height=A3[1])
+        elif page_num == closure_page_num:
+            canvas.drawImage(closure_path, 0, 0, width=A3[0], height=A3[1])
+        else:
+            canvas.drawImage(bg_path, 0, 0, width=A3[0], height=A3[1], preserveAspectRatio=True, mask='auto')
+        canvas.restoreState()
+
+    style = getSampleStyleSheet()["Normal"]
+    elems = [PageBreak()]
+    for i in range(content_pages):
+        elems.append(Paragraph(f"Content page {i + 1}", style))
+        elems.append(PageBreak())
+    elems.append(Spacer(1, 1))
+    doc.build(elems, onFirstPage=header_footer, onLaterPages=header_footer)
+    return buf.getvalue()
+
+
+def measure(paths, content_pages):
+    start = time.perf_counter()
+    for _ in range(BUILDS):
+        pdf = build(*paths, content_pages)
+    return (time.perf_counter() - start) / BUILDS, len(pdf)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        image_cache.IMAGE_CACHE_DIR = cache_dir
+        print(f"{'variant':<10} {'pages':>5} {'orig ms':>8} {'prep ms':>8} {'orig KB':>8} {'prep KB':>8}")
+        for name, paths in ASSETS.items():
+            start = time.perf_counter()
+            prepared = tuple(image_cache.prepare_page_background(p) for p in paths)
+            prep_once = time.perf_counter() - start
+            for pages in CONTENT_PAGES:
+                orig_t, orig_b = measure(paths, pages)
+                prep_t, prep_b = measure(prepared, pages)
+                print(f"{name:<10} {pages + 2:>5} {orig_t * 1000:>8.1f} {prep_t * 1000:>8.1f} "
+                      f"{orig_b / 1024:>8.0f} {prep_b / 1024:>8.0f}")
+            print(f"{name:<10} one-time preparation: {prep_once * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
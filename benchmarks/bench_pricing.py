@@ -0,0 +1,103 @@
+"""Benchmark: quotation totals, old per-line float loops vs pricing.price_quotation.
+
+The old path is the editor loop (basePrice / line_total / total_sum) plus the
+subtotal loop each PDF builder ran again over the same lines. The new path
+prices all lines once from the LineItem list; "arrays" is price_lines on
+columns that are already extracted, in exact int64 piasters, and "float
+arrays" is the same pass done with rounded float64 amounts instead. The last
+column counts lines whose float and integer totals differ. Run from the
+repo root:
+
+    python benchmarks/bench_pricing.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from pricing import line_arrays, price_lines, price_quotation, to_piasters  # noqa: E402
+from quotation import LineItem  # noqa: E402
+
+SIZES = [100, 1_000, 10_000, 100_000]
+REPEATS = 5
+
+
+def make_lines(count, seed=7):
+    rnd = random.Random(seed)
+    return [
+        LineItem(f"Chair {i}", quantity=rnd.randint(1, 40), price=rnd.randint(100, 250_000) / 100,
+                 discount=rnd.choice([0, 0, 0, 5, 10, 12.5, 25]))
+        for i in range(count)
+    ]
+
+
+def legacy_totals(lines, shipping_fee=150.0, installation_fee=300.0, vat_rate=0.14):
+    total_sum = 0
+    base_price = 0.0
+    for line in lines:
+        valid_discount = 0.0 if line.discount > 20 else line.discount
+        base_price += line.price * line.quantity
+        total_sum += line.price * (1 - valid_discount / 100) * line.quantity
+    # ...and again in build_pdf
+    subtotal_before = subtotal_after = 0.0
+    for line in lines:
+        valid_discount = 0.0 if line.discount > 20 else line.discount
+        subtotal_before += line.price * line.quantity
+        subtotal_after += line.price * (1 - valid_discount / 100) * line.quantity
+    vat = (total_sum + shipping_fee) * vat_rate
+    return total_sum + shipping_fee + installation_fee + vat
+
+
+def new_totals(lines, shipping_fee=150.0, installation_fee=300.0, vat_rate=0.14):
+    return price_quotation(lines, shipping_fee=shipping_fee, installation_fee=installation_fee,
+                           vat_rate=vat_rate).grand_total
+
+
+def float_price_lines(quantities, prices, discounts, shipping_fee=150.0, installation_fee=300.0, vat_rate=0.14):
+    """The same pass in float64, rounding every amount to 2 decimals."""
+    def round_money(values):
+        cents = np.round(np.asarray(values, dtype=np.float64) * 100, 6)
+        return np.copysign(np.floor(np.abs(cents) + 0.5), cents) / 100
+
+    discounts = np.where((discounts > 20) | ~(discounts > 0), 0.0, discounts)
+    prices = round_money(prices)
+    line_before = round_money(prices * quantities)
+    line_totals = round_money(prices * quantities * (1 - discounts / 100))
+    round_money(line_before - line_totals)
+    subtotal = float(round_money(line_totals.sum()))
+    vat = float(round_money((subtotal + shipping_fee) * vat_rate))
+    return line_totals, float(round_money(subtotal + shipping_fee + installation_fee + vat))
+
+
+def measure(fn, *args):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'lines':>8} {'legacy ms':>10} {'engine ms':>10} {'arrays ms':>10} {'float arrays ms':>16} "
+          f"{'grand total legacy/new':>28} {'float diffs':>12}")
+    for count in SIZES:
+        lines = make_lines(count)
+        columns = line_arrays(lines)
+        legacy = measure(legacy_totals, lines)
+        engine = measure(new_totals, lines)
+        arrays = measure(lambda: price_lines(*columns).apply(0, 150.0, 300.0))
+        float_arrays = measure(float_price_lines, *columns)
+        totals = f"{legacy_totals(lines):.2f}/{new_totals(lines) / 100:.2f}"
+        float_lines, _ = float_price_lines(*columns)
+        diffs = int((to_piasters(float_lines) != price_lines(*columns).line_totals).sum())
+        print(f"{count:>8} {legacy * 1000:10.2f} {engine * 1000:10.2f} {arrays * 1000:10.2f} "
+              f"{float_arrays * 1000:16.2f} {totals:>28} {diffs:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Catalog normalisation and the read-only product index built once per sheet load."""
+import hashlib
+import re
+
+import numpy as np
+import pandas as pd
+
+from catalog_search import CatalogSearchIndex
+
+PLACEHOLDER = "-- Select --"
+PICKER_PAGE_SIZE = 50   # Options sent to the browser per picker
+
+# Catalog fields handed to the search index, besides Item Name
+SEARCH_FIELDS = ("sku", "description", "color", "dimensions")
+
+# Editor field -> sheet column
+CATALOG_COLUMNS = {
+    "description": "Sales Description",
+    "color": "CF.Colors",
+    "dimensions": "CF.Dimensions",
+    "image": "CF.image url",
+    "warranty": "CF.Warranty",
+    "sku": "SKU",
+}
+
+# Text columns coerced to clean strings ("" for blanks) when the catalog is loaded
+TEXT_COLUMNS = ("Item Name", "SKU", "Sales Description", "CF.Colors", "CF.Dimensions", "CF.Warranty")
+PRICE_COLUMN = "Selling Price"
+IMAGE_COLUMN = "CF.image url"
+
+DRIVE_URL_PATTERN = r"https?://(?:drive|docs)\.google\.com/(?:file/d/|[^\s?]*\?(?:[^\s&]*&)*id=)([a-zA-Z0-9_-]+)"
+DRIVE_VIEW_PATTERN = r"https://drive\.google\.com/file/d/([a-zA-Z0-9_-]+)/view"
+DRIVE_DOWNLOAD_URL = "https://drive.google.com/uc?export=download&id="
+DRIVE_THUMBNAIL_PREFIX = "https://drive.google.com/thumbnail?id="
+DRIVE_THUMBNAIL_SUFFIX = "&sz=w300-h300"
+
+# Currency markers seen in the sheet (EGP, LE, L.E., E£, ج.م, جنيه, ...) and Arabic-Indic digits
+_CURRENCY_PATTERN = r"(?i)(?:\b(?:egp|usd|eur|l\.?e)\b\.?|[a-z]*[£$€]|ج\.?\s?م\.?|جنيه|\s)"
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹٫٬", "01234567890123456789.,")
+
+
+def regex_extract(text, pattern):
+    """First group of `pattern` matched at the start of every value ("" where it does not match).
+
+    Values are joined into one newline-separated buffer and scanned with a
+    single findall, which avoids a Python-level call per value. Patterns
+    must not match across newlines.
+    """
+    joined = "\n".join(text.tolist())
+    if joined.count("\n") == len(text) - 1:
+        found = re.findall(f"(?m)^(?:{pattern})?.*$", joined)
+        if len(found) == len(text):
+            return pd.Series(found, index=text.index, dtype=object)
+    # Empty column or a value with a newline in it
+    return text.str.extract(f"^(?:{pattern})", expand=False).fillna("")
+
+
+def clean_text(series):
+    """Strings with NaN/None as "" and whole-number floats without ".0" (e.g. numeric SKUs)."""
+    kind = pd.api.types.infer_dtype(series, skipna=True)
+    if kind in ("string", "empty"):
+        return series.fillna("").astype(object)
+    if kind in ("floating", "integer", "mixed-integer-float"):
+        numbers = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        whole = np.isfinite(numbers)
+        whole[whole] = numbers[whole] % 1 == 0
+        text = series.astype(str).where(series.notna(), "")
+        text[whole] = numbers[whole].astype(np.int64).astype(str)
+        return text
+    values = series.to_numpy(dtype=object)
+    is_float = np.fromiter((type(v) is float for v in values), dtype=bool, count=len(values))
+    text = series.astype(str).where(series.notna(), "")
+    numbers = values[is_float].astype(np.float64)
+    whole = np.isfinite(numbers)
+    whole[whole] = numbers[whole] % 1 == 0
+    positions = np.flatnonzero(is_float)[whole]
+    text.iloc[positions] = numbers[whole].astype(np.int64).astype(str)
+    return text
+
+
+def parse_prices(series):
+    """Vectorised price parsing: drops currency markers, reads Arabic-Indic digits and both
+    1,234.50 and 1.234,50 grouping; unparseable values become 0.0.
+
+    Prices repeat a lot, so the string work runs once per distinct value.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(series, errors="coerce").fillna(0.0).astype(np.float64)
+    codes, uniques = pd.factorize(series)
+    values = pd.Series(uniques, dtype=object)
+    numeric = pd.to_numeric(values, errors="coerce")
+    text = values[numeric.isna()].astype(str)
+    if not text.empty:
+        text = text.str.translate(_ARABIC_DIGITS).str.replace(_CURRENCY_PATTERN, "", regex=True)
+        last_comma, last_dot = text.str.rfind(","), text.str.rfind(".")
+        decimal_comma = (last_comma > last_dot) & (
+            (last_dot >= 0) | ~text.str.fullmatch(r"-?\d{1,3}(?:,\d{3})+")
+        )
+        text = text.where(~decimal_comma, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+        text = text.where(decimal_comma, text.str.replace(",", "", regex=False))
+        numeric[text.index] = pd.to_numeric(text, errors="coerce")
+    parsed = np.append(numeric.fillna(0.0).to_numpy(dtype=np.float64), 0.0)
+    # factorize marks NaN with -1, which picks the trailing 0.0
+    return pd.Series(parsed[codes], index=series.index)
+
+
+def drive_download_urls(series):
+    """Any Google Drive file link (view, open?id=, uc, thumbnail) as a direct download URL."""
+    text = clean_text(series).str.strip()
+    ids = regex_extract(text, DRIVE_URL_PATTERN)
+    return text.where(ids == "", DRIVE_DOWNLOAD_URL + ids)
+
+
+def drive_display_urls(series):
+    """Editor image URL: Drive view links become thumbnails, everything else is used as is."""
+    text = clean_text(series).str.strip()
+    ids = regex_extract(text, DRIVE_VIEW_PATTERN)
+    return text.where(ids == "", DRIVE_THUMBNAIL_PREFIX + ids + DRIVE_THUMBNAIL_SUFFIX)
+
+
+def normalize_catalog(df):
+    """The single cleaning pass over freshly parsed catalog rows (whole sheet or changed rows).
+
+    Prices become floats, image links direct download URLs and text columns
+    strings, so nothing downstream has to re-check for NaN or stray types.
+    """
+    if PRICE_COLUMN in df.columns:
+        df[PRICE_COLUMN] = parse_prices(df[PRICE_COLUMN])
+    for column in TEXT_COLUMNS:
+        if column in df.columns:
+            df[column] = clean_text(df[column])
+    if IMAGE_COLUMN in df.columns:
+        df[IMAGE_COLUMN] = drive_download_urls(df[IMAGE_COLUMN])
+    return df
+
+
+def catalog_revision(df):
+    """Content hash of the catalog DataFrame, used as the cache key for its index."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    digest = hashlib.blake2b(row_hashes.tobytes(), digest_size=16)
+    digest.update("|".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+class Catalog:
+    """Name -> row index over array-backed catalog columns.
+
+    Built once per catalog revision from a normalize_catalog'd frame, so each
+    rerun only pays for the rows actually selected in the editor.
+    """
+
+    def __init__(self, df, revision=None, search_index=None):
+        self.revision = revision or catalog_revision(df)
+        self.names = df["Item Name"].tolist()
+        self.prices = df["Selling Price"].to_numpy(dtype=np.float64)
+        self.columns = {}
+        for field, column in CATALOG_COLUMNS.items():
+            if column in df.columns:
+                self.columns[field] = df[column].to_numpy(dtype=object)
+        # Same semantics as dict(zip(...)): values come from the last row with a name,
+        # while iteration keeps the order of first occurrence.
+        self._rows = {name: i for i, name in enumerate(self.names)}
+        if IMAGE_COLUMN in df.columns:
+            self.columns["image_display"] = drive_display_urls(df[IMAGE_COLUMN]).to_numpy(dtype=object)
+        self._search_names = [n for n in self._rows if isinstance(n, str) and n.strip()]
+        self._lookup = None
+        # A shared index is patched in place, so only products that changed are re-indexed
+        self.search_index = search_index if search_index is not None else CatalogSearchIndex()
+        self.search_index.sync(self.search_records())
+
+    def search_records(self):
+        """{name: record} in the shape CatalogSearchIndex indexes."""
+        records = {}
+        for name in self._search_names:
+            row = self._rows[name]
+            record = {"name": name}
+            for field in SEARCH_FIELDS:
+                if field in self.columns:
+                    record[field] = self.columns[field][row]
+            records[name] = record
+        return records
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def price(self, name, default=0.0):
+        row = self._rows.get(name)
+        return default if row is None else float(self.prices[row])
+
+    def get(self, name, field, default=""):
+        """Value of `field` (a CATALOG_COLUMNS key or "image_display") for a product."""
+        row = self._rows.get(name)
+        values = self.columns.get(field)
+        if row is None or values is None:
+            return default
+        return values[row]
+
+    def resolve(self, text):
+        """Product name for a typed product name or SKU (case-insensitive), or None."""
+        text = str(text or "").strip()
+        if not text:
+            return None
+        if text in self._rows:
+            return text
+        if self._lookup is None:
+            # Exact-name matches win over SKUs, SKUs over case-insensitive names
+            lookup = {name.lower(): name for name in self._search_names}
+            skus = self.columns.get("sku")
+            if skus is not None:
+                for name, row in self._rows.items():
+                    sku = str(skus[row]).strip().lower()
+                    if sku and name:
+                        lookup[f"sku:{sku}"] = name
+            self._lookup = lookup
+        key = text.lower()
+        return self._lookup.get(f"sku:{key}") or self._lookup.get(key)
+
+    def search(self, query, limit=PICKER_PAGE_SIZE, offset=0):
+        """Product names matching `query` (typos and partial words allowed), best first.
+
+        Returns (page of names, total number of matches); an empty query pages
+        through the catalog in sheet order.
+        """
+        if not str(query or "").strip():
+            return self._search_names[offset:offset + limit], len(self._search_names)
+        names, total = self.search_index.search(query, limit=offset + limit)
+        # A run still holding the previous revision must not offer products it does not have
+        return [name for name in names[offset:] if name in self._rows], total
+
+    def image_urls(self, display=True):
+        """{name: image url} for every product, e.g. to pre-generate thumbnails."""
+        values = self.columns.get("image_display" if display else "image")
+        if values is None:
+            return {}
+        return {name: values[row] for name, row in self._rows.items() if name}
+
@@ -0,0 +1,308 @@
+"""Typo-tolerant product search over the catalog sheet.
+
+Documents are tokenised per field; every distinct token (the vocabulary)
+keeps a posting of product slots. Query tokens are resolved against the
+vocabulary by exact match, prefix (bisect on the sorted vocabulary) and,
+for typos, a bigram index over the vocabulary verified with a bounded
+edit distance. Scoring is numpy over the matched postings, so a query
+costs roughly the size of the postings it touches, not the catalog.
+
+A query token of three or more characters also matches vocabulary tokens
+that contain it anywhere ("chair" in "armchair"), like the old substring
+search did; those matches are found with str.find over the vocabulary
+joined into one string, capped per token, and score lowest.
+"""
+import bisect
+import re
+import threading
+
+import numpy as np
+
+# Record field -> weight of a match in that field
+SEARCH_FIELD_WEIGHTS = {
+    "name": 1.0,
+    "sku": 1.0,
+    "color": 0.6,
+    "dimensions": 0.6,
+    "description": 0.5,
+}
+
+# Weight of a query token matching a vocabulary token
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = (0.7, 0.5)      # edit distance 1, 2
+SUBSTRING_MATCH = 0.4         # Query token found inside a longer word
+
+MAX_PREFIX_EXPANSION = 512    # Vocabulary tokens a typed prefix may expand to
+MAX_SUBSTRING_EXPANSION = 256 # Vocabulary tokens a query token may match inside of
+MIN_SUBSTRING_LENGTH = 3      # Shorter query tokens only match exactly or as prefixes
+MAX_FUZZY_CANDIDATES = 64     # Vocabulary tokens verified with edit distance per query token
+
+_TOKEN_PATTERN = re.compile(r"[\w.]+")
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(str(text).lower()) if text else []
+
+
+def _bigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def _max_typos(token):
+    if len(token) <= 3:
+        return 0
+    return 1 if len(token) <= 6 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (transpositions count once), or limit + 1 if above limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class CatalogSearchIndex:
+    """Incrementally maintained search index keyed by product name."""
+
+    def __init__(self, field_weights=SEARCH_FIELD_WEIGHTS):
+        self.field_weights = dict(field_weights)
+        self._lock = threading.RLock()
+        self._records = {}        # key -> record as indexed
+        self._slots = {}          # key -> slot
+        self._keys = []           # slot -> key (None when free)
+        self._free = []
+        self._postings = {}       # token -> {slot: field weight}
+        self._arrays = {}         # token -> (slots, weights), built lazily from _postings
+        self._vocab = []          # sorted tokens, rebuilt lazily after changes
+        self._vocab_text = ""     # _vocab joined with NUL, for substring matches
+        self._vocab_starts = []   # offset of each _vocab token in _vocab_text
+        self._vocab_dirty = False
+        self._grams = {}          # bigram -> set of tokens
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    # ---------- maintenance ----------
+    def _doc_tokens(self, record):
+        weights = {}
+        for field, weight in self.field_weights.items():
+            for token in tokenize(record.get(field)):
+                if weights.get(token, 0.0) < weight:
+                    weights[token] = weight
+        return weights
+
+    def _add_token(self, token):
+        self._vocab_dirty = True
+        for gram in _bigrams(token):
+            self._grams.setdefault(gram, set()).add(token)
+
+    def _drop_token(self, token):
+        self._vocab_dirty = True
+        for gram in _bigrams(token):
+            tokens = self._grams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._grams[gram]
+
+    def _unindex(self, key):
+        slot = self._slots.pop(key)
+        for token in self._doc_tokens(self._records.pop(key)):
+            posting = self._postings[token]
+            posting.pop(slot, None)
+            self._arrays.pop(token, None)
+            if not posting:
+                del self._postings[token]
+                self._drop_token(token)
+        self._keys[slot] = None
+        self._free.append(slot)
+
+    def _index(self, key, record):
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+        self._slots[key] = slot
+        self._records[key] = record
+        for token, weight in self._doc_tokens(record).items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                self._add_token(token)
+            posting[slot] = weight
+            self._arrays.pop(token, None)
+
+    def upsert(self, key, record):
+        """Add or replace one product; a no-op when the record did not change."""
+        with self._lock:
+            if self._records.get(key) == record:
+                return False
+            if key in self._slots:
+                self._unindex(key)
+            self._index(key, record)
+            return True
+
+    def remove(self, key):
+        with self._lock:
+            if key not in self._slots:
+                return False
+            self._unindex(key)
+            return True
+
+    def sync(self, records):
+        """Bring the index in line with {key: record}; only changed products are re-indexed.
+
+        Returns (added, updated, removed) counts.
+        """
+        added = updated = removed = 0
+        with self._lock:
+            for key in [k for k in self._slots if k not in records]:
+                self._unindex(key)
+                removed += 1
+            for key, record in records.items():
+                existed = key in self._slots
+                if self.upsert(key, record):
+                    if existed:
+                        updated += 1
+                    else:
+                        added += 1
+        return added, updated, removed
+
+    # ---------- querying ----------
+    def _posting_arrays(self, token):
+        arrays = self._arrays.get(token)
+        if arrays is None:
+            posting = self._postings[token]
+            arrays = (np.fromiter(posting.keys(), dtype=np.int32, count=len(posting)),
+                      np.fromiter(posting.values(), dtype=np.float32, count=len(posting)))
+            self._arrays[token] = arrays
+        return arrays
+
+    def _expand(self, token, allow_prefix):
+        """{vocabulary token: match weight} for one query token."""
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_text = "\0".join(self._vocab)
+            self._vocab_starts = []
+            offset = 0
+            for candidate in self._vocab:
+                self._vocab_starts.append(offset)
+                offset += len(candidate) + 1
+            self._vocab_dirty = False
+        if allow_prefix:
+            start = bisect.bisect_left(self._vocab, token)
+            for candidate in self._vocab[start:start + MAX_PREFIX_EXPANSION]:
+                if not candidate.startswith(token):
+                    break
+                matches.setdefault(candidate, PREFIX_MATCH)
+        # Words containing the token, as the old substring search matched them; one or two
+        # characters ("1", "12") are inside too much of the vocabulary to be worth it
+        if len(token) >= MIN_SUBSTRING_LENGTH:
+            starts = self._vocab_starts
+            pos = self._vocab_text.find(token)
+            found = 0
+            while pos != -1 and found < MAX_SUBSTRING_EXPANSION:
+                i = bisect.bisect_right(starts, pos) - 1
+                if self._vocab[i] not in matches:
+                    matches[self._vocab[i]] = SUBSTRING_MATCH
+                    found += 1
+                if i + 1 >= len(starts):
+                    break
+                pos = self._vocab_text.find(token, starts[i + 1])
+        # Typo matching only for words that are not in the vocabulary; numbers and SKUs must match as typed
+        typos = 0 if token in self._postings or not any(c.isalpha() for c in token) else _max_typos(token)
+        if typos:
+            grams = _bigrams(token)
+            counts = {}
+            for gram in grams:
+                for candidate in self._grams.get(gram, ()):
+                    counts[candidate] = counts.get(candidate, 0) + 1
+            # A transposition changes at most three bigrams
+            threshold = len(grams) - 3 * typos
+            candidates = sorted((c for c, n in counts.items()
+                                 if n >= threshold and abs(len(c) - len(token)) <= typos),
+                                key=lambda c: -counts[c])
+            for candidate in candidates[:MAX_FUZZY_CANDIDATES]:
+                if candidate in matches:
+                    continue
+                distance = edit_distance(token, candidate, typos)
+                if distance <= typos:
+                    matches[candidate] = FUZZY_MATCH[distance - 1]
+        return matches
+
+    def search(self, query, limit=50):
+        """Best matching keys for `query` as (keys, total matches).
+
+        Products matching every query token rank first; when none do, the
+        ones matching the most tokens are returned. The last token is also
+        matched as a prefix while it is still being typed, and every token
+        inside longer words.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+        typing = not str(query).endswith(" ")
+        with self._lock:
+            size = len(self._keys)
+            total = np.zeros(size, dtype=np.float32)
+            matched = np.zeros(size, dtype=np.int16)
+            for i, token in enumerate(tokens):
+                best = np.zeros(size, dtype=np.float32)
+                allow_prefix = len(token) >= 2 and (typing and i == len(tokens) - 1 or len(token) >= 3)
+                for candidate, weight in self._expand(token, allow_prefix).items():
+                    # Postings hold each slot once, so a gather/scatter keeps the best weight
+                    slots, field_weights = self._posting_arrays(candidate)
+                    best[slots] = np.maximum(best[slots], field_weights * weight)
+                total += best
+                matched += best > 0
+            need = matched.max() if size else 0
+            if need == 0:
+                return [], 0
+            hits = np.flatnonzero(matched == need)
+            scores = total[hits]
+            # Rank a few times `limit` by score, then apply the name bonus
+            pool = limit * 4
+            if len(hits) > pool:
+                top = np.argpartition(-scores, pool - 1)[:pool]
+            else:
+                top = np.arange(len(hits))
+            phrase = " ".join(tokens)
+            ranked = []
+            for i in top:
+                key = self._keys[hits[i]]
+                name = str(self._records[key].get("name", key)).lower()
+                bonus = 0.5 if name.startswith(phrase) else 0.25 if phrase in name else 0.0
+                ranked.append((-(float(scores[i]) + bonus), len(name), key))
+            ranked.sort()
+            return [key for _, _, key in ranked[:limit]], len(hits)
+
+    def stats(self):
+        with self._lock:
+            return {"products": len(self._slots), "tokens": len(self._postings)}
+
+
+catalog_search_index = CatalogSearchIndex()
@@ -0,0 +1,199 @@
+"""Local SQLite copy of the product catalog, read through in front of the Google Sheet.
+
+A new process serves the last synced catalog from disk straight away and
+refreshes it from the sheet in a background thread; if the sheet cannot be
+reached (throttling, outages) the local copy keeps being served.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+CATALOG_DB_PATH = os.environ.get(
+    "CATALOG_DB_PATH", os.path.join(tempfile.gettempdir(), "price_generator_catalog.sqlite")
+)
+CATALOG_REFRESH_SECONDS = 5 * 60   # Refresh from the sheet in the background after this age
+CATALOG_INDEXED_COLUMNS = ("Item Name", "SKU")
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class CatalogStore:
+    """Stale-while-revalidate catalog backed by a SQLite file."""
+
+    def __init__(self, path=CATALOG_DB_PATH, max_age=CATALOG_REFRESH_SECONDS):
+        self.path = path
+        self.max_age = max_age
+        self._df = None
+        self._revision = None
+        self._synced_at = 0.0
+        self._source = None
+        self._stale = False
+        self._refreshing = False
+        self._disk_checked = False
+        self._lock = threading.Lock()
+        self.last_error = None
+
+    def invalidate(self):
+        """Refresh synchronously on the next get (after a manual refresh or an admin edit)."""
+        self._stale = True
+
+    def get(self, fetch):
+        """Current catalog DataFrame.
+
+        `fetch` returns (DataFrame, revision) from the sheet. It is called
+        synchronously when there is no local copy yet or after invalidate(),
+        and in the background once the local copy is older than max_age.
+        """
+        with self._lock:
+            if self._df is None and not self._disk_checked:
+                self._disk_checked = True
+                self._load_disk()
+            df, stale = self._df, self._stale
+            age = time.time() - self._synced_at
+        if df is None or stale:
+            try:
+                return self._refresh(fetch)
+            except Exception as e:
+                self.last_error = str(e)
+                if df is None:
+                    raise
+                print(f"Catalog refresh failed, serving the local copy: {e}")
+                return df
+        if age >= self.max_age:
+            self._refresh_in_background(fetch)
+        return df
+
+    def _refresh(self, fetch):
+        df, revision = fetch()
+        now = time.time()
+        with self._lock:
+            self._df, self._revision, self._synced_at = df, revision, now
+            self._source = "sheet"
+            self._stale = False
+            self.last_error = None
+        self.save(df, revision, now)
+        return df
+
+    def _refresh_in_background(self, fetch):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh(fetch)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Background catalog refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # ---------- SQLite file ----------
+    def save(self, df, revision, synced_at=None):
+        """Write the catalog to a fresh database file and swap it in atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".sqlite.tmp")
+            os.close(fd)
+            con = sqlite3.connect(tmp_path)
+            try:
+                df.to_sql("catalog", con, index=False)
+                for column in CATALOG_INDEXED_COLUMNS:
+                    if column in df.columns:
+                        con.execute(f"CREATE INDEX {_quote('idx_' + column)} ON catalog ({_quote(column)})")
+                meta = {
+                    "revision": json.dumps(revision),
+                    "synced_at": str(synced_at or time.time()),
+                    "dtypes": json.dumps({str(c): str(t) for c, t in df.dtypes.items()}),
+                }
+                con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+                con.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+                con.commit()
+            finally:
+                con.close()
+            os.replace(tmp_path, self.path)
+            tmp_path = None
+        except Exception as e:
+            print(f"Catalog store write failed: {e}")
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def _load_disk(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            con = self._connect()
+            try:
+                meta = dict(con.execute("SELECT key, value FROM meta").fetchall())
+                df = pd.read_sql_query("SELECT * FROM catalog ORDER BY rowid", con)
+            finally:
+                con.close()
+            df = _restore_dtypes(df, json.loads(meta.get("dtypes", "{}")))
+            revision = json.loads(meta.get("revision", "null"))
+            self._df, self._revision = df, revision
+            self._synced_at = float(meta.get("synced_at", 0))
+            self._source = "disk"
+        except Exception as e:
+            print(f"Catalog store read failed: {e}")
+
+    def lookup(self, column, value):
+        """Rows whose `column` equals `value`, straight from the indexed SQLite copy."""
+        try:
+            con = self._connect()
+            try:
+                return pd.read_sql_query(f"SELECT * FROM catalog WHERE {_quote(column)} = ?", con,
+                                         params=(value,))
+            finally:
+                con.close()
+        except Exception as e:
+            print(f"Catalog store lookup failed: {e}")
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": 0 if self._df is None else len(self._df),
+                "revision": self._revision,
+                "synced_at": self._synced_at,
+                "source": self._source,
+                "refreshing": self._refreshing,
+                "error": self.last_error,
+            }
+
+
+def _restore_dtypes(df, dtypes):
+    """Undo SQLite's typing: NULLs back to NaN and columns back to their original dtypes."""
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        try:
+            if dtype == "object":
+                df[column] = df[column].astype(object).where(df[column].notna(), np.nan)
+            elif dtype == "bool":
+                df[column] = df[column].astype(bool)
+            else:
+                df[column] = df[column].astype(dtype)
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+catalog_store = CatalogStore()
@@ -0,0 +1,248 @@
+"""Incremental sync of the products worksheet into a local, normalised snapshot.
+
+A refresh first compares the spreadsheet's Drive modifiedTime (and the
+worksheet size) with the snapshot and returns it untouched when nothing
+changed. Otherwise rows are matched to the snapshot by key and only new or
+edited rows are parsed and normalised:
+
+* with a ``Row Checksum`` column (a formula or Apps Script hash of the row),
+  only that column is downloaded, and rows whose checksum is unknown are
+  fetched in one batch request; rows without a checksum are skipped;
+* without it, the values are downloaded once and each row's own contents
+  serve as its key.
+
+Anything unexpected (header change, a value that no longer fits a column's
+type) falls back to a full parse, which is exactly what get_as_dataframe does.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from gspread.utils import DateTimeOption, ValueRenderOption, fill_gaps, rowcol_to_a1
+from pandas.io.parsers import TextParser
+
+CATALOG_CHECKSUM_COLUMN = "Row Checksum"
+CATALOG_FULL_SYNC_SECONDS = 30 * 60   # Re-check row contents at least this often, whatever Drive says
+
+
+class _Snapshot:
+    __slots__ = ("token", "header", "keys", "raw_dtypes", "df", "synced_at")
+
+    def __init__(self, token, header, keys, raw_dtypes, df):
+        self.token = token
+        self.header = header
+        self.keys = keys
+        self.raw_dtypes = raw_dtypes
+        self.df = df
+        self.synced_at = time.time()
+
+
+class CatalogSync:
+    """Keeps the last normalised catalog and patches it with changed rows."""
+
+    def __init__(self, normalize=None, checksum_column=CATALOG_CHECKSUM_COLUMN,
+                 full_sync_seconds=CATALOG_FULL_SYNC_SECONDS):
+        self.normalize = normalize or (lambda df: df)
+        self.checksum_column = checksum_column
+        self.full_sync_seconds = full_sync_seconds
+        self._snapshot = None
+        self._stale = False
+        self._lock = threading.Lock()
+        self.last_sync = {}
+
+    def invalidate(self):
+        """Skip the modifiedTime shortcut on the next refresh (call after writing to the sheet)."""
+        self._stale = True
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+
+    @property
+    def snapshot_df(self):
+        snapshot = self._snapshot
+        return None if snapshot is None else snapshot.df
+
+    @property
+    def revision(self):
+        """Spreadsheet modifiedTime the snapshot was last synced at."""
+        snapshot = self._snapshot
+        return None if snapshot is None or snapshot.token is None else snapshot.token[0]
+
+    def refresh(self, worksheet, normalize=None):
+        """Return the normalised catalog DataFrame, fetching as little of the sheet as possible.
+
+        `normalize` cleans freshly parsed rows in place and must be the same
+        function on every call, since unchanged rows keep their earlier result.
+        """
+        with self._lock:
+            if normalize is not None:
+                self.normalize = normalize
+            start = time.perf_counter()
+            token = self._revision_token(worksheet)
+            snapshot = self._snapshot
+            if (snapshot is not None and not self._stale and token is not None and token == snapshot.token
+                    and time.time() - snapshot.synced_at < self.full_sync_seconds):
+                self._record("unchanged", 0, 0, len(snapshot.df), start)
+                return snapshot.df
+            self._stale = False
+
+            if snapshot is not None and self.checksum_column in snapshot.header:
+                result = self._sync_by_checksum(worksheet, snapshot, token)
+            else:
+                result = self._sync_by_content(worksheet, snapshot, token)
+            self._snapshot, mode, fetched, parsed = result
+            self._record(mode, fetched, parsed, len(self._snapshot.df), start)
+            return self._snapshot.df
+
+    def _record(self, mode, fetched, parsed, rows, start):
+        self.last_sync = {
+            "mode": mode,
+            "rows": rows,
+            "rows_fetched": fetched,
+            "rows_parsed": parsed,
+            "seconds": time.perf_counter() - start,
+        }
+
+    @staticmethod
+    def _revision_token(worksheet):
+        try:
+            modified = worksheet.spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            print(f"Catalog revision check failed: {e}")
+            return None
+        return modified, worksheet.row_count, worksheet.col_count
+
+    # ---------- sync strategies ----------
+    def _sync_by_content(self, worksheet, snapshot, token):
+        values = worksheet.get_values(value_render_option=ValueRenderOption.formula,
+                                      date_time_render_option=DateTimeOption.formatted_string)
+        values = fill_gaps(values, rows=worksheet.row_count, cols=worksheet.col_count) if values else []
+        if not values:
+            return self._full(token, [], [], []), "full", 0, 0
+        header, rows = values[0], values[1:]
+        if self.checksum_column in header:
+            # Key rows by the evaluated checksum so the next refresh can fetch by checksum
+            checksums = worksheet.col_values(header.index(self.checksum_column) + 1)[1:]
+            checksums += [""] * (len(rows) - len(checksums))
+            rows = [row for row, c in zip(rows, checksums) if c != ""]
+            keys = [c for c in checksums if c != ""]
+        else:
+            keys = [tuple(row) for row in rows]
+        if snapshot is None or header != snapshot.header:
+            return self._full(token, header, rows, keys), "full", len(rows), len(rows)
+        patched = self._patch(snapshot, token, keys, {k: row for k, row in zip(keys, rows)})
+        if patched is None:
+            return self._full(token, header, rows, keys), "full", len(rows), len(rows)
+        return patched[0], "content", len(rows), patched[1]
+
+    def _sync_by_checksum(self, worksheet, snapshot, token):
+        col = snapshot.header.index(self.checksum_column) + 1
+        checksums = worksheet.col_values(col)[1:]
+        row_numbers = {}
+        for i, checksum in enumerate(checksums):
+            if checksum != "":
+                row_numbers.setdefault(checksum, i + 2)
+        known = set(snapshot.keys)
+        wanted = sorted(row_numbers[c] for c in row_numbers if c not in known)
+
+        ranges = ["1:1"] + [
+            f"{rowcol_to_a1(first, 1)}:{rowcol_to_a1(last, len(snapshot.header))}"
+            for first, last in _runs(wanted)
+        ]
+        fetched = worksheet.batch_get(ranges, value_render_option=ValueRenderOption.formula,
+                                      date_time_render_option=DateTimeOption.formatted_string)
+        header = fill_gaps(fetched[0], cols=worksheet.col_count)[0] if fetched[0] else []
+        if header != snapshot.header:
+            return self._sync_by_content(worksheet, None, token)
+        width = len(header)
+        new_rows = {}
+        for first_last, block in zip(_runs(wanted), fetched[1:]):
+            block = list(block)
+            for offset in range(first_last[1] - first_last[0] + 1):
+                row = list(block[offset]) if offset < len(block) else []
+                row = row + [""] * (width - len(row))
+                new_rows[checksums[first_last[0] + offset - 2]] = row
+        keys = [c for c in checksums if c != ""]
+        patched = self._patch(snapshot, token, keys, new_rows)
+        if patched is None:
+            return self._sync_by_content(worksheet, None, token)
+        return patched[0], "checksum", len(wanted), patched[1]
+
+    # ---------- parsing ----------
+    def _full(self, token, header, rows, keys):
+        raw = TextParser([header] + rows).read() if header else pd.DataFrame()
+        return _Snapshot(token, header, keys, raw.dtypes.to_dict(), self.normalize(raw))
+
+    def _parse_rows(self, header, rows, raw_dtypes):
+        """Parse a few rows the way a full parse would have typed them, or None if they do not fit."""
+        chunk = TextParser([header] + rows, dtype=object).read()
+        if list(chunk.columns) != list(raw_dtypes):
+            return None
+        for column, dtype in raw_dtypes.items():
+            if dtype == object:
+                continue
+            try:
+                if pd.api.types.is_bool_dtype(dtype):
+                    chunk[column] = chunk[column].map(_parse_bool).astype(dtype)
+                else:
+                    chunk[column] = pd.to_numeric(chunk[column], errors="raise").astype(dtype)
+            except (ValueError, TypeError):
+                return None
+        return chunk
+
+    def _patch(self, snapshot, token, keys, new_rows):
+        """Snapshot rows reused by key plus `new_rows` parsed and normalised; None to force a full parse."""
+        old_positions = {}
+        for position, key in enumerate(snapshot.keys):
+            old_positions.setdefault(key, position)
+        missing = [k for k in dict.fromkeys(keys) if k not in old_positions]
+        if any(k not in new_rows for k in missing):
+            return None
+        if missing:
+            chunk = self._parse_rows(snapshot.header, [list(new_rows[k]) for k in missing], snapshot.raw_dtypes)
+            if chunk is None:
+                return None
+            chunk = self.normalize(chunk)
+            if list(chunk.columns) != list(snapshot.df.columns):
+                return None
+            combined = pd.concat([snapshot.df, chunk], ignore_index=True)
+        else:
+            combined = snapshot.df
+        base = len(snapshot.df)
+        chunk_positions = {k: base + i for i, k in enumerate(missing)}
+        order = np.fromiter((old_positions.get(k, chunk_positions.get(k)) for k in keys),
+                            dtype=np.int64, count=len(keys))
+        if missing or len(order) != base or not np.array_equal(order, np.arange(base)):
+            df = combined.iloc[order].reset_index(drop=True)
+            df.attrs = {}
+        else:
+            df = snapshot.df
+        return _Snapshot(token, snapshot.header, keys, snapshot.raw_dtypes, df), len(missing)
+
+    def stats(self):
+        return dict(self.last_sync, cached=self._snapshot is not None)
+
+
+def _parse_bool(value):
+    if isinstance(value, bool) or value is None or (isinstance(value, float) and np.isnan(value)):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "false"):
+        return text == "true"
+    raise ValueError(value)
+
+
+def _runs(numbers):
+    """Contiguous (first, last) runs of sorted integers."""
+    runs = []
+    for n in numbers:
+        if runs and n == runs[-1][1] + 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return [tuple(r) for r in runs]
+
+
+catalog_sync = CatalogSync()
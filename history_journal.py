@@ -0,0 +1,237 @@
+"""Append-only local journal of saved quotations, replicated to the history sheet in the background.
+
+Saving a quotation used to wait on append_row and then download the whole
+history sheet again to show the new record. Now the row is committed to a
+local SQLite journal first (WAL, synchronous=FULL, so it is on disk when
+append() returns) and the caller adds the returned record to the session
+history itself. A background thread copies pending rows to the sheet,
+several per append_rows call, retrying with backoff while the sheet is
+unreachable. Rows still pending when the app restarts are sent once a
+worksheet is passed to append() or resume() again.
+
+After a failed push, a retry first reads the sheet's Quotation Hash column
+and skips rows that did reach the sheet, so a lost response does not add
+duplicate rows.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from history_store import history_store, sheet_record
+
+HISTORY_JOURNAL_PATH = os.environ.get(
+    "HISTORY_JOURNAL_PATH", os.path.join(tempfile.gettempdir(), "price_generator_history_journal.sqlite")
+)
+HISTORY_REPLICATE_BATCH = 100                     # Rows per append_rows call
+HISTORY_RETRY_SECONDS = (2, 5, 15, 60, 300)       # Waits after consecutive failed pushes
+HISTORY_JOURNAL_KEEP_SECONDS = 7 * 24 * 60 * 60   # Replicated rows are pruned after this age
+
+# Column layout of the rows the app saves (the history sheet's header)
+HISTORY_ROW_HEADER = ["User Email", "Timestamp", "Company Name", "Contact Person", "Total", "Items JSON",
+                      "PDF Filename", "Quotation Hash", "Company Details JSON", "Overall Discount"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,          -- lower-cased
+    hash TEXT NOT NULL,
+    row_json TEXT NOT NULL,       -- the sheet row, laid out as HISTORY_ROW_HEADER
+    created_at REAL NOT NULL,
+    replicated_at REAL,           -- NULL until the row is in the sheet
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_pending ON journal (id) WHERE replicated_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_journal_email ON journal (email, id) WHERE replicated_at IS NULL;
+"""
+
+
+def _email(email):
+    return str(email or "").strip().lower()
+
+
+class HistoryJournal:
+    """Durable queue of history rows on their way to the sheet."""
+
+    def __init__(self, path=HISTORY_JOURNAL_PATH, batch_size=HISTORY_REPLICATE_BATCH,
+                 retry_seconds=HISTORY_RETRY_SECONDS, on_replicated=None, store=history_store):
+        self.path = path
+        self.store = store
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.on_replicated = on_replicated or (lambda count: None)
+        self._worksheet = None
+        self._running = False
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.last_push = {}
+        self.last_error = None
+
+    # ---------- writes ----------
+    def append(self, row, worksheet=None):
+        """Commit a history row to the journal and queue it for the sheet; returns its HistoryRecord."""
+        record = sheet_record(row, HISTORY_ROW_HEADER)
+        if record is None:
+            raise ValueError("History row needs a user email and a numeric total")
+        con = self._connect()
+        try:
+            with con:
+                con.execute("INSERT INTO journal (email, hash, row_json, created_at) VALUES (?, ?, ?, ?)",
+                            (record.user_email, record.hash, json.dumps(row), time.time()))
+        finally:
+            con.close()
+        self.resume(worksheet)
+        return record
+
+    def resume(self, worksheet=None):
+        """Start copying pending rows to `worksheet` (the last one given if None)."""
+        with self._lock:
+            if worksheet is not None:
+                self._worksheet = worksheet
+            if self._worksheet is None:
+                return
+            self._wake.set()
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._replicate, daemon=True).start()
+
+    # ---------- reads ----------
+    def pending(self, email=None):
+        """HistoryRecords not in the sheet yet, oldest first (all users if `email` is None)."""
+        if email is None:
+            rows = self._query("SELECT row_json FROM journal WHERE replicated_at IS NULL ORDER BY id", ())
+        else:
+            rows = self._query("SELECT row_json FROM journal WHERE email = ? AND replicated_at IS NULL "
+                               "ORDER BY id", (_email(email),))
+        records = [sheet_record(json.loads(row_json), HISTORY_ROW_HEADER) for row_json, in rows]
+        return [record for record in records if record is not None]
+
+    def user_history(self, email, worksheet=None):
+        """HistoryRecords of `email`: the synced history index plus rows not in the sheet yet.
+
+        Syncs the index from `worksheet` first if it is due, and resumes
+        copying pending rows to it (or to the last worksheet given if None).
+        """
+        history = self.store.user_history(email, worksheet)
+        saved = {record.hash for record in history}
+        history += [record for record in self.pending(email) if record.hash not in saved]
+        self.resume(worksheet)
+        return history
+
+    def failing(self):
+        """The last push error while rows it failed to copy are still waiting, else None."""
+        error = self.last_error
+        if error is None:
+            return None
+        rows = self._query("SELECT COUNT(*) FROM journal WHERE replicated_at IS NULL AND attempts > 0", ())
+        return error if rows and rows[0][0] else None
+
+    def pending_count(self):
+        rows = self._query("SELECT COUNT(*) FROM journal WHERE replicated_at IS NULL", ())
+        return rows[0][0] if rows else 0
+
+    def _query(self, sql, params):
+        try:
+            con = self._connect()
+            try:
+                return con.execute(sql, params).fetchall()
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            print(f"History journal read failed: {e}")
+            return []
+
+    # ---------- replication ----------
+    def _replicate(self):
+        failures = 0
+        while True:
+            self._wake.clear()
+            batch = []
+            try:
+                batch = self._query("SELECT id, hash, row_json FROM journal WHERE replicated_at IS NULL "
+                                    "ORDER BY id LIMIT ?", (self.batch_size,))
+                if batch:
+                    self._push(batch, check_sheet=failures > 0)
+                    failures = 0
+                    self.last_error = None
+                    continue
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Copying quotations to the history sheet failed, will retry: {e}")
+                if batch:
+                    self._failed([row_id for row_id, _, _ in batch], e)
+                delay = self.retry_seconds[min(failures, len(self.retry_seconds) - 1)]
+                failures += 1
+                self._wake.wait(delay)
+                continue
+            with self._lock:
+                if not self._wake.is_set():
+                    self._running = False
+                    return
+
+    def _push(self, batch, check_sheet):
+        start = time.perf_counter()
+        worksheet = self._worksheet
+        ids = [row_id for row_id, _, _ in batch]
+        rows = [json.loads(row_json) for _, _, row_json in batch]
+        if check_sheet:
+            # The last push may have reached the sheet even though it failed here
+            header = worksheet.row_values(1)
+            if "Quotation Hash" in header:
+                in_sheet = set(worksheet.col_values(header.index("Quotation Hash") + 1))
+                rows = [row for (_, quotation_hash, _), row in zip(batch, rows) if quotation_hash not in in_sheet]
+        if rows:
+            worksheet.append_rows(rows)
+        con = self._connect()
+        try:
+            with con:
+                con.execute(f"UPDATE journal SET replicated_at = ? WHERE id IN ({', '.join('?' * len(ids))})",
+                            [time.time()] + ids)
+                con.execute("DELETE FROM journal WHERE replicated_at < ?",
+                            (time.time() - HISTORY_JOURNAL_KEEP_SECONDS,))
+        finally:
+            con.close()
+        self.last_push = {"rows": len(rows), "skipped": len(ids) - len(rows),
+                          "seconds": time.perf_counter() - start}
+        self.on_replicated(len(rows))
+
+    def _failed(self, ids, error):
+        try:
+            con = self._connect()
+            try:
+                with con:
+                    con.execute(f"UPDATE journal SET attempts = attempts + 1, last_error = ? "
+                                f"WHERE id IN ({', '.join('?' * len(ids))})", [str(error)] + ids)
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            print(f"History journal write failed: {e}")
+
+    # ---------- SQLite file ----------
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=10)
+        # Every commit is fsynced before append() returns
+        con.execute("PRAGMA synchronous=FULL")
+        if not self._schema_ready:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_SCHEMA)
+            self._schema_ready = True
+        return con
+
+    def stats(self):
+        return {
+            "pending": self.pending_count(),
+            "replicating": self._running,
+            "last_push": self.last_push,
+            "last_error": self.last_error,
+        }
+
+
+# The sheet has new rows once they are replicated; the history index fetches them on its next read
+history_journal = HistoryJournal(on_replicated=lambda count: history_store.invalidate())
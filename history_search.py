@@ -0,0 +1,212 @@
+"""Search queries over the quotation history: text terms plus date and total filters.
+
+One search box takes words and filters together, for example
+"sku:FT-0012 q3 above 100k" or "acme contact:mona 2025-08 <50k":
+
+* words match the company name, contact person, product names or SKUs
+  (as prefixes, all words must match); ``company:``, ``contact:``,
+  ``item:`` and ``sku:`` (or "sku X") restrict a word to one field;
+* dates: ``q3`` / ``q3 2025`` / ``2025-q3``, a month (``aug``, ``august 2025``,
+  ``2025-08``), a day (``2025-08-15``), ``in 2025``, and ``after``/``since``/
+  ``from`` or ``before``/``until``/``to`` followed by any of those;
+* totals: ``>100k``, ``<=5000``, ``above``/``over``/``min`` and
+  ``below``/``under``/``max`` followed by an amount (``k`` and ``m`` suffixes
+  allowed), or ``between 50k and 100k``.
+
+A quarter or month without a year is the latest one that has started.
+The history store turns a HistoryQuery into an indexed SQL query.
+"""
+import re
+from datetime import date
+
+SEARCH_FIELDS = {
+    "company": "company_name",
+    "contact": "contact_person",
+    "item": "item_names",
+    "product": "item_names",
+    "sku": "skus",
+}
+
+_MONTHS = {name: i for i, names in enumerate((
+    ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+    ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"),
+    ("nov", "november"), ("dec", "december")), start=1) for name in names}
+_FILLER = {"in", "and", "egp", "le", "with", "for", "of", "the", "quotations", "quotation"}
+_MIN_WORDS = {"above", "over", "min"}
+_MAX_WORDS = {"below", "under", "max"}
+_AFTER_WORDS = {"after", "since", "from"}
+_BEFORE_WORDS = {"before", "until", "till", "to"}
+
+_AMOUNT = re.compile(r"^(\d+(?:\.\d+)?)([km]?)$")
+_COMPARISON = re.compile(r"^(>=|<=|>|<)(.+)$")
+_QUARTER = re.compile(r"^(?:(\d{4})-?)?q([1-4])(?:-?(\d{4}))?$")
+_YEAR = re.compile(r"^(19|20)\d{2}$")
+_MONTH = re.compile(r"^(\d{4})-(\d{1,2})$")
+_DAY = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+
+
+class HistoryQuery:
+    """A parsed search: text terms as (field or None, text), a date range [date_from, date_to) and total bounds."""
+
+    __slots__ = ("terms", "date_from", "date_to", "min_total", "max_total")
+
+    def __init__(self, terms=(), date_from=None, date_to=None, min_total=None, max_total=None):
+        self.terms = list(terms)
+        self.date_from = date_from     # "YYYY-MM-DD", inclusive
+        self.date_to = date_to         # "YYYY-MM-DD", exclusive
+        self.min_total = min_total
+        self.max_total = max_total
+
+    def __bool__(self):
+        return bool(self.terms) or any(v is not None for v in (self.date_from, self.date_to,
+                                                              self.min_total, self.max_total))
+
+    def __eq__(self, other):
+        if not isinstance(other, HistoryQuery):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__ if getattr(self, name))
+        return f"HistoryQuery({fields})"
+
+    def restrict_dates(self, start, end):
+        """Intersect the date range with [start, end)."""
+        if start and (self.date_from is None or start > self.date_from):
+            self.date_from = start
+        if end and (self.date_to is None or end < self.date_to):
+            self.date_to = end
+
+
+def _amount(text):
+    match = _AMOUNT.match(text.replace(",", ""))
+    if not match:
+        return None
+    return float(match.group(1)) * {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2)]
+
+
+def _day(year, month, day=1):
+    return date(year, month, day).isoformat()
+
+
+def _month_range(year, month):
+    return _day(year, month), _day(year + month // 12, month % 12 + 1)
+
+
+def _latest_year(month, today):
+    """Year of the latest `month` (1-12) that has started by `today`."""
+    return today.year if month <= today.month else today.year - 1
+
+
+def _date_range(tokens, i, today):
+    """(start, end, tokens used) for a date written at tokens[i], or None."""
+    token = tokens[i]
+    following = tokens[i + 1] if i + 1 < len(tokens) else ""
+    year_after = int(following) if _YEAR.match(following) else None
+    try:
+        match = _QUARTER.match(token)
+        if match:
+            quarter = int(match.group(2))
+            year = match.group(1) or match.group(3)
+            used = 1
+            if year is None and year_after is not None:
+                year, used = year_after, 2
+            year = int(year) if year else _latest_year(3 * quarter - 2, today)
+            start = _day(year, 3 * quarter - 2)
+            return start, _month_range(year, 3 * quarter)[1], used
+        if token in _MONTHS:
+            month = _MONTHS[token]
+            if year_after is not None:
+                return (*_month_range(year_after, month), 2)
+            return (*_month_range(_latest_year(month, today), month), 1)
+        match = _DAY.match(token)
+        if match:
+            year, month, day = map(int, match.groups())
+            start = date(year, month, day)
+            return start.isoformat(), date.fromordinal(start.toordinal() + 1).isoformat(), 1
+        match = _MONTH.match(token)
+        if match:
+            return (*_month_range(int(match.group(1)), int(match.group(2))), 1)
+        if _YEAR.match(token):
+            return _day(int(token), 1), _day(int(token) + 1, 1), 1
+    except ValueError:
+        return None   # 2025-13, 2025-02-30
+    return None
+
+
+def parse_query(text, today=None):
+    """HistoryQuery for what was typed in the history search box."""
+    today = today or date.today()
+    query = HistoryQuery()
+    tokens = str(text or "").lower().split()
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+
+        # Totals: >100k, above 100k, between 50k and 100k
+        match = _COMPARISON.match(token)
+        if match and _amount(match.group(2)) is not None:
+            amount = _amount(match.group(2))
+            if match.group(1).startswith(">"):
+                query.min_total = amount
+            else:
+                query.max_total = amount
+            i += 1
+            continue
+        if token in _MIN_WORDS | _MAX_WORDS and following and _amount(following) is not None:
+            if token in _MIN_WORDS:
+                query.min_total = _amount(following)
+            else:
+                query.max_total = _amount(following)
+            i += 2
+            continue
+        if (token == "between" and i + 3 < len(tokens) and tokens[i + 2] == "and"
+                and _amount(tokens[i + 1]) is not None and _amount(tokens[i + 3]) is not None):
+            low, high = sorted((_amount(tokens[i + 1]), _amount(tokens[i + 3])))
+            query.min_total, query.max_total = low, high
+            i += 4
+            continue
+
+        # Dates: after/before DATE, or a date range on its own
+        if token in _AFTER_WORDS | _BEFORE_WORDS and following:
+            found = _date_range(tokens, i + 1, today)
+            if found:
+                start, end, used = found
+                if token in _AFTER_WORDS:
+                    query.restrict_dates(start if token != "after" else end, None)
+                else:
+                    query.restrict_dates(None, start if token == "before" else end)
+                i += 1 + used
+                continue
+        # A bare year only counts as a date after "in" (it may be part of a product name)
+        if not _YEAR.match(token) or (i and tokens[i - 1] == "in"):
+            found = _date_range(tokens, i, today)
+            if found:
+                start, end, used = found
+                query.restrict_dates(start, end)
+                i += used
+                continue
+
+        # Text: field:value, "sku X", or a word in any field
+        field, _, value = token.partition(":")
+        if not any(c.isalnum() for c in token):
+            pass
+        elif value and field in SEARCH_FIELDS:
+            query.terms.append((SEARCH_FIELDS[field], value))
+        elif token == "sku" and following:
+            query.terms.append(("skus", following))
+            i += 1
+        elif token not in _FILLER | _AFTER_WORDS | _BEFORE_WORDS:
+            query.terms.append((None, token))
+        i += 1
+    return query
+
+
+def match_expression(terms):
+    """FTS5 MATCH expression requiring every term, each as a prefix."""
+    parts = []
+    for field, text in terms:
+        phrase = '"' + text.replace('"', '""') + '"*'
+        parts.append(f"{field} : {phrase}" if field else phrase)
+    return " AND ".join(parts)
@@ -0,0 +1,504 @@
+"""Local SQLite index of the quotation history sheet, keyed by user email and timestamp.
+
+The history sheet holds every quotation of every user, so reading it whole
+on login grows with the company's quotation count. Instead the sheet is
+mirrored into a SQLite file with an index on (email, timestamp): a user's
+history is one indexed query, proportional to their own record count.
+
+The sheet is mostly appended to, so a sync fetches only the rows after the
+last one seen (checking that row is unchanged first). Anything else (header
+change, rows deleted or moved in the sheet) falls back to a full download,
+which also runs in the background every HISTORY_FULL_SYNC_SECONDS to pick up
+edits made in place.
+
+Searches (see history_search) use an FTS5 inverted index over company name,
+contact person, product names and SKUs, kept up to date by triggers as rows
+are stored, combined with the date and total columns in one query. Without
+FTS5 in the SQLite build the words are matched with LIKE instead.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from gspread.utils import DateTimeOption, ValueRenderOption, rowcol_to_a1
+
+from history_search import HistoryQuery, match_expression, parse_query
+
+HISTORY_DB_PATH = os.environ.get(
+    "HISTORY_DB_PATH", os.path.join(tempfile.gettempdir(), "price_generator_history.sqlite")
+)
+HISTORY_SYNC_SECONDS = 15            # Fetch new sheet rows at most this often
+HISTORY_FULL_SYNC_SECONDS = 30 * 60  # Re-download the whole sheet in the background after this age
+HISTORY_PAGE_SIZE = 20               # Quotations per history page
+HISTORY_COUNT_LIMIT = 1000           # Search results are counted up to this many ("1000+")
+
+# Sheet header -> local column
+HISTORY_COLUMNS = {
+    "User Email": "email",
+    "Timestamp": "timestamp",
+    "Company Name": "company_name",
+    "Contact Person": "contact_person",
+    "Contact Phone": "contact_phone",
+    "Total": "total",
+    "Items JSON": "items_json",
+    "PDF Filename": "pdf_filename",
+    "Quotation Hash": "hash",
+    "Company Details JSON": "company_details_json",
+    "Overall Discount": "overall_discount",
+}
+
+_SCHEMA_VERSION = 3
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotations (
+    id INTEGER PRIMARY KEY,
+    row INTEGER NOT NULL UNIQUE,  -- sheet row number
+    email TEXT NOT NULL,          -- lower-cased
+    timestamp TEXT, company_name TEXT, contact_person TEXT, contact_phone TEXT,
+    total REAL, items_json TEXT, pdf_filename TEXT, hash TEXT,
+    company_details_json TEXT, overall_discount REAL,
+    item_names TEXT, skus TEXT    -- from Items JSON, for searching
+);
+CREATE INDEX IF NOT EXISTS idx_quotations_email ON quotations (email, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_quotations_total ON quotations (email, total);
+CREATE INDEX IF NOT EXISTS idx_quotations_hash ON quotations (hash);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS quotations_fts USING fts5(
+    company_name, contact_person, item_names, skus,
+    content='quotations', content_rowid='id', tokenize="unicode61 tokenchars '-._/'"
+);
+CREATE TRIGGER IF NOT EXISTS quotations_fts_insert AFTER INSERT ON quotations BEGIN
+    INSERT INTO quotations_fts (rowid, company_name, contact_person, item_names, skus)
+    VALUES (new.id, new.company_name, new.contact_person, new.item_names, new.skus);
+END;
+CREATE TRIGGER IF NOT EXISTS quotations_fts_delete AFTER DELETE ON quotations BEGIN
+    INSERT INTO quotations_fts (quotations_fts, rowid, company_name, contact_person, item_names, skus)
+    VALUES ('delete', old.id, old.company_name, old.contact_person, old.item_names, old.skus);
+END;
+"""
+_SEARCH_COLUMNS = ("company_name", "contact_person", "item_names", "skus")
+_FIELDS = tuple(HISTORY_COLUMNS.values())
+_STORED_FIELDS = ("row",) + _FIELDS + ("item_names", "skus")
+_VALUE_OPTIONS = {"value_render_option": ValueRenderOption.unformatted,
+                  "date_time_render_option": DateTimeOption.formatted_string}
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _number(value, default=None):
+    try:
+        number = float(str(value).replace(",", "")) if _text(value) else default
+    except (TypeError, ValueError):
+        return default
+    return default if number != number else number   # NaN
+
+
+def _email(email):
+    return str(email or "").strip().lower()
+
+
+def _trimmed(header):
+    """Header without the empty cells after the last named column."""
+    header = list(header)
+    while header and not header[-1]:
+        header.pop()
+    return header
+
+
+def _searchable(items_json):
+    """(product names, SKUs) of a quotation's Items JSON, as text for the search index."""
+    try:
+        items = json.loads(items_json)
+    except (TypeError, ValueError):
+        return "", ""
+    items = [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+    return (" ".join(_text(item.get("Item")) for item in items),
+            " ".join(_text(item.get("SKU")) for item in items if _text(item.get("SKU")) not in ("", "N/A")))
+
+
+def _record(row):
+    """Sheet row (dict keyed by local column) as a table row tuple, or None if it is not a quotation."""
+    email = _email(row.get("email"))
+    total = _number(row.get("total"))
+    if not email or total is None:
+        return None
+    values = {field: _text(row.get(field)) for field in _FIELDS}
+    values["email"] = email
+    values["total"] = total
+    values["overall_discount"] = _number(row.get("overall_discount"), 0.0)
+    if not values["hash"] or values["hash"].lower() in ("nan", "none", "null"):
+        # Deterministic fallback for rows saved without a hash
+        fallback = f"{values['company_name']}{values['timestamp']}{total}"
+        values["hash"] = hashlib.md5(fallback.encode()).hexdigest()
+    return tuple(values[field] for field in _FIELDS) + _searchable(values["items_json"])
+
+
+# HistoryRecord keys, as in the dicts of newly saved quotations
+_RECORD_KEYS = ("user_email", "timestamp", "company_name", "contact_phone", "contact_person", "total", "items",
+                "pdf_filename", "hash", "company_details", "overall_discount")
+_UNSET = object()
+
+
+class HistoryRecord:
+    """One saved quotation: summary fields plus the raw JSON of its items and company details.
+
+    The JSON is only decoded when `items` or `company_details` is first read,
+    so listing a user's history does not parse every quotation they have
+    made. record["items"] and record.get(...) work as on the dicts of newly
+    saved quotations.
+    """
+
+    __slots__ = ("user_email", "timestamp", "company_name", "contact_person", "contact_phone", "total",
+                 "items_json", "pdf_filename", "hash", "company_details_json", "overall_discount",
+                 "_items", "_company_details")
+
+    def __init__(self, row):
+        fields = dict(zip(_FIELDS, row))
+        self.user_email = fields["email"]
+        for name in ("timestamp", "company_name", "contact_person", "contact_phone", "total", "items_json",
+                     "pdf_filename", "hash", "company_details_json", "overall_discount"):
+            setattr(self, name, fields[name])
+        self._items = self._company_details = _UNSET
+
+    @property
+    def items(self):
+        if self._items is _UNSET:
+            try:
+                items = json.loads(self.items_json)
+            except (TypeError, ValueError) as e:
+                print(f"Malformed Items JSON in quotation {self.hash}: {e}")
+                items = []
+            self._items = items if isinstance(items, list) else []
+        return self._items
+
+    @property
+    def company_details(self):
+        if self._company_details is _UNSET:
+            try:
+                details = json.loads(self.company_details_json) if self.company_details_json else {}
+            except (TypeError, ValueError):
+                details = {}
+            self._company_details = details if isinstance(details, dict) else {}
+        return self._company_details
+
+    @property
+    def decoded(self):
+        """Whether the items have been decoded yet."""
+        return self._items is not _UNSET
+
+    def __getitem__(self, key):
+        if key not in _RECORD_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in _RECORD_KEYS else default
+
+    def __eq__(self, other):
+        if not isinstance(other, HistoryRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__[:-2])
+
+    def __repr__(self):
+        return f"HistoryRecord({self.company_name!r}, {self.timestamp!r}, total={self.total!r})"
+
+
+def sheet_record(row, header):
+    """HistoryRecord of one sheet row laid out as `header`, or None if it is not a quotation."""
+    record = _record({HISTORY_COLUMNS[name]: value for name, value in zip(header, row) if name in HISTORY_COLUMNS})
+    return None if record is None else HistoryRecord(record[:len(_FIELDS)])
+
+
+class HistoryStore:
+    """Quotation history read from a local index that is kept in sync with the sheet."""
+
+    def __init__(self, path=HISTORY_DB_PATH, sync_seconds=HISTORY_SYNC_SECONDS,
+                 full_sync_seconds=HISTORY_FULL_SYNC_SECONDS):
+        self.path = path
+        self.sync_seconds = sync_seconds
+        self.full_sync_seconds = full_sync_seconds
+        self._synced_at = 0.0
+        self._full_synced_at = 0.0
+        self._stale = False
+        self._full_running = False
+        self._generation = 0          # Bumped whenever the index gains or loses rows
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._fts = False
+        self.last_sync = {}
+        self.last_error = None
+
+    def invalidate(self):
+        """Fetch new sheet rows on the next read (call after appending to the sheet)."""
+        self._stale = True
+
+    # ---------- reads ----------
+    def user_history(self, email, worksheet=None):
+        """HistoryRecords of `email`, oldest first, syncing from `worksheet` first if it is due."""
+        if worksheet is not None:
+            self.refresh(worksheet)
+        rows = self._query(f"SELECT {', '.join(_FIELDS)} FROM quotations WHERE email = ? ORDER BY timestamp, row",
+                           (_email(email),))
+        return [HistoryRecord(row) for row in rows]
+
+    def user_page(self, email, limit=HISTORY_PAGE_SIZE, cursor=None, search=""):
+        """One page of `email`'s quotations, newest first, plus the cursor of the next page (None on the last).
+
+        Pass the returned cursor to get the following page. Pages are keyset
+        queries on the (email, timestamp) index, so a page costs the same
+        however far back it is, and only its records are read. `search` is
+        a search box query or a HistoryQuery (see history_search).
+        """
+        where, params = self._user_filter(email, search)
+        # Ties on timestamp are broken by id rather than the sheet row, which deletes shift;
+        # ids follow the sheet order and stay put, so a saved cursor stays valid
+        if cursor:
+            where += " AND (timestamp, id) < (?, ?)"
+            params += tuple(cursor)
+        rows = self._query(f"SELECT id, {', '.join(_FIELDS)} FROM quotations WHERE {where} "
+                           f"ORDER BY timestamp DESC, id DESC LIMIT ?", params + (limit + 1,))
+        records = [HistoryRecord(row[1:]) for row in rows[:limit]]
+        last = rows[limit - 1] if len(rows) > limit else None
+        return records, None if last is None else (last[1 + _FIELDS.index("timestamp")], last[0])
+
+    def user_count(self, email, search="", limit=None):
+        """Number of quotations user_page pages through, counting no further than `limit`."""
+        where, params = self._user_filter(email, search)
+        if limit is None:
+            rows = self._query(f"SELECT COUNT(*) FROM quotations WHERE {where}", params)
+        else:
+            rows = self._query(f"SELECT COUNT(*) FROM (SELECT 1 FROM quotations WHERE {where} LIMIT ?)",
+                               params + (limit,))
+        return rows[0][0] if rows else 0
+
+    def _user_filter(self, email, search):
+        """WHERE clause and parameters for one user's quotations matching `search`."""
+        query = search if isinstance(search, HistoryQuery) else parse_query(search)
+        where, params = ["email = ?"], [_email(email)]
+        if query.terms and self._has_fts():
+            where.append("id IN (SELECT rowid FROM quotations_fts WHERE quotations_fts MATCH ?)")
+            params.append(match_expression(query.terms))
+        else:
+            for field, text in query.terms:
+                columns = (field,) if field else _SEARCH_COLUMNS
+                escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                where.append("(" + " OR ".join(f"lower({c}) LIKE ? ESCAPE '\\'" for c in columns) + ")")
+                params += [f"%{escaped}%"] * len(columns)
+        for condition, value in (("timestamp >= ?", query.date_from), ("timestamp < ?", query.date_to),
+                                 ("total >= ?", query.min_total), ("total <= ?", query.max_total)):
+            if value is not None:
+                where.append(condition)
+                params.append(value)
+        return " AND ".join(where), tuple(params)
+
+    def _query(self, sql, params):
+        try:
+            con = self._connect()
+            try:
+                return con.execute(sql, params).fetchall()
+            finally:
+                con.close()
+        except sqlite3.Error as e:
+            print(f"History store read failed: {e}")
+            return []
+
+    # ---------- sync ----------
+    def refresh(self, worksheet):
+        """Bring the local index up to date with the sheet; keeps serving it if the sheet fails."""
+        now = time.time()
+        if not self._stale and now - self._synced_at < self.sync_seconds:
+            return
+        try:
+            with self._lock:
+                self._stale = False
+                self._sync(worksheet, full=False)
+                self._synced_at = time.time()
+                self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"History sync failed, serving the local copy: {e}")
+        if time.time() - self._full_synced_at >= self.full_sync_seconds:
+            self._full_sync_in_background(worksheet)
+
+    def _full_sync_in_background(self, worksheet):
+        with self._lock:
+            if self._full_running:
+                return
+            self._full_running = True
+
+        def run():
+            try:
+                start = time.perf_counter()
+                with self._lock:
+                    generation = self._generation
+                # Download without the lock so refresh() and delete() are not held up meanwhile
+                values = worksheet.get_values(**_VALUE_OPTIONS)
+                with self._lock:
+                    if generation != self._generation:
+                        # The index changed during the download; the next refresh starts another one
+                        return
+                    con = self._connect()
+                    try:
+                        self._store_values(con, values, start)
+                    finally:
+                        con.close()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Background history sync failed: {e}")
+            finally:
+                self._full_running = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _sync(self, worksheet, full):
+        start = time.perf_counter()
+        con = self._connect()
+        try:
+            meta = dict(con.execute("SELECT key, value FROM meta").fetchall())
+            self._full_synced_at = max(self._full_synced_at, float(meta.get("full_synced_at", 0)))
+            header = json.loads(meta.get("header", "null"))
+            last_row = int(meta.get("last_row", 0))
+            fingerprint = json.loads(meta.get("fingerprint", "null"))
+            if not full and header and last_row and fingerprint is not None:
+                last_col = rowcol_to_a1(1, len(header)).rstrip("0123456789")
+                fetched = worksheet.batch_get(["1:1", f"A{last_row}:{last_col}"], **_VALUE_OPTIONS)
+                sheet_header = [_text(v) for v in (fetched[0][0] if fetched[0] else [])]
+                tail = [self._pad(row, len(header)) for row in fetched[1]]
+                if _trimmed(sheet_header) == _trimmed(header) and tail and tail[0] == fingerprint:
+                    self._store(con, header, last_row, tail, replace=False)
+                    if len(tail) > 1:
+                        self._generation += 1
+                    self._record("incremental", len(tail) - 1, start)
+                    return
+            self._store_values(con, worksheet.get_values(**_VALUE_OPTIONS), start)
+        finally:
+            con.close()
+
+    def _store_values(self, con, values, start):
+        """Replace the index with the whole sheet's `values` (call with the lock held)."""
+        header = [_text(v) for v in values[0]] if values else []
+        rows = [self._pad(row, len(header)) for row in values[1:]]
+        self._store(con, header, 1, [header] + rows, replace=True)
+        self._generation += 1
+        self._full_synced_at = time.time()
+        self._record("full", len(rows), start)
+
+    @staticmethod
+    def _pad(row, width):
+        row = [v if isinstance(v, (int, float)) and not isinstance(v, bool) else _text(v) for v in row[:width]]
+        return row + [""] * (width - len(row))
+
+    @staticmethod
+    def _store(con, header, first_row, rows, replace):
+        """Write sheet rows `first_row`.. (rows[0] is the already known row at first_row)."""
+        positions = {HISTORY_COLUMNS[name]: i for i, name in enumerate(header) if name in HISTORY_COLUMNS}
+        records = []
+        for offset, row in enumerate(rows[1:], start=1):
+            record = _record({field: row[i] for field, i in positions.items()})
+            if record is not None:
+                records.append((first_row + offset,) + record)
+        # Trailing empty rows are not part of the sheet's data
+        last = len(rows)
+        while last > 1 and not any(_text(v) for v in rows[last - 1]):
+            last -= 1
+        with con:
+            if replace:
+                con.execute("DELETE FROM quotations")
+                con.execute("INSERT OR REPLACE INTO meta VALUES ('full_synced_at', ?)", (str(time.time()),))
+            else:
+                con.execute("DELETE FROM quotations WHERE row > ?", (first_row,))
+            con.executemany(f"INSERT INTO quotations ({', '.join(_STORED_FIELDS)}) "
+                            f"VALUES ({', '.join('?' * len(_STORED_FIELDS))})", records)
+            con.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", {
+                "header": json.dumps(header),
+                "last_row": str(first_row + last - 1),
+                "fingerprint": json.dumps(rows[last - 1]),
+            }.items())
+
+    def _record(self, mode, rows, start):
+        self.last_sync = {"mode": mode, "rows_fetched": rows, "seconds": time.perf_counter() - start}
+
+    # ---------- writes ----------
+    def delete(self, quotation_hash, worksheet):
+        """Delete a quotation from the sheet and the index; False if it is not in the history."""
+        with self._lock:
+            for attempt in range(2):
+                con = self._connect()
+                try:
+                    meta = dict(con.execute("SELECT key, value FROM meta").fetchall())
+                    found = con.execute("SELECT row FROM quotations WHERE hash = ? ORDER BY row LIMIT 1",
+                                        (str(quotation_hash).strip(),)).fetchone()
+                    header = json.loads(meta.get("header", "[]"))
+                    if found is None or "Quotation Hash" not in header:
+                        if attempt:
+                            return False
+                        self._sync(worksheet, full=True)
+                        continue
+                    row = found[0]
+                    # Make sure the sheet row is still that quotation before deleting it
+                    cell = rowcol_to_a1(row, header.index("Quotation Hash") + 1)
+                    sheet_hash = worksheet.batch_get([cell])[0]
+                    if not sheet_hash or _text(sheet_hash[0][0]) != str(quotation_hash).strip():
+                        self._sync(worksheet, full=True)
+                        continue
+                    worksheet.delete_rows(row)
+                    last_row = int(meta.get("last_row", 0))
+                    with con:
+                        con.execute("DELETE FROM quotations WHERE row = ?", (row,))
+                        # Rows below move up one; negate first so the primary key never collides
+                        con.execute("UPDATE quotations SET row = -(row - 1) WHERE row > ?", (row,))
+                        con.execute("UPDATE quotations SET row = -row WHERE row < 0")
+                        if row == last_row:
+                            con.execute("DELETE FROM meta WHERE key = 'fingerprint'")   # Full sync next
+                        else:
+                            con.execute("UPDATE meta SET value = ? WHERE key = 'last_row'", (str(last_row - 1),))
+                    self._generation += 1
+                    return True
+                finally:
+                    con.close()
+            return False
+
+    # ---------- SQLite file ----------
+    def _connect(self):
+        if not self._schema_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=10)
+        if not self._schema_ready:
+            con.execute("PRAGMA journal_mode=WAL")
+            if con.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                # Older layout: start over, the next sync downloads the sheet again
+                con.executescript("DROP TABLE IF EXISTS quotations_fts; DROP TABLE IF EXISTS quotations; "
+                                  "DROP TABLE IF EXISTS meta;")
+                con.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            con.executescript(_SCHEMA)
+            try:
+                con.executescript(_FTS_SCHEMA)
+                self._fts = True
+            except sqlite3.OperationalError as e:
+                print(f"History search index unavailable (no FTS5), searching without it: {e}")
+                self._fts = False
+            self._schema_ready = True
+        return con
+
+    def _has_fts(self):
+        if not self._schema_ready:
+            self._connect().close()
+        return self._fts
+
+    def stats(self):
+        return {
+            "synced_at": self._synced_at,
+            "full_synced_at": self._full_synced_at,
+            "last_sync": self.last_sync,
+            "error": self.last_error,
+        }
+
+
+history_store = HistoryStore()
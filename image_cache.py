@@ -0,0 +1,393 @@
+"""Product image helpers shared by the quotation builder and the history page."""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+
+import requests
+from PIL import Image as PILImage
+
+from byte_lru import ByteLRU
+
+# ========== Prefetch Settings ==========
+PREFETCH_WORKERS = 8          # Max concurrent image downloads per PDF build
+IMAGE_TIMEOUT = 5             # Per-URL timeout (seconds)
+PREFETCH_TOTAL_TIMEOUT = 20   # Cap on the total wait for a whole prefetch (seconds)
+
+# ========== Disk Cache Settings ==========
+IMAGE_CACHE_DIR = os.environ.get(
+    "IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "price_generator_images")
+)
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024   # Evict least recently used images above this
+IMAGE_REVALIDATE_SECONDS = 24 * 60 * 60     # Re-check ETag/Last-Modified once a day
+IMAGE_EVICT_GRACE_SECONDS = 60              # Never evict images used this recently
+
+# ========== Memory Cache Settings ==========
+THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024   # Memory budget for editor thumbnails
+THUMBNAIL_SIZE = (200, 200)                    # Shown at 100px, kept sharp on HiDPI screens
+THUMBNAIL_RETRY_SECONDS = 60                   # Retry a failed catalog thumbnail after this long
+
+DRIVE_ID_PATTERN = re.compile(r'(?:/file/d/|[?&]id=)([a-zA-Z0-9_-]+)')
+
+
+def drive_file_id(url):
+    """Extract the Google Drive file ID from a view, download or thumbnail URL."""
+    match = DRIVE_ID_PATTERN.search(str(url or ""))
+    return match.group(1) if match else None
+
+
+def image_cache_key(url, max_size=(300, 300)):
+    """Content key for a processed image: Drive file ID (or URL) plus target size."""
+    file_id = drive_file_id(url)
+    source = f"drive:{file_id}" if file_id else str(url).strip()
+    return hashlib.blake2b(f"{source}|{max_size[0]}x{max_size[1]}".encode(), digest_size=16).hexdigest()
+
+
+def resize_image(content, max_size=(300, 300)):
+    """Decode image bytes and shrink them to fit within max_size."""
+    img = PILImage.open(BytesIO(content)).convert("RGB")
+    img_ratio = img.width / img.height
+    max_width, max_height = max_size
+    if img.width > max_width or img.height > max_height:
+        if img_ratio > 1:
+            new_width = max_width
+            new_height = int(max_width / img_ratio)
+        else:
+            new_height = max_height
+            new_width = int(max_height * img_ratio)
+        img = img.resize((new_width, new_height), PILImage.Resampling.LANCZOS)
+    return img
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _write_atomic(path, data, mode="wb"):
+    """Write to a sibling temp file and rename, so readers never see partial files."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+# Running size of the cached PNGs, so a download does not have to stat the whole
+# directory; "limit" is the size at which the directory is scanned and evicted again.
+_cache_size = {"bytes": None, "limit": None}
+_cache_size_lock = threading.Lock()
+
+
+def _scan_image_cache():
+    try:
+        entries = [e for e in os.scandir(IMAGE_CACHE_DIR) if e.name.endswith(".png")]
+    except FileNotFoundError:
+        return []
+    stats = []
+    for e in entries:
+        try:
+            st = e.stat()
+        except OSError:
+            continue
+        stats.append((st.st_mtime, st.st_size, e.path))
+    return stats
+
+
+def evict_image_cache(max_bytes=IMAGE_CACHE_MAX_BYTES):
+    """Delete least recently used cached images until the cache fits in max_bytes."""
+    with _cache_size_lock:
+        stats = _scan_image_cache()
+        total = sum(size for _, size, _ in stats)
+        if total > max_bytes:
+            now = time.time()
+            for mtime, size, path in sorted(stats):
+                if total <= max_bytes * 0.9:
+                    break
+                if now - mtime < IMAGE_EVICT_GRACE_SECONDS:
+                    continue
+                for victim in (path, path[:-len(".png")] + ".json"):
+                    try:
+                        os.unlink(victim)
+                    except OSError:
+                        pass
+                total -= size
+        _cache_size["bytes"] = total
+        # Images still in their grace period can keep the cache above max_bytes;
+        # scan again only once it has grown by another tenth of the budget.
+        _cache_size["limit"] = max(max_bytes, total + max_bytes // 10)
+
+
+def _cache_grew(added_bytes, max_bytes=IMAGE_CACHE_MAX_BYTES):
+    """Add a write to the running cache size and evict once it passes the limit."""
+    with _cache_size_lock:
+        if _cache_size["bytes"] is None:
+            _cache_size["bytes"] = sum(size for _, size, _ in _scan_image_cache())
+            _cache_size["limit"] = max_bytes
+        else:
+            _cache_size["bytes"] += added_bytes
+        over = _cache_size["bytes"] > _cache_size["limit"]
+    if over:
+        evict_image_cache(max_bytes)
+
+
+def get_cached_image(url, max_size=(300, 300), timeout=IMAGE_TIMEOUT):
+    """Return the path of the resized PNG for url, downloading only when missing or stale.
+
+    Cached images are revalidated with ETag/Last-Modified every
+    IMAGE_REVALIDATE_SECONDS; a stale copy is served if revalidation fails.
+    """
+    if not url:
+        return None
+    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    key = image_cache_key(url, max_size)
+    path = os.path.join(IMAGE_CACHE_DIR, key + ".png")
+    meta_path = os.path.join(IMAGE_CACHE_DIR, key + ".json")
+
+    meta = _read_meta(meta_path) if os.path.exists(path) else None
+    headers = {}
+    if meta:
+        if time.time() - meta.get("checked_at", 0) < IMAGE_REVALIDATE_SECONDS:
+            _touch(path)
+            return path
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(url, timeout=timeout, headers=headers)
+        if meta and response.status_code == 304:
+            meta["checked_at"] = time.time()
+            _write_atomic(meta_path, json.dumps(meta), mode="w")
+            _touch(path)
+            return path
+        response.raise_for_status()
+        img = resize_image(response.content, max_size)
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        _write_atomic(path, buf.getvalue())
+        _write_atomic(meta_path, json.dumps({
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked_at": time.time(),
+        }), mode="w")
+        _cache_grew(buf.tell() - replaced)
+        return path
+    except Exception as e:
+        print(f"Image download/resize failed: {e}")
+        return path if os.path.exists(path) else None
+
+
+def download_image_for_pdf(url, max_size=(300, 300), timeout=IMAGE_TIMEOUT):
+    """Resized PNG path for PDF embedding, served from the on-disk image cache.
+
+    The returned file belongs to the cache and must not be deleted by callers.
+    """
+    return get_cached_image(url, max_size, timeout)
+
+
+def prefetch_images(urls, max_size=(300, 300), max_workers=PREFETCH_WORKERS,
+                    timeout=IMAGE_TIMEOUT, total_timeout=PREFETCH_TOTAL_TIMEOUT):
+    """Download all distinct URLs in parallel before layout starts.
+
+    Returns a dict mapping each URL to its cached PNG path, or None when the
+    download failed or did not finish within ``total_timeout`` seconds. Late
+    downloads still land in the disk cache for the next build.
+    """
+    distinct_urls = list(dict.fromkeys(u for u in urls if u))
+    if not distinct_urls:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(distinct_urls)))
+    futures = {
+        executor.submit(download_image_for_pdf, url, max_size, timeout): url
+        for url in distinct_urls
+    }
+    done, not_done = wait(futures, timeout=total_timeout)
+
+    results = {}
+    for future in done:
+        results[futures[future]] = future.result()
+    for future in not_done:
+        print(f"Image prefetch timed out: {futures[future]}")
+        results[futures[future]] = None
+    executor.shutdown(wait=False)
+    return results
+
+
+# ========== In-Memory Thumbnail Cache ==========
+# Encoded editor thumbnails, shared by all sessions in the process
+thumbnail_cache = ByteLRU(THUMBNAIL_CACHE_MAX_BYTES)
+
+
+def encode_thumbnail(img, size=THUMBNAIL_SIZE):
+    """Shrink a PIL image to a small JPEG suitable for the editor preview."""
+    img = img.convert("RGB")
+    img.thumbnail(size, PILImage.Resampling.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=85, optimize=True)
+    return buf.getvalue()
+
+
+def make_thumbnail(url, size=THUMBNAIL_SIZE):
+    """Encode a thumbnail for url from the on-disk image cache (downloading if needed)."""
+    path = get_cached_image(url, max_size=(300, 300))
+    if not path:
+        return None
+    try:
+        with PILImage.open(path) as img:
+            return encode_thumbnail(img, size)
+    except Exception as e:
+        print(f"Thumbnail encode failed: {e}")
+        return None
+
+
+def get_thumbnail_bytes(url, size=THUMBNAIL_SIZE):
+    """Encoded thumbnail bytes for url, from memory, then disk, then the network."""
+    if not url:
+        return None
+    key = image_cache_key(url, size)
+    data = thumbnail_cache.get(key)
+    if data is not None:
+        return data
+    data = make_thumbnail(url, size)
+    if data is not None:
+        thumbnail_cache.put(key, data)
+    return data
+
+
+# ========== Catalog Thumbnail Index ==========
+class ThumbnailIndex:
+    """Item name -> pre-encoded thumbnail, filled in the background when the catalog loads."""
+
+    def __init__(self, retry_seconds=THUMBNAIL_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self._entries = {}   # name -> (url, thumbnail bytes or None if it failed, built at)
+        self._pending = {}   # name -> url still being built
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def rebuild(self, image_urls):
+        """Start a background build for {item name: image url}.
+
+        Entries whose URL did not change are kept, except failed ones, which
+        are tried again; a build started by an older catalog load stops as
+        soon as a newer one begins.
+        """
+        wanted = {str(name): url for name, url in image_urls.items() if url}
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._entries = {name: entry for name, entry in self._entries.items()
+                             if wanted.get(name) == entry[0] and entry[1] is not None}
+            self._pending = {name: url for name, url in wanted.items() if name not in self._entries}
+            todo = list(self._pending.items())
+        if todo:
+            threading.Thread(target=self._build, args=(generation, todo), daemon=True).start()
+
+    def _build(self, generation, todo):
+        def build_one(item):
+            name, url = item
+            if self._generation != generation:
+                return
+            data = make_thumbnail(url)
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[name] = (url, data, time.time())
+                    self._pending.pop(name, None)
+
+        with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+            list(executor.map(build_one, todo))
+
+    def lookup(self, name, url):
+        """Return ("ready", bytes), ("failed", None), ("pending", None) or (None, None) if not indexed.
+
+        A failed thumbnail (network or Drive hiccup) is rebuilt in the
+        background once it is retry_seconds old.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == url:
+                if entry[1] is not None:
+                    return "ready", entry[1]
+                if time.time() - entry[2] < self.retry_seconds:
+                    return "failed", None
+                del self._entries[name]
+                self._pending[name] = url
+                generation = self._generation
+            elif self._pending.get(name) == url:
+                return "pending", None
+            else:
+                return None, None
+        threading.Thread(target=self._build, args=(generation, [(name, url)]), daemon=True).start()
+        return "pending", None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": sum(1 for _, data, _ in self._entries.values() if data is not None),
+                "failed": sum(1 for _, data, _ in self._entries.values() if data is None),
+                "pending": len(self._pending),
+            }
+
+
+thumbnail_index = ThumbnailIndex()
+
+
+# ========== PDF Page Backgrounds ==========
+PAGE_ASSET_DPI = 150        # Full-page backgrounds are printed at A3; 150 dpi is plenty
+PAGE_ASSET_QUALITY = 80
+A3_WIDTH_PT = 841.89
+
+
+def prepare_page_background(path, dpi=PAGE_ASSET_DPI, quality=PAGE_ASSET_QUALITY):
+    """Downscale and recompress a full-page template image once, returning the optimised path.
+
+    The result is cached on disk, keyed by the source file's path, size and
+    mtime, so later builds embed the small JPEG directly. Falls back to the
+    original path if the asset is missing or cannot be processed.
+    """
+    if not path or not os.path.exists(path):
+        return path
+    try:
+        stat = os.stat(path)
+        key = hashlib.blake2b(
+            f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime}|{dpi}|{quality}".encode(),
+            digest_size=16,
+        ).hexdigest()
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        out_path = os.path.join(IMAGE_CACHE_DIR, f"page_{key}.jpg")
+        if os.path.exists(out_path):
+            return out_path
+        with PILImage.open(path) as img:
+            img = img.convert("RGB")
+            target_width = round(A3_WIDTH_PT / 72 * dpi)
+            if img.width > target_width:
+                target_height = round(img.height * target_width / img.width)
+                img = img.resize((target_width, target_height), PILImage.Resampling.LANCZOS)
+            buf = BytesIO()
+            img.save(buf, format="JPEG", quality=quality, optimize=True, dpi=(dpi, dpi))
+        if buf.tell() >= stat.st_size:
+            return path
+        _write_atomic(out_path, buf.getvalue())
+        return out_path
+    except Exception as e:
+        print(f"Page background optimisation failed for {path}: {e}")
+        return path
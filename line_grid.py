@@ -0,0 +1,125 @@
+"""Grid editor for quotation lines: all catalog lines in one st.data_editor.
+
+Streamlit reruns the whole script on every edit. With one row of widgets
+per line (picker, text area, three number inputs and an image) a single
+quantity change re-creates all of them; the grid is one widget however many
+lines there are. The frame given to the grid is kept unchanged between
+reruns and its edits come back as a diff ({row: {column: value}}) that is
+applied to the editor state, so the browser keeps the grid mounted while
+the user types.
+
+Rows can also be added (bulk entry: type a product name or SKU and,
+optionally, quantity, price, discount and a description override) and
+deleted in the grid; all of it arrives as one diff per rerun. Added rows
+that do not name a catalog product yet stay in the grid as pending rows
+(negative idx) until they are corrected or deleted.
+"""
+import math
+
+import pandas as pd
+
+GRID_EDITOR_THRESHOLD = 8   # Quotations with more lines than this open in the grid editor
+
+# Grid column -> LineItem field
+GRID_COLUMNS = {
+    "Image": "image",
+    "Item": "item",
+    "SKU": "sku",
+    "Description": "description",
+    "Price": "price",
+    "Qty": "quantity",
+    "Disc %": "discount",
+}
+EDITABLE_COLUMNS = ("Item", "Description", "Price", "Qty", "Disc %")
+
+
+def grid_frame(lines, pending=()):
+    """Grid frame for `lines`, a list of dicts with "idx" (the editor row) and LineItem fields.
+
+    `pending` rows (grid cells as typed, {column: value}) follow the lines
+    with idx -1, -2, ...
+    """
+    lines = list(lines) + [{
+        "idx": -1 - i,
+        "item": cells.get("Item", ""),
+        "image": "",
+        "sku": "",
+        "description": cells.get("Description", ""),
+        "price": cells.get("Price", math.nan),
+        "quantity": cells.get("Qty", 1),
+        "discount": cells.get("Disc %", 0.0),
+    } for i, cells in enumerate(pending)]
+    frame = pd.DataFrame(
+        {column: [line[field] for line in lines] for column, field in GRID_COLUMNS.items()},
+        index=pd.Index([line["idx"] for line in lines], name="idx"),
+    )
+    frame["Price"] = frame["Price"].astype(float)
+    frame["Qty"] = frame["Qty"].astype(int)
+    frame["Disc %"] = frame["Disc %"].astype(float)
+    return frame
+
+
+def _valid(column, value):
+    """Cell value coerced to the column's type, or None to keep the previous value."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    try:
+        if column in ("Item", "Description"):
+            text = str(value)
+            return text if column == "Description" or text.strip() else None
+        if column == "Qty":
+            return max(int(value), 1)
+        if column == "Price":
+            return max(float(value), 0.0)
+        if column == "Disc %":
+            return min(max(float(value), 0.0), 100.0)
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def grid_changes(frame, editor_state):
+    """Turn a data_editor state into (changes, removed, added).
+
+    `changes` is {idx: {column: value}} for edited lines, `removed` the idx of
+    deleted lines and `added` one {column: value} dict per new grid row.
+    Values are validated here; unknown columns and unparseable cells are dropped.
+    """
+    editor_state = editor_state or {}
+    changes, removed, added = {}, [], []
+    for position, cells in (editor_state.get("edited_rows") or {}).items():
+        position = int(position)
+        if not 0 <= position < len(frame):
+            continue
+        idx = frame.index[position]
+        for column, value in cells.items():
+            value = _valid(column, value)
+            if value is not None and column in EDITABLE_COLUMNS:
+                changes.setdefault(idx, {})[column] = value
+    for position in editor_state.get("deleted_rows") or []:
+        position = int(position)
+        if 0 <= position < len(frame):
+            removed.append(frame.index[position])
+    for cells in editor_state.get("added_rows") or []:
+        row = {}
+        for column, value in cells.items():
+            value = _valid(column, value)
+            if value is not None and column in EDITABLE_COLUMNS:
+                row[column] = value
+        added.append(row)
+    return changes, removed, added
+
+
+def apply_changes(frame, changes, removed=()):
+    """Copy of `frame` with `changes` applied and `removed` rows dropped."""
+    frame = frame.drop(index=list(removed))
+    for idx, cells in changes.items():
+        if idx in frame.index:
+            for column, value in cells.items():
+                frame.at[idx, column] = value
+    return frame
+
+
+def same_lines(a, b):
+    """Whether two grid frames show the same lines and values."""
+    return a.index.equals(b.index) and a.equals(b)
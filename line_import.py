@@ -0,0 +1,141 @@
+"""Import quotation lines from a CSV or Excel sheet of SKUs and quantities.
+
+Rows are read one at a time (csv reader, openpyxl in read-only mode), each
+SKU or product name is resolved against the catalog's lookup table, and the
+result is handed back as plain line dicts so the editor can add them all in
+a single state update.
+"""
+import csv
+import io
+import math
+import os
+
+IMPORT_MAX_LINES = 5000
+IMPORT_EXTENSIONS = ("csv", "xlsx")
+
+# Line field -> accepted header names (compared lower-cased, spaces trimmed)
+IMPORT_COLUMNS = {
+    "sku": ("sku", "code", "item code", "product code", "الكود", "كود"),
+    "item": ("item", "item name", "product", "product name", "name", "الصنف", "المنتج"),
+    "quantity": ("qty", "quantity", "qty.", "quantities", "الكمية", "العدد"),
+    "price": ("price", "unit price", "price per item", "selling price", "السعر"),
+    "discount": ("discount", "discount %", "disc", "disc %", "الخصم"),
+    "description": ("description", "sales description", "notes", "الوصف"),
+}
+# Column order assumed when the sheet has no recognisable header
+POSITIONAL_COLUMNS = ("sku", "quantity", "price", "discount", "description")
+
+
+class ImportResult:
+    """Resolved lines plus the rows that could not be imported (with their sheet row numbers)."""
+
+    __slots__ = ("lines", "unknown", "invalid", "rows", "truncated")
+
+    def __init__(self):
+        self.lines = []       # {"item", "quantity", optional "price", "discount", "description"}
+        self.unknown = []     # (row number, SKU or name as typed)
+        self.invalid = []     # (row number, reason)
+        self.rows = 0
+        self.truncated = False
+
+
+def _cell_text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)   # Numeric SKUs come out of Excel as floats
+    return str(value).strip()
+
+
+def _number(text):
+    text = text.replace(",", "").replace("%", "").strip()
+    return float(text) if text else None
+
+
+def iter_rows(data, filename):
+    """Rows of an uploaded file as lists of cell text."""
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension == "xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Reading .xlsx files needs the openpyxl package; upload a CSV instead") from None
+        workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield [_cell_text(v) for v in row]
+        finally:
+            workbook.close()
+    elif extension == "csv":
+        text = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", errors="replace", newline="")
+        dialect = csv.excel
+        try:
+            dialect = csv.Sniffer().sniff(text.read(4096), delimiters=",;\t")
+        except csv.Error:
+            pass
+        text.seek(0)
+        for row in csv.reader(text, dialect):
+            yield [cell.strip() for cell in row]
+    else:
+        raise ValueError(f"Unsupported file type '.{extension}' (use {', '.join(IMPORT_EXTENSIONS)})")
+
+
+def _header_columns(row):
+    """{field: column position} for a header row, or None if it is not a header."""
+    aliases = {alias: field for field, names in IMPORT_COLUMNS.items() for alias in names}
+    columns = {}
+    for position, cell in enumerate(row):
+        field = aliases.get(" ".join(cell.lower().split()))
+        if field and field not in columns:
+            columns[field] = position
+    return columns if "sku" in columns or "item" in columns else None
+
+
+def import_lines(rows, resolve, max_lines=IMPORT_MAX_LINES):
+    """Validate rows and resolve their SKU (or product name) with `resolve(text) -> name or None`."""
+    result = ImportResult()
+    columns = None
+    for number, row in enumerate(rows, start=1):
+        if not any(row):
+            continue
+        if columns is None:
+            columns = _header_columns(row)
+            if columns is not None:
+                continue
+            columns = {field: i for i, field in enumerate(POSITIONAL_COLUMNS)}
+        if len(result.lines) >= max_lines:
+            result.truncated = True
+            break
+        result.rows += 1
+
+        def cell(field):
+            position = columns.get(field)
+            return row[position] if position is not None and position < len(row) else ""
+
+        key = cell("sku") or cell("item")
+        if not key:
+            result.invalid.append((number, "no SKU or product name"))
+            continue
+        try:
+            quantity = _number(cell("quantity"))
+            price = _number(cell("price"))
+            discount = _number(cell("discount"))
+        except ValueError:
+            result.invalid.append((number, f"'{key}': quantity, price and discount must be numbers"))
+            continue
+        if quantity is not None and (quantity < 1 or not quantity.is_integer()):
+            result.invalid.append((number, f"'{key}': quantity must be a whole number of at least 1"))
+            continue
+        name = resolve(cell("sku")) or resolve(cell("item"))
+        if name is None:
+            result.unknown.append((number, key))
+            continue
+        line = {"item": name, "quantity": int(quantity or 1)}
+        if price is not None and price >= 0:
+            line["price"] = price
+        if discount is not None:
+            line["discount"] = min(max(discount, 0.0), 100.0)
+        if cell("description"):
+            line["description"] = cell("description")
+        result.lines.append(line)
+    return result
@@ -0,0 +1,70 @@
+"""CSV-backed stand-in for the products worksheet, for running the catalog sync without Google Sheets.
+
+Set CATALOG_LOCAL_SHEET=/path/to/products.csv (first row = sheet header) and
+the app reads the catalog from that file; editing and saving the file acts
+like editing the sheet. Admin product edits are not supported.
+"""
+import csv
+import os
+from datetime import datetime, timezone
+
+from gspread.utils import a1_to_rowcol
+
+
+class _LocalSpreadsheet:
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def get_lastUpdateTime(self):
+        mtime = os.path.getmtime(self._worksheet.path)
+        return datetime.fromtimestamp(mtime, tz=timezone.utc).isoformat()
+
+
+class LocalWorksheet:
+    """The subset of gspread.Worksheet that catalog_sync uses."""
+
+    def __init__(self, path, title="ALL"):
+        self.path = path
+        self.title = title
+        self.spreadsheet = _LocalSpreadsheet(self)
+        self._values = []
+        self._mtime = None
+
+    def _rows(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with open(self.path, newline="", encoding="utf-8-sig") as f:
+                self._values = [row for row in csv.reader(f)]
+            self._mtime = mtime
+        return self._values
+
+    @property
+    def row_count(self):
+        return len(self._rows())
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self._rows()), default=0)
+
+    def get_values(self, *args, **kwargs):
+        return [list(row) for row in self._rows()]
+
+    def col_values(self, col, **kwargs):
+        values = [row[col - 1] if col - 1 < len(row) else "" for row in self._rows()]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def batch_get(self, ranges, **kwargs):
+        rows = self._rows()
+        result = []
+        for a1 in ranges:
+            start, _, end = a1.partition(":")
+            if start.isdigit():
+                first, last = int(start), int(end or start)
+                first_col, last_col = 1, self.col_count
+            else:
+                first, first_col = a1_to_rowcol(start)
+                last, last_col = a1_to_rowcol(end or start)
+            result.append([row[first_col - 1:last_col] for row in rows[first - 1:last]])
+        return result
@@ -0,0 +1,122 @@
+"""Bounded cache of generated quotation PDFs (memory LRU plus optional disk tier)."""
+import hashlib
+import os
+import tempfile
+import threading
+
+from byte_lru import ByteLRU
+from quotation import VOLATILE_COMPANY_FIELDS, quotation_hash
+
+# Bump whenever the PDF layout or template assets change so old artifacts are not reused.
+PDF_TEMPLATE_VERSION = "2025.10-1"
+
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024          # In-memory budget
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR")  # Set to enable the disk tier
+PDF_CACHE_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+
+def pdf_cache_key(kind, items, total, company_details, assets=()):
+    """Key for a rendered PDF: the canonical quotation hash plus layout kind and template.
+
+    The printed dates are clock-derived and excluded from the quotation hash,
+    but they appear on the page, so they are part of the artifact key.
+    """
+    details = company_details or {}
+    parts = [
+        kind,
+        PDF_TEMPLATE_VERSION,
+        *[str(a) for a in assets],
+        quotation_hash(items, total, details),
+        *[str(details.get(field, "")) for field in sorted(VOLATILE_COMPANY_FIELDS)],
+    ]
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=20).hexdigest()
+
+
+class PDFCache(ByteLRU):
+    """Byte-bounded LRU of PDF bytes; evicted entries fall back to an optional disk directory."""
+
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES, disk_dir=PDF_CACHE_DIR,
+                 disk_max_bytes=PDF_CACHE_DISK_MAX_BYTES):
+        super().__init__(max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        # Running size of the disk tier, so a put does not have to stat the whole directory
+        self._disk_bytes = None
+        self._disk_lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pdf")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            path = self._disk_path(key)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, None)
+            return data
+        except OSError:
+            return None
+
+    def _save(self, key, data):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = self._disk_path(key)
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"PDF disk cache write failed: {e}")
+            return
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_bytes += len(data) - replaced
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        """(mtime, size, path) of every cached PDF; files removed meanwhile are skipped."""
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".pdf")]
+        except FileNotFoundError:
+            return []
+        stats = []
+        for e in entries:
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            stats.append((st.st_mtime, st.st_size, e.path))
+        return stats
+
+    def _evict_disk(self):
+        """Delete the least recently used PDFs until the disk tier fits in disk_max_bytes."""
+        with self._disk_lock:
+            stats = self._scan_disk()
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in sorted(stats):
+                if total <= self.disk_max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"PDF disk cache eviction failed: {e}")
+                    continue
+                total -= size
+            # Other processes may share the directory; the next scan corrects the running total
+            self._disk_bytes = total
+
+pdf_cache = PDFCache()
@@ -0,0 +1,140 @@
+"""Quotation pricing: every total shown in the editor, the PDFs and Zoho comes from here.
+
+Money is exact: prices, fees and all amounts are integer piasters (int64
+arrays for lines), discounts and the VAT rate are basis points, and each
+division rounds half up exactly once. Lines are priced as arrays in one pass
+and the quotation-level figures (overall discount, fees, VAT) are derived
+from the line sums, so the line table always adds up to the summary below it.
+"""
+from operator import attrgetter
+
+import numpy as np
+
+from quotation import as_line_items
+
+MAX_ITEM_DISCOUNT = 20.0   # Line discounts above this (%) are ignored
+DEFAULT_VAT_RATE = 0.14
+
+_BASIS = 10_000            # 100% in basis points
+
+
+def to_piasters(values):
+    """EGP amounts (a float or an array) as integer piasters, rounded half up: 2.675 -> 268."""
+    cents = np.round(np.asarray(values, dtype=np.float64) * 100, 6)
+    piasters = np.copysign(np.floor(np.abs(cents) + 0.5), cents).astype(np.int64)
+    return int(piasters) if piasters.ndim == 0 else piasters
+
+
+def _percent_points(percent):
+    """Percentages (12.5) as basis points (1250)."""
+    return to_piasters(percent)
+
+
+def _div_round(numerator, denominator):
+    """Non-negative integer (or int64 array) division rounded half up."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def money(piasters):
+    """Piasters as an EGP float, for widgets, JSON and the history sheet."""
+    return int(piasters) / 100
+
+
+def format_money(piasters):
+    """Piasters as "1234.50", formatted from the integer rather than a float."""
+    piasters = int(piasters)
+    sign = "-" if piasters < 0 else ""
+    whole, cents = divmod(abs(piasters), 100)
+    return f"{sign}{whole}.{cents:02d}"
+
+
+def line_arrays(items):
+    """(quantities, prices, discounts) columns for a list of line items."""
+    lines = as_line_items(items)
+    count = len(lines)
+    return (np.fromiter(map(attrgetter("quantity"), lines), dtype=np.int64, count=count),
+            np.fromiter(map(attrgetter("price"), lines), dtype=np.float64, count=count),
+            np.fromiter(map(attrgetter("discount"), lines), dtype=np.float64, count=count))
+
+
+# Figures fixed by the lines themselves, shared by every apply() of the same lines
+_LINE_FIELDS = ("quantities", "prices", "discounts", "unit_net", "line_before", "line_totals",
+                "line_discounts", "subtotal_before", "item_discount", "subtotal_after",
+                "has_item_discounts")
+
+
+class QuotationTotals:
+    """Priced lines plus the quotation summary.
+
+    Amounts are integer piasters (int64 arrays per line, ints for the
+    summary); format them with format_money or convert with money.
+    """
+
+    __slots__ = _LINE_FIELDS + ("overall_discount", "overall_discount_amount", "final_total",
+                                "shipping_fee", "installation_fee", "vat_rate", "vat", "grand_total")
+
+    def apply(self, overall_discount=0.0, shipping_fee=0.0, installation_fee=0.0,
+              vat_rate=DEFAULT_VAT_RATE, final_total=None):
+        """Quotation-level figures on top of the priced lines (cheap, no per-line work).
+
+        Fees and `final_total` are in EGP. An overall discount (%) only applies
+        when no line has its own discount. Pass `final_total` instead when the
+        discounted total was agreed earlier (PDFs get it from the editor); the
+        overall discount is then whatever separates it from the line subtotal.
+        """
+        totals = QuotationTotals.__new__(QuotationTotals)
+        for name in _LINE_FIELDS:
+            setattr(totals, name, getattr(self, name))
+        subtotal = self.subtotal_after
+        if final_total is not None:
+            gap = subtotal - to_piasters(final_total)
+            amount = gap if gap > 1 else 0
+            overall_discount = amount * 100 / subtotal if subtotal else 0.0
+        elif self.has_item_discounts or not overall_discount or overall_discount <= 0:
+            overall_discount, amount = 0.0, 0
+        else:
+            amount = _div_round(subtotal * _percent_points(overall_discount), _BASIS)
+        totals.overall_discount = float(overall_discount)
+        totals.overall_discount_amount = amount
+        totals.final_total = subtotal - amount
+        totals.shipping_fee = max(to_piasters(shipping_fee or 0.0), 0)
+        totals.installation_fee = max(to_piasters(installation_fee or 0.0), 0)
+        totals.vat_rate = float(vat_rate)
+        # VAT is charged on the goods and shipping, not on installation
+        totals.vat = _div_round((totals.final_total + totals.shipping_fee) * _percent_points(vat_rate * 100),
+                                _BASIS)
+        totals.grand_total = totals.final_total + totals.shipping_fee + totals.installation_fee + totals.vat
+        return totals
+
+
+def price_lines(quantities, prices, discounts):
+    """Price every line in one vectorised pass; apply() the result for the quotation totals.
+
+    `prices` are EGP and `discounts` percentages, as entered in the editor.
+    """
+    quantities = np.asarray(quantities, dtype=np.int64)
+    discounts = np.asarray(discounts, dtype=np.float64)
+    discounts = np.where((discounts > MAX_ITEM_DISCOUNT) | ~(discounts > 0), 0.0, discounts)
+    prices = np.maximum(to_piasters(np.atleast_1d(prices)), 0)
+    points = _percent_points(np.atleast_1d(discounts))
+
+    lines = QuotationTotals.__new__(QuotationTotals)
+    lines.quantities, lines.prices, lines.discounts = quantities, prices, discounts
+    lines.line_before = prices * quantities
+    # Each line total is rounded once, so the error does not grow with the quantity;
+    # unit_net is the rounded net price shown per unit
+    lines.line_totals = _div_round(lines.line_before * (_BASIS - points), _BASIS)
+    lines.unit_net = _div_round(prices * (_BASIS - points), _BASIS)
+    lines.line_discounts = lines.line_before - lines.line_totals
+    lines.subtotal_before = int(lines.line_before.sum())
+    lines.subtotal_after = int(lines.line_totals.sum())
+    lines.item_discount = lines.subtotal_before - lines.subtotal_after
+    lines.has_item_discounts = bool((points > 0).any())
+    return lines.apply()
+
+
+def price_quotation(items, overall_discount=0.0, shipping_fee=0.0, installation_fee=0.0,
+                    vat_rate=DEFAULT_VAT_RATE, final_total=None):
+    """QuotationTotals for a list of line items (LineItem objects or history dicts)."""
+    return price_lines(*line_arrays(items)).apply(overall_discount, shipping_fee, installation_fee,
+                                                 vat_rate, final_total)
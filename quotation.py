@@ -0,0 +1,172 @@
+"""Quotation model helpers shared by the builder and the history page."""
+import hashlib
+import json
+import math
+from decimal import Decimal, InvalidOperation
+
+# Fields derived from the clock rather than from what was quoted; identical
+# quotations prepared on different days must hash the same.
+VOLATILE_COMPANY_FIELDS = {"current_date", "valid_till"}
+
+_DECIMAL_STEP = Decimal("0.000001")
+
+
+def _canonical_number(value):
+    """Render ints, floats and Decimals the same way: 2, 2.0 and 2.000000001 all become "2"."""
+    try:
+        if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+            return None
+        number = Decimal(str(value)).quantize(_DECIMAL_STEP).normalize()
+    except (InvalidOperation, ValueError):
+        return str(value)
+    text = format(number, "f")
+    return "0" if text in ("-0", "") else text
+
+
+def canonical_value(value):
+    """Recursively normalise a value for hashing: sorted dicts, decimal numbers, stripped text."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, LineItem):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {str(k): canonical_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_value(v) for v in value]
+    if isinstance(value, (int, float, Decimal)) or hasattr(value, "dtype"):
+        return _canonical_number(value)
+    text = str(value).strip()
+    return None if text.lower() == "nan" else text
+
+
+def canonical_quotation(items, total, company_details, kind=None):
+    """Stable JSON serialisation of a quotation, ignoring clock-derived fields.
+
+    `kind` (the PDF layout, e.g. "financial") is included when given, so the
+    same lines saved as two kinds of PDF are two history records.
+    """
+    details = {k: v for k, v in (company_details or {}).items() if k not in VOLATILE_COMPANY_FIELDS}
+    payload = {
+        "items": canonical_value(list(items or [])),
+        "total": canonical_value(total),
+        "company_details": canonical_value(details),
+    }
+    if kind:
+        payload["kind"] = str(kind)
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def quotation_hash(items, total, company_details, kind=None):
+    """Content hash of a quotation (32 hex chars, the same width as the legacy md5 hashes)."""
+    return hashlib.blake2b(canonical_quotation(items, total, company_details, kind).encode("utf-8"),
+                           digest_size=16).hexdigest()
+
+
+# ========== Line items ==========
+# Attribute -> key used in history JSON, the editor table and older code
+LINE_ITEM_KEYS = {
+    "item": "Item",
+    "description": "Description",
+    "color": "Color",
+    "dimensions": "Dimensions",
+    "image": "Image",
+    "quantity": "Quantity",
+    "price": "Price per item",
+    "discount": "Discount %",
+    "total": "Total price",
+    "sku": "SKU",
+    "warranty": "Warranty",
+}
+_LINE_ITEM_ATTRS = {key: attr for attr, key in LINE_ITEM_KEYS.items()}
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    text = str(value)
+    return "" if text.strip().lower() == "nan" else text
+
+
+def _number(value, default=0.0):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(number) or math.isinf(number) else number
+
+
+class LineItem:
+    """One quotation line with typed fields.
+
+    Build it with from_dict (the only place raw values are parsed) and write
+    it out with to_dict; `item["Price per item"]` style reads still work for
+    code that handles history records and line items alike.
+    """
+
+    __slots__ = ("item", "description", "color", "dimensions", "image", "quantity",
+                 "price", "discount", "total", "sku", "warranty", "is_custom")
+
+    def __init__(self, item, quantity=1, price=0.0, discount=0.0, total=None, description="",
+                 color="", dimensions="", image="", sku="", warranty="", is_custom=False):
+        self.item = _text(item)
+        self.quantity = max(int(_number(quantity, 1)), 1)
+        self.price = max(_number(price), 0.0)
+        self.discount = min(max(_number(discount), 0.0), 100.0)
+        self.total = (self.price * (1 - self.discount / 100) * self.quantity if total is None
+                      else _number(total))
+        self.description = _text(description)
+        self.color = _text(color)
+        self.dimensions = _text(dimensions)
+        self.image = _text(image)
+        self.sku = _text(sku)
+        self.warranty = _text(warranty)
+        self.is_custom = bool(is_custom)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Line item from an editor/history dict; missing or malformed values get safe defaults."""
+        if isinstance(data, cls):
+            return data
+        kwargs = {attr: data[key] for attr, key in LINE_ITEM_KEYS.items() if key in data}
+        if "total" in kwargs and _number(kwargs["total"], None) is None:
+            del kwargs["total"]
+        return cls(is_custom=data.get("is_custom", False), **kwargs)
+
+    def to_dict(self):
+        data = {key: getattr(self, attr) for attr, key in LINE_ITEM_KEYS.items()}
+        if self.is_custom:
+            data["is_custom"] = True
+        return data
+
+    def __getitem__(self, key):
+        if key == "is_custom":
+            return self.is_custom
+        try:
+            return getattr(self, _LINE_ITEM_ATTRS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        return isinstance(other, LineItem) and all(
+            getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __repr__(self):
+        return f"LineItem({self.item!r}, quantity={self.quantity}, price={self.price}, discount={self.discount})"
+
+
+def as_line_items(items):
+    """Line items from a mix of LineItem objects and dicts (e.g. restored history)."""
+    return [LineItem.from_dict(item) for item in items or []]
+
+
+def line_item_dicts(items):
+    """Plain dicts for JSON, the history sheet and DataFrames."""
+    return [LineItem.from_dict(item).to_dict() for item in items or []]
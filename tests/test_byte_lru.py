@@ -0,0 +1,39 @@
+from byte_lru import ByteLRU
+from pdf_cache import PDFCache
+
+
+def test_evicts_least_recently_used_over_budget():
+    cache = ByteLRU(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    stats = cache.stats()
+    assert stats["bytes"] == 8 and stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_replacing_a_key_keeps_the_size_right():
+    cache = ByteLRU(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("a", b"aa")
+    assert cache.stats()["bytes"] == 2
+
+
+def test_values_larger_than_the_budget_are_not_kept():
+    cache = ByteLRU(max_bytes=4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_pdf_cache_falls_back_to_disk(tmp_path):
+    cache = PDFCache(max_bytes=4, disk_dir=str(tmp_path))
+    cache.put("k1", b"%PDF1")
+    cache.put("k2", b"%PDF2")
+    fresh = PDFCache(max_bytes=4, disk_dir=str(tmp_path))
+    assert fresh.get("k1") == b"%PDF1"
+    assert fresh.get("missing") is None
+    assert (fresh.hits, fresh.misses) == (1, 1)
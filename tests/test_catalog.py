@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from catalog import DRIVE_DOWNLOAD_URL, clean_text, normalize_catalog, parse_prices
+
+
+def test_parse_prices_reads_the_sheet_formats():
+    prices = pd.Series(["1,250.50 EGP", "1.234,50", "1,234", "12,5", "L.E. 99", "E£ 10", "٣٤٠٠ جنيه",
+                        "١٢٣٤٫٥ ج.م", "$15", "-20", "call us", "", None, 7, 7.5])
+    assert parse_prices(prices).tolist() == [1250.5, 1234.5, 1234.0, 12.5, 99.0, 10.0, 3400.0, 1234.5, 15.0,
+                                             -20.0, 0.0, 0.0, 0.0, 7.0, 7.5]
+
+
+def test_parse_prices_keeps_the_index_and_numeric_columns():
+    prices = pd.Series(["100", "100", np.nan], index=[5, 9, 2])
+    parsed = parse_prices(prices)
+    assert parsed.index.tolist() == [5, 9, 2]
+    assert parsed.tolist() == [100.0, 100.0, 0.0]
+    numeric = parse_prices(pd.Series([1.5, np.nan, 3]))
+    assert numeric.dtype == np.float64 and numeric.tolist() == [1.5, 0.0, 3.0]
+
+
+def test_clean_text():
+    assert clean_text(pd.Series([1001.0, np.nan, 2.5])).tolist() == ["1001", "", "2.5"]
+    assert clean_text(pd.Series(["FT-1", None, 1002.0, 7])).tolist() == ["FT-1", "", "1002", "7"]
+    assert clean_text(pd.Series(["a", None])).tolist() == ["a", ""]
+
+
+def test_normalize_catalog():
+    df = pd.DataFrame({
+        "Item Name": ["Chair", "Desk", np.nan],
+        "SKU": [1001.0, np.nan, 1003.0],
+        "Selling Price": ["1,250 EGP", "n/a", "300"],
+        "CF.image url": ["https://drive.google.com/file/d/abc_123/view?usp=sharing",
+                         "https://example.com/desk.png", np.nan],
+        "Other": [1, 2, 3],
+    })
+    out = normalize_catalog(df)
+    assert out["Item Name"].tolist() == ["Chair", "Desk", ""]
+    assert out["SKU"].tolist() == ["1001", "", "1003"]
+    assert out["Selling Price"].tolist() == [1250.0, 0.0, 300.0]
+    assert out["CF.image url"].tolist() == [DRIVE_DOWNLOAD_URL + "abc_123", "https://example.com/desk.png", ""]
+    assert out["Other"].tolist() == [1, 2, 3]
+
+
+def test_older_catalog_on_a_shared_index_only_returns_its_own_products():
+    from catalog import Catalog
+    from catalog_search import CatalogSearchIndex
+
+    index = CatalogSearchIndex()
+    old = Catalog(normalize_catalog(pd.DataFrame({"Item Name": ["Oak Desk", "Oak Chair"],
+                                                  "Selling Price": ["100", "50"]})), search_index=index)
+    new = Catalog(normalize_catalog(pd.DataFrame({"Item Name": ["Oak Desk", "Oak Shelf"],
+                                                  "Selling Price": ["100", "80"]})), search_index=index)
+    assert sorted(new.search("oak")[0]) == ["Oak Desk", "Oak Shelf"]
+    assert old.search("oak")[0] == ["Oak Desk"]
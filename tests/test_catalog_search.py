@@ -0,0 +1,83 @@
+import catalog_search
+from catalog_search import CatalogSearchIndex
+
+PRODUCTS = {
+    "Chair Pro": {"name": "Chair Pro", "sku": "FT-001", "description": "Ergonomic office chair"},
+    "Office Armchair": {"name": "Office Armchair", "sku": "FT-002", "description": "Leather"},
+    "Meeting Table": {"name": "Meeting Table", "sku": "FT-003", "description": "Oak, seats eight"},
+    "Bookshelf": {"name": "Bookshelf", "sku": "FT-004", "description": "Five shelves"},
+}
+
+
+def make_index():
+    index = CatalogSearchIndex()
+    index.sync(PRODUCTS)
+    return index
+
+
+def substring_matches(query):
+    """What the old str.contains search over the product fields found."""
+    q = query.lower()
+    return {name for name, record in PRODUCTS.items()
+            if any(q in str(value).lower() for value in record.values())}
+
+
+def test_substring_inside_a_word_still_matches():
+    names, total = make_index().search("chair")
+    assert set(names) == {"Chair Pro", "Office Armchair"}
+    assert total == 2
+    assert names[0] == "Chair Pro"   # Whole-word matches rank first
+
+
+def test_returns_at_least_what_substring_search_did():
+    index = make_index()
+    for query in ("chair", "armch", "shelf", "ft-00", "eat", "office arm", "oak, seats"):
+        names, _ = index.search(query)
+        assert substring_matches(query) <= set(names), query
+
+
+def test_typos_and_prefixes():
+    index = make_index()
+    assert index.search("meetnig")[0] == ["Meeting Table"]
+    assert index.search("book")[0] == ["Bookshelf"]
+
+
+def test_substring_matches_follow_updates():
+    index = make_index()
+    index.remove("Office Armchair")
+    assert index.search("chair")[0] == ["Chair Pro"]
+    index.upsert("Armchair Lite", {"name": "Armchair Lite", "sku": "FT-005"})
+    assert set(index.search("chair")[0]) == {"Chair Pro", "Armchair Lite"}
+
+
+def test_short_tokens_do_not_match_inside_words():
+    index = CatalogSearchIndex()
+    index.sync({"A": {"name": "A", "sku": "FT120"}, "B": {"name": "B", "sku": "FT512"},
+                "C": {"name": "C", "sku": "12"}})
+    assert index.search("12")[0] == ["C"]           # Exact or prefix only
+    assert set(index.search("120")[0]) == {"A"}
+    assert set(index.search("512")[0]) == {"B"}
+
+
+def test_substring_matches_are_capped(monkeypatch):
+    monkeypatch.setattr(catalog_search, "MAX_SUBSTRING_EXPANSION", 5)
+    index = CatalogSearchIndex()
+    index.sync({f"P{i}": {"name": f"P{i}", "sku": f"x{i:03d}abc"} for i in range(50)})
+    names, total = index.search("abc ")
+    assert total == 5 and len(names) == 5
+
+
+def test_catalog_search_finds_words_containing_the_query():
+    import pandas as pd
+
+    from catalog import Catalog, normalize_catalog
+
+    catalog = Catalog(normalize_catalog(pd.DataFrame({
+        "Item Name": list(PRODUCTS),
+        "Selling Price": ["100"] * len(PRODUCTS),
+        "SKU": [record["sku"] for record in PRODUCTS.values()],
+        "Sales Description": [record["description"] for record in PRODUCTS.values()],
+    }).astype(object)))
+    names, total = catalog.search("chair")
+    assert names[0] == "Chair Pro"
+    assert set(names) == {"Chair Pro", "Office Armchair"} and total == 2
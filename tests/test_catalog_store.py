@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog_store import CatalogStore
+
+
+def make_df():
+    return pd.DataFrame({"Item Name": ["Chair", "Desk"], "SKU": ["FT-1", None],
+                         "Selling Price": [1250.5, 700.0], "Stock": [3, 0]})
+
+
+def unreachable():
+    raise RuntimeError("sheet unreachable")
+
+
+def test_new_process_serves_the_disk_copy(tmp_path):
+    path = str(tmp_path / "catalog.sqlite")
+    CatalogStore(path).get(lambda: (make_df(), "rev-1"))
+    store = CatalogStore(path)
+    df = store.get(unreachable)
+    pd.testing.assert_frame_equal(df, make_df().fillna(np.nan))
+    assert store.stats()["source"] == "disk"
+    assert store.stats()["revision"] == "rev-1"
+    assert store.lookup("SKU", "FT-1")["Item Name"].tolist() == ["Chair"]
+
+
+def test_sheet_errors_serve_the_local_copy(tmp_path):
+    store = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    with pytest.raises(RuntimeError):
+        store.get(unreachable)
+    store.get(lambda: (make_df(), "rev-1"))
+    store.invalidate()
+    df = store.get(unreachable)
+    assert df["Item Name"].tolist() == ["Chair", "Desk"]
+    assert store.last_error == "sheet unreachable"
+
+
+def test_old_copy_refreshes_in_the_background(tmp_path):
+    store = CatalogStore(str(tmp_path / "catalog.sqlite"), max_age=0)
+    store.get(lambda: (make_df(), "rev-1"))
+    newer = make_df().assign(**{"Selling Price": [1300.0, 700.0]})
+
+    def slow_fetch():
+        time.sleep(0.2)
+        return newer, "rev-2"
+
+    # The current copy comes back at once, the refresh lands later
+    assert store.get(slow_fetch)["Selling Price"].tolist() == [1250.5, 700.0]
+    deadline = time.time() + 5
+    while store.stats()["revision"] != "rev-2" and time.time() < deadline:
+        time.sleep(0.02)
+    assert store.stats()["revision"] == "rev-2"
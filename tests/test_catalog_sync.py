@@ -0,0 +1,127 @@
+import csv
+import os
+
+import pandas as pd
+import pytest
+
+from catalog import normalize_catalog
+from catalog_sync import CatalogSync
+from local_sheet import LocalWorksheet
+
+HEADER = ["Item Name", "SKU", "Selling Price", "CF.image url", "Sales Description"]
+
+
+def products(count=6):
+    return [[f"Chair {i}", str(1000 + i), f"{100 + i}.50 EGP", "", f"Chair number {i}"] for i in range(count)]
+
+
+class Sheet:
+    """A LocalWorksheet over a CSV file whose modified time moves forward on every write."""
+
+    def __init__(self, path, rows):
+        self.path = str(path)
+        self.mtime = 1_700_000_000
+        self.write(rows)
+        self.worksheet = LocalWorksheet(self.path)
+
+    def write(self, rows):
+        with open(self.path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        self.mtime += 10
+        os.utime(self.path, (self.mtime, self.mtime))
+
+
+def full_parse(sheet):
+    """What a fresh process (no snapshot) parses from the same sheet."""
+    return CatalogSync(normalize=normalize_catalog).refresh(LocalWorksheet(sheet.path))
+
+
+@pytest.fixture
+def synced(tmp_path):
+    sheet = Sheet(tmp_path / "products.csv", [HEADER] + products())
+    sync = CatalogSync(normalize=normalize_catalog)
+    sync.refresh(sheet.worksheet)
+    assert sync.last_sync["mode"] == "full"
+    return sheet, sync
+
+
+def assert_matches_full_parse(df, sheet):
+    pd.testing.assert_frame_equal(df, full_parse(sheet))
+
+
+def test_unchanged_sheet_returns_the_snapshot(synced):
+    sheet, sync = synced
+    df = sync.snapshot_df
+    assert sync.refresh(sheet.worksheet) is df
+    assert sync.last_sync["mode"] == "unchanged"
+
+
+def test_edited_row_is_the_only_one_parsed(synced):
+    sheet, sync = synced
+    rows = products()
+    rows[2][2] = "1.234,75"
+    sheet.write([HEADER] + rows)
+    df = sync.refresh(sheet.worksheet)
+    assert (sync.last_sync["mode"], sync.last_sync["rows_parsed"]) == ("content", 1)
+    assert df["Selling Price"][2] == 1234.75
+    assert_matches_full_parse(df, sheet)
+
+
+def test_reordered_rows_are_reused(synced):
+    sheet, sync = synced
+    rows = products()
+    rows = rows[3:] + rows[:3]
+    rows[0][4] = "Now with armrests"
+    sheet.write([HEADER] + rows + [["Desk", "2000", "700", "", "New"]])
+    df = sync.refresh(sheet.worksheet)
+    assert (sync.last_sync["mode"], sync.last_sync["rows_parsed"]) == ("content", 2)
+    assert df["Item Name"].tolist() == [row[0] for row in rows] + ["Desk"]
+    assert_matches_full_parse(df, sheet)
+
+    # Removing rows needs no parsing at all
+    sheet.write([HEADER] + rows[:4])
+    df = sync.refresh(sheet.worksheet)
+    assert (sync.last_sync["mode"], sync.last_sync["rows_parsed"]) == ("content", 0)
+    assert_matches_full_parse(df, sheet)
+
+
+def test_header_change_parses_everything(synced):
+    sheet, sync = synced
+    sheet.write([HEADER[:-1] + ["CF.Colors"]] + products())
+    df = sync.refresh(sheet.worksheet)
+    assert sync.last_sync["mode"] == "full"
+    assert "CF.Colors" in df.columns
+    assert_matches_full_parse(df, sheet)
+
+
+def test_checksum_column_fetches_only_new_checksums(tmp_path):
+    header = HEADER + ["Row Checksum"]
+    rows = [row + [f"c{i}"] for i, row in enumerate(products())]
+    sheet = Sheet(tmp_path / "products.csv", [header] + rows)
+    sync = CatalogSync(normalize=normalize_catalog)
+    sync.refresh(sheet.worksheet)
+
+    rows[1][2] = "999"
+    rows[1][-1] = "c1-edited"
+    rows[4][-1] = ""                  # Rows without a checksum are left out
+    sheet.write([header] + rows)
+    df = sync.refresh(sheet.worksheet)
+    assert (sync.last_sync["mode"], sync.last_sync["rows_fetched"], sync.last_sync["rows_parsed"]) == (
+        "checksum", 1, 1)
+    assert "Chair 4" not in df["Item Name"].tolist()
+    assert df["Selling Price"][1] == 999.0
+    assert_matches_full_parse(df, sheet)
+
+
+@pytest.mark.parametrize("column, value", [
+    ("CF.image url", "https://drive.google.com/file/d/abc/view"),   # Text in a column that was all empty
+    ("SKU", "FT-7"),                                                  # Text in a column that was all numbers
+])
+def test_value_that_changes_a_column_type_forces_a_full_parse(synced, column, value):
+    sheet, sync = synced
+    rows = products()
+    rows[3][HEADER.index(column)] = value
+    sheet.write([HEADER] + rows)
+    df = sync.refresh(sheet.worksheet)
+    assert sync.last_sync["mode"] == "full"
+    assert_matches_full_parse(df, sheet)
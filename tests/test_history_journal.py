@@ -0,0 +1,157 @@
+import sqlite3
+import time
+
+import pytest
+
+from history_journal import HISTORY_JOURNAL_KEEP_SECONDS, HISTORY_ROW_HEADER, HistoryJournal
+from history_store import HistoryStore
+from test_history_store import FakeWorksheet, make_row
+
+
+class SheetWorksheet(FakeWorksheet):
+    """FakeWorksheet that also takes appended rows and reads single rows and columns."""
+
+    def __init__(self, rows, **kwargs):
+        super().__init__(rows, **kwargs)
+        self.append_calls = 0
+
+    def append_rows(self, rows):
+        self.append_calls += 1
+        self.rows.extend(list(row) for row in rows)
+
+    def row_values(self, row):
+        return list(self.rows[row - 1])
+
+    def col_values(self, col):
+        return [row[col - 1] for row in self.rows]
+
+
+def test_user_history_merges_the_index_with_pending_rows(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite"), sync_seconds=0, full_sync_seconds=3600)
+    journal = HistoryJournal(str(tmp_path / "journal.sqlite"), store=store)
+    sheet = SheetWorksheet([HISTORY_ROW_HEADER] + [make_row(0), make_row(1, "other@example.com")])
+    journal.append(make_row(2))                    # No worksheet yet: stays pending
+    journal.append(make_row(3, "other@example.com"))
+
+    history = journal.user_history("Me@Example.com", sheet)
+    assert [record.company_name for record in history] == ["Company 0", "Company 2"]
+
+
+class FlakySheet(SheetWorksheet):
+    """Sheet whose append_rows fails while `fail` is set; `partial` rows still land before the failure."""
+
+    def __init__(self, rows, fail=0, partial=0):
+        super().__init__(rows)
+        self.fail = fail
+        self.partial = partial
+        self.attempt_times = []
+
+    def append_rows(self, rows):
+        self.attempt_times.append(time.monotonic())
+        if self.fail:
+            self.fail -= 1
+            self.rows.extend(list(row) for row in rows[:self.partial])
+            raise ConnectionError("sheet unreachable")
+        super().append_rows(rows)
+
+
+def wait_replicated(journal, timeout=5):
+    deadline = time.time() + timeout
+    while (journal.pending_count() or journal._running) and time.time() < deadline:
+        time.sleep(0.01)
+    assert journal.pending_count() == 0
+
+
+def make_journal(tmp_path, **kwargs):
+    kwargs.setdefault("retry_seconds", (0.01,))
+    return HistoryJournal(str(tmp_path / "journal.sqlite"), **kwargs)
+
+
+def hashes(sheet):
+    return [row[7] for row in sheet.rows[1:]]
+
+
+def journal_rows(journal):
+    con = sqlite3.connect(journal.path)
+    try:
+        return con.execute("SELECT hash, replicated_at, attempts FROM journal ORDER BY id").fetchall()
+    finally:
+        con.close()
+
+
+def test_append_keeps_rows_pending_until_there_is_a_worksheet(tmp_path):
+    journal = make_journal(tmp_path)
+    record = journal.append(make_row(1))
+    journal.append(make_row(2, "other@example.com"))
+    assert record.hash == "hash1" and record.company_name == "Company 1"
+    assert [r.hash for r in journal.pending("ME@example.com")] == ["hash1"]
+    assert [r.hash for r in journal.pending()] == ["hash1", "hash2"]
+    assert journal.pending_count() == 2
+    with pytest.raises(ValueError):
+        journal.append(["", "2025-08-01 10:00", "No email"])
+
+
+def test_rows_are_copied_in_batches(tmp_path):
+    copied = []
+    journal = make_journal(tmp_path, batch_size=3, on_replicated=copied.append)
+    for i in range(7):
+        journal.append(make_row(i))
+    sheet = SheetWorksheet([HISTORY_ROW_HEADER])
+    journal.resume(sheet)
+    wait_replicated(journal)
+    assert hashes(sheet) == [f"hash{i}" for i in range(7)]
+    assert sheet.append_calls == 3
+    assert copied == [3, 3, 1]
+    assert journal.last_push["rows"] == 1
+
+
+def test_failed_pushes_are_retried_with_backoff(tmp_path):
+    journal = make_journal(tmp_path, retry_seconds=(0.1, 0.3))
+    sheet = FlakySheet([HISTORY_ROW_HEADER], fail=2)
+    journal.append(make_row(1), sheet)
+    wait_replicated(journal)
+    assert hashes(sheet) == ["hash1"]
+    first, second, third = sheet.attempt_times
+    assert second - first >= 0.1 and third - second >= 0.3
+    assert journal_rows(journal)[0][2] == 2           # attempts
+    assert journal.last_error is None and journal.failing() is None
+
+
+def test_failing_only_reports_errors_of_rows_still_waiting(tmp_path):
+    journal = make_journal(tmp_path, retry_seconds=(60,))
+    sheet = FlakySheet([HISTORY_ROW_HEADER], fail=1)
+    journal.append(make_row(1), sheet)
+    deadline = time.time() + 5
+    while journal.last_error is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert journal.failing() == "sheet unreachable"
+    journal.resume()                                   # Wakes the replicator before its backoff ends
+    wait_replicated(journal)
+    # An error left over from a failure whose rows have since been copied is not reported
+    journal.last_error = "sheet unreachable"
+    assert journal.failing() is None
+
+
+def test_retry_skips_rows_a_failed_push_already_wrote(tmp_path):
+    journal = make_journal(tmp_path, batch_size=3)
+    for i in range(3):
+        journal.append(make_row(i))
+    sheet = FlakySheet([HISTORY_ROW_HEADER], fail=1, partial=2)
+    journal.resume(sheet)
+    wait_replicated(journal)
+    assert hashes(sheet) == ["hash0", "hash1", "hash2"]
+    assert (journal.last_push["rows"], journal.last_push["skipped"]) == (1, 2)
+
+
+def test_replicated_rows_are_pruned_after_the_keep_period(tmp_path):
+    journal = make_journal(tmp_path)
+    sheet = SheetWorksheet([HISTORY_ROW_HEADER])
+    journal.append(make_row(1), sheet)
+    wait_replicated(journal)
+    con = sqlite3.connect(journal.path)
+    with con:
+        con.execute("UPDATE journal SET replicated_at = ?", (time.time() - HISTORY_JOURNAL_KEEP_SECONDS - 60,))
+    con.close()
+    journal.append(make_row(2), sheet)
+    wait_replicated(journal)
+    assert [row[0] for row in journal_rows(journal)] == ["hash2"]
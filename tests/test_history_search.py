@@ -0,0 +1,64 @@
+from datetime import date
+
+from history_search import HistoryQuery, match_expression, parse_query
+
+TODAY = date(2025, 8, 20)
+
+
+def parse(text):
+    return parse_query(text, today=TODAY)
+
+
+def test_quarters():
+    assert parse("q3") == HistoryQuery(date_from="2025-07-01", date_to="2025-10-01")
+    assert parse("q4") == HistoryQuery(date_from="2024-10-01", date_to="2025-01-01")   # Q4 2025 has not started
+    assert parse("q3 2024") == HistoryQuery(date_from="2024-07-01", date_to="2024-10-01")
+    assert parse("2024-q1") == parse("q1-2024") == HistoryQuery(date_from="2024-01-01", date_to="2024-04-01")
+
+
+def test_months_and_days():
+    assert parse("aug") == HistoryQuery(date_from="2025-08-01", date_to="2025-09-01")
+    assert parse("september") == HistoryQuery(date_from="2024-09-01", date_to="2024-10-01")
+    assert parse("dec 2024") == HistoryQuery(date_from="2024-12-01", date_to="2025-01-01")
+    assert parse("2025-02") == HistoryQuery(date_from="2025-02-01", date_to="2025-03-01")
+    assert parse("2024-02-29") == HistoryQuery(date_from="2024-02-29", date_to="2024-03-01")
+    assert parse("in 2024") == HistoryQuery(date_from="2024-01-01", date_to="2025-01-01")
+
+
+def test_after_and_before():
+    assert parse("after q1") == HistoryQuery(date_from="2025-04-01")
+    assert parse("since q1") == HistoryQuery(date_from="2025-01-01")
+    assert parse("before 2025-03") == HistoryQuery(date_to="2025-03-01")
+    assert parse("until 2025-03") == HistoryQuery(date_to="2025-04-01")
+
+
+def test_totals():
+    assert parse("between 50k and 100k") == HistoryQuery(min_total=50_000, max_total=100_000)
+    assert parse("between 100k and 50k") == HistoryQuery(min_total=50_000, max_total=100_000)
+    assert parse(">100k") == HistoryQuery(min_total=100_000)
+    assert parse("<=5,000") == HistoryQuery(max_total=5_000)
+    assert parse("above 1.5m") == HistoryQuery(min_total=1_500_000)
+    assert parse("under 750") == HistoryQuery(max_total=750)
+
+
+def test_sku_and_field_terms():
+    assert parse("sku:FT-1") == HistoryQuery(terms=[("skus", "ft-1")])
+    assert parse("sku FT-1") == HistoryQuery(terms=[("skus", "ft-1")])
+    assert parse("contact:mona acme") == HistoryQuery(terms=[("contact_person", "mona"), (None, "acme")])
+    assert parse("item:chair the quotations") == HistoryQuery(terms=[("item_names", "chair")])
+
+
+def test_mixed_query():
+    query = parse("acme sku:FT-0012 q3 above 100k")
+    assert query == HistoryQuery(terms=[(None, "acme"), ("skus", "ft-0012")], date_from="2025-07-01",
+                                 date_to="2025-10-01", min_total=100_000)
+
+
+def test_bare_year_and_bad_dates_stay_text():
+    assert parse("desk 2000") == HistoryQuery(terms=[(None, "desk"), (None, "2000")])
+    assert parse("2025-13") == HistoryQuery(terms=[(None, "2025-13")])
+    assert not parse("   ")
+
+
+def test_match_expression():
+    assert match_expression([(None, "acme"), ("skus", 'ft"1')]) == '"acme"* AND skus : "ft""1"*'
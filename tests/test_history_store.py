@@ -0,0 +1,188 @@
+import json
+import re
+import threading
+import time
+
+from history_store import HistoryStore
+
+HEADER = ["User Email", "Timestamp", "Company Name", "Contact Person", "Total", "Items JSON", "PDF Filename",
+          "Quotation Hash", "Company Details JSON", "Overall Discount"]
+
+
+class FakeWorksheet:
+    """In-memory gspread.Worksheet: whole-sheet values, A1 ranges and row deletes."""
+
+    def __init__(self, rows, get_values_delay=0.0):
+        self.rows = [list(row) for row in rows]
+        self.get_values_delay = get_values_delay
+        self.get_values_calls = 0
+
+    def get_values(self, *args, **kwargs):
+        self.get_values_calls += 1
+        time.sleep(self.get_values_delay)
+        return [list(row) for row in self.rows]
+
+    def batch_get(self, ranges, **kwargs):
+        result = []
+        for a1 in ranges:
+            if a1 == "1:1":
+                result.append([list(self.rows[0])])
+                continue
+            first, _, last = a1.partition(":")
+            col, row = re.fullmatch(r"([A-Z]+)(\d+)", first).groups()
+            if last:
+                result.append([list(r) for r in self.rows[int(row) - 1:]])
+            else:
+                values = self.rows[int(row) - 1] if int(row) <= len(self.rows) else []
+                index = ord(col) - ord("A")
+                result.append([[values[index]]] if index < len(values) else [])
+        return result
+
+    def delete_rows(self, row):
+        del self.rows[row - 1]
+
+
+def make_row(i, email="me@example.com"):
+    items = [{"Item": f"Chair {i}", "Quantity": 1, "Price per item": 100.0}]
+    return [email, f"2025-08-{i % 28 + 1:02d} 10:00", f"Company {i}", "Contact", 100.0 + i, json.dumps(items),
+            f"q{i}.pdf", f"hash{i}", json.dumps({"company_name": f"Company {i}"}), 0.0]
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("sync_seconds", 0)
+    kwargs.setdefault("full_sync_seconds", 3600)
+    return HistoryStore(str(tmp_path / "history.sqlite"), **kwargs)
+
+
+def companies(store, email="me@example.com"):
+    return [record.company_name for record in store.user_history(email)]
+
+
+def test_incremental_sync_picks_up_appended_rows(tmp_path):
+    sheet = FakeWorksheet([HEADER] + [make_row(i) for i in range(3)] + [make_row(3, "other@example.com")])
+    store = make_store(tmp_path)
+    store.refresh(sheet)
+    assert store.last_sync["mode"] == "full"
+    assert companies(store) == ["Company 0", "Company 1", "Company 2"]
+
+    sheet.rows += [make_row(4), make_row(5)]
+    store.refresh(sheet)
+    assert (store.last_sync["mode"], store.last_sync["rows_fetched"]) == ("incremental", 2)
+    assert sheet.get_values_calls == 1
+    assert companies(store) == ["Company 0", "Company 1", "Company 2", "Company 4", "Company 5"]
+
+
+def test_changed_sheet_falls_back_to_full_sync(tmp_path):
+    sheet = FakeWorksheet([HEADER] + [make_row(i) for i in range(3)])
+    store = make_store(tmp_path)
+    store.refresh(sheet)
+    # Someone removed the last row by hand: the stored fingerprint no longer matches
+    del sheet.rows[-1]
+    sheet.rows.append(make_row(9))
+    store.refresh(sheet)
+    assert store.last_sync["mode"] == "full"
+    assert companies(store) == ["Company 0", "Company 1", "Company 9"]
+
+
+def test_delete_removes_the_row_and_shifts_the_rest(tmp_path):
+    sheet = FakeWorksheet([HEADER] + [make_row(i) for i in range(4)])
+    store = make_store(tmp_path)
+    store.refresh(sheet)
+
+    assert store.delete("hash1", sheet)
+    assert [row[7] for row in sheet.rows[1:]] == ["hash0", "hash2", "hash3"]
+    assert companies(store) == ["Company 0", "Company 2", "Company 3"]
+    # The shifted rows still line up with the sheet: deleting and appending keep working incrementally
+    assert store.delete("hash3", sheet)
+    assert [row[7] for row in sheet.rows[1:]] == ["hash0", "hash2"]
+    sheet.rows.append(make_row(7))
+    store.invalidate()
+    store.refresh(sheet)
+    assert companies(store) == ["Company 0", "Company 2", "Company 7"]
+    assert not store.delete("missing", sheet)
+
+
+def test_background_full_sync_does_not_block_refresh(tmp_path):
+    sheet = FakeWorksheet([HEADER] + [make_row(i) for i in range(3)])
+    store = make_store(tmp_path, full_sync_seconds=0)
+    store.refresh(sheet)
+    while store._full_running:
+        time.sleep(0.01)
+
+    sheet.get_values_delay = 1.0
+    sheet.rows.append(make_row(3))
+    store.refresh(sheet)              # Starts a slow full download in the background
+    assert store._full_running
+    done = threading.Event()
+
+    def read():
+        sheet.rows.append(make_row(4))
+        store.refresh(sheet)
+        done.set()
+
+    threading.Thread(target=read, daemon=True).start()
+    assert done.wait(0.5), "refresh waited for the background download"
+    assert companies(store) == ["Company 0", "Company 1", "Company 2", "Company 3", "Company 4"]
+    while store._full_running:
+        time.sleep(0.01)
+    # The index gained rows during the download, so that snapshot was not swapped in
+    assert companies(store) == ["Company 0", "Company 1", "Company 2", "Company 3", "Company 4"]
+
+
+def page_names(store, cursor=None, limit=3, search=""):
+    records, next_cursor = store.user_page("me@example.com", limit, cursor, search=search)
+    return [record.company_name for record in records], next_cursor
+
+
+def test_user_page_walks_forward_and_back(tmp_path):
+    sheet = FakeWorksheet([HEADER] + [make_row(i) for i in range(8)] + [make_row(8, "other@example.com")])
+    store = make_store(tmp_path)
+    store.refresh(sheet)
+
+    # The history page keeps the cursor of every page visited; going back reuses the previous one
+    cursors = [None]
+    pages = []
+    while True:
+        names, cursor = page_names(store, cursors[-1])
+        pages.append(names)
+        if cursor is None:
+            break
+        cursors.append(cursor)
+    assert pages == [["Company 7", "Company 6", "Company 5"], ["Company 4", "Company 3", "Company 2"],
+                     ["Company 1", "Company 0"]]
+    assert page_names(store, cursors[1])[0] == pages[1]
+    assert page_names(store, cursors[0])[0] == pages[0]
+    assert store.user_count("me@example.com") == 8
+    assert store.user_count("me@example.com", limit=5) == 5
+
+
+def test_user_page_with_a_search(tmp_path):
+    sheet = FakeWorksheet([HEADER] + [make_row(i) for i in range(8)])
+    store = make_store(tmp_path)
+    store.refresh(sheet)
+    names, cursor = page_names(store, search=">103")
+    assert names == ["Company 7", "Company 6", "Company 5"]
+    assert page_names(store, cursor, search=">103") == (["Company 4", "Company 3"], None)
+    assert store.user_count("me@example.com", search=">103") == 5
+    assert page_names(store, search="company 2")[0] == ["Company 2"]
+
+
+def test_saved_cursors_survive_a_delete(tmp_path):
+    rows = [make_row(i) for i in range(8)]
+    for row in rows:
+        row[1] = "2025-08-01 10:00"   # Same minute: only the tie-break orders them
+    sheet = FakeWorksheet([HEADER] + rows)
+    store = make_store(tmp_path)
+    store.refresh(sheet)
+    first, cursor = page_names(store)
+    second, _ = page_names(store, cursor)
+    assert (first, second) == (["Company 7", "Company 6", "Company 5"], ["Company 4", "Company 3", "Company 2"])
+
+    # Deleting on page 2 shifts the sheet rows of page 1 but not the page boundary
+    assert store.delete("hash3", sheet)
+    assert page_names(store, cursor)[0] == ["Company 4", "Company 2", "Company 1"]
+    # Going back after the delete shows page 1 unchanged
+    assert page_names(store)[0] == first
+    assert store.delete("hash6", sheet)
+    assert page_names(store)[0] == ["Company 7", "Company 5", "Company 4"]
+    assert page_names(store, cursor)[0] == ["Company 4", "Company 2", "Company 1"]
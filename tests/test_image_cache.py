@@ -0,0 +1,86 @@
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image as PILImage
+
+import image_cache
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def png_bytes(seed):
+    img = PILImage.effect_noise((64, 64), 50 + seed).convert("RGB")
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(image_cache, "_cache_size", {"bytes": None, "limit": None})
+    monkeypatch.setattr(image_cache.requests, "get", lambda url, **kwargs: FakeResponse(png_bytes(len(url))))
+    return tmp_path
+
+
+def test_downloads_do_not_rescan_the_cache(cache_dir, monkeypatch):
+    scans = []
+    scan = image_cache._scan_image_cache
+    monkeypatch.setattr(image_cache, "_scan_image_cache", lambda: scans.append(1) or scan())
+    for i in range(30):
+        assert image_cache.get_cached_image(f"https://example.com/{i}.png")
+    assert len(scans) == 1
+    on_disk = sum(p.stat().st_size for p in cache_dir.glob("*.png"))
+    assert image_cache._cache_size["bytes"] == on_disk
+
+
+def test_eviction_runs_once_over_budget(cache_dir, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_EVICT_GRACE_SECONDS", -1)
+    size = len(png_bytes(0))
+    budget = size * 10
+    monkeypatch.setattr(image_cache, "_cache_grew",
+                        lambda added, max_bytes=budget, grew=image_cache._cache_grew: grew(added, max_bytes))
+    for i in range(25):
+        image_cache.get_cached_image(f"https://example.com/{i}.png")
+    on_disk = sum(p.stat().st_size for p in cache_dir.glob("*.png"))
+    assert on_disk <= budget * 1.1
+    assert image_cache._cache_size["bytes"] == on_disk
+
+
+def wait_built(index, name, url):
+    for _ in range(200):
+        status, data = index.lookup(name, url)
+        if status != "pending":
+            return status, data
+        time.sleep(0.01)
+    return status, data
+
+
+def test_failed_thumbnails_are_retried(monkeypatch):
+    results = [None, b"jpeg"]
+    monkeypatch.setattr(image_cache, "make_thumbnail", lambda url: results.pop(0))
+    index = image_cache.ThumbnailIndex(retry_seconds=0.2)
+    index.rebuild({"Chair": "https://example.com/chair.png"})
+    assert wait_built(index, "Chair", "https://example.com/chair.png") == ("failed", None)
+    time.sleep(0.25)
+    assert wait_built(index, "Chair", "https://example.com/chair.png") == ("ready", b"jpeg")
+
+
+def test_rebuild_drops_failed_thumbnails(monkeypatch):
+    results = [None, b"jpeg"]
+    monkeypatch.setattr(image_cache, "make_thumbnail", lambda url: results.pop(0))
+    index = image_cache.ThumbnailIndex(retry_seconds=3600)
+    index.rebuild({"Chair": "https://example.com/chair.png"})
+    assert wait_built(index, "Chair", "https://example.com/chair.png") == ("failed", None)
+    index.rebuild({"Chair": "https://example.com/chair.png"})
+    assert wait_built(index, "Chair", "https://example.com/chair.png") == ("ready", b"jpeg")
@@ -0,0 +1,39 @@
+import math
+
+from line_grid import apply_changes, grid_changes, grid_frame, same_lines
+
+LINES = [
+    {"idx": 0, "item": "Chair 1", "image": "", "sku": "S1", "description": "d", "price": 100.0,
+     "quantity": 2, "discount": 0.0},
+    {"idx": 3, "item": "Chair 3", "image": "", "sku": "S3", "description": "d", "price": 130.0,
+     "quantity": 1, "discount": 5.0},
+]
+
+
+def test_pending_rows_follow_the_lines_with_negative_idx():
+    frame = grid_frame(LINES, [{"Item": "Bogus", "Qty": 4}, {"Description": "typed first"}])
+    assert list(frame.index) == [0, 3, -1, -2]
+    assert list(frame["Item"]) == ["Chair 1", "Chair 3", "Bogus", ""]
+    assert list(frame["Qty"]) == [2, 1, 4, 1]
+    assert math.isnan(frame.at[-1, "Price"])
+    assert frame.at[-2, "Description"] == "typed first"
+
+
+def test_grid_changes_validates_cells():
+    frame = grid_frame(LINES, [{"Item": "Bogus"}])
+    changes, removed, added = grid_changes(frame, {
+        "edited_rows": {"0": {"Qty": 0, "Price": "abc"}, "2": {"Item": "S7"}},
+        "deleted_rows": [1],
+        "added_rows": [{"Item": " ", "Disc %": 150}, {"SKU": "ignored"}],
+    })
+    assert changes == {0: {"Qty": 1}, -1: {"Item": "S7"}}
+    assert removed == [3]
+    assert added == [{"Disc %": 100.0}, {}]
+
+
+def test_apply_changes_matches_a_rebuilt_frame():
+    frame = grid_frame(LINES, [{"Item": "Bogus"}])
+    edited = apply_changes(frame, {0: {"Qty": 5}, -1: {"Item": "Still bogus"}})
+    lines = [dict(LINES[0], quantity=5), LINES[1]]
+    assert same_lines(edited, grid_frame(lines, [{"Item": "Still bogus"}]))
+    assert not same_lines(edited, frame)
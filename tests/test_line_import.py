@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from catalog import Catalog, normalize_catalog
+from line_import import import_lines, iter_rows
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    df = pd.DataFrame({
+        "Item Name": ["Chair Pro", "Meeting Table", "Desk", "ft-003"],
+        "SKU": ["FT-001", 1002.0, "FT-003", "X-9"],
+        "Selling Price": ["1,250.00 EGP", 9800, "700", "10"],
+    })
+    return Catalog(normalize_catalog(df))
+
+
+def csv_rows(text, filename="lines.csv"):
+    return list(iter_rows(text.encode("utf-8"), filename))
+
+
+def test_iter_rows_reads_csv_with_any_delimiter():
+    assert csv_rows("﻿SKU;Qty\nFT-001;2\n") == [["SKU", "Qty"], ["FT-001", "2"]]
+    assert csv_rows("SKU,Qty\n FT-001 , 2\n") == [["SKU", "Qty"], ["FT-001", "2"]]
+    with pytest.raises(ValueError):
+        csv_rows("SKU\n", "lines.pdf")
+
+
+def test_header_columns_in_any_order(catalog):
+    rows = csv_rows("Discount %,Unit Price,Qty,Item Code\n5,1200,3,FT-001\n,,1,1002\n")
+    result = import_lines(rows, catalog.resolve)
+    assert result.lines == [{"item": "Chair Pro", "quantity": 3, "price": 1200.0, "discount": 5.0},
+                            {"item": "Meeting Table", "quantity": 1}]
+    assert (result.rows, result.unknown, result.invalid) == (2, [], [])
+
+
+def test_arabic_header_and_name_column(catalog):
+    rows = [["المنتج", "الكمية"], ["meeting table", "2"]]
+    assert import_lines(rows, catalog.resolve).lines == [{"item": "Meeting Table", "quantity": 2}]
+
+
+def test_no_header_uses_positional_columns(catalog):
+    rows = csv_rows("FT-001,2,1100,10,Black frame\nFT-003,1\n")
+    result = import_lines(rows, catalog.resolve)
+    assert result.lines == [
+        {"item": "Chair Pro", "quantity": 2, "price": 1100.0, "discount": 10.0, "description": "Black frame"},
+        {"item": "Desk", "quantity": 1},
+    ]
+
+
+def test_sku_and_name_matching(catalog):
+    rows = [["SKU", "Item", "Qty"],
+            ["ft-001", "", "1"],              # SKUs are case-insensitive
+            ["", "chair pro", "1"],           # No SKU: the product name is used
+            ["FT-003", "", "1"],              # A SKU beats a product named like it in another case
+            ["ft-003", "", "1"],              # An exact product name beats a SKU
+            ["X-9", "Desk", "1"],             # The SKU column wins over the name column
+            ["Nope", "Desk", "1"]]            # An unknown SKU falls back to the name
+    result = import_lines(rows, catalog.resolve)
+    assert [line["item"] for line in result.lines] == ["Chair Pro", "Chair Pro", "Desk", "ft-003", "ft-003",
+                                                       "Desk"]
+
+
+def test_unknown_and_invalid_rows_keep_their_row_numbers(catalog):
+    rows = [["SKU", "Qty", "Price"],
+            ["FT-001", "2", ""],
+            ["", "", ""],
+            ["FT-999", "1", ""],
+            ["FT-001", "0", ""],
+            ["FT-001", "1.5", ""],
+            ["FT-001", "two", ""],
+            ["", "3", "10"]]
+    result = import_lines(rows, catalog.resolve)
+    assert result.lines == [{"item": "Chair Pro", "quantity": 2}]
+    assert result.unknown == [(4, "FT-999")]
+    assert [number for number, _ in result.invalid] == [5, 6, 7, 8]
+    assert result.rows == 6
+
+
+def test_max_lines_truncates(catalog):
+    rows = [["SKU"]] + [["FT-001"]] * 5
+    result = import_lines(rows, catalog.resolve, max_lines=3)
+    assert len(result.lines) == 3
+    assert result.truncated
@@ -0,0 +1,56 @@
+import os
+
+import pdf_cache
+from pdf_cache import PDFCache
+
+
+def pdf(size, fill=b"x"):
+    return fill * size
+
+
+def disk_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".pdf"))
+
+
+def test_disk_tier_serves_pdfs_evicted_from_memory(tmp_path):
+    cache = PDFCache(max_bytes=150, disk_dir=str(tmp_path), disk_max_bytes=10_000)
+    cache.put("a", pdf(100, b"a"))
+    cache.put("b", pdf(100, b"b"))          # Pushes "a" out of memory
+    assert cache.stats()["entries"] == 1
+    assert cache.get("a") == pdf(100, b"a")
+    # A new process reads the same directory
+    assert PDFCache(disk_dir=str(tmp_path)).get("b") == pdf(100, b"b")
+    assert PDFCache(disk_dir=str(tmp_path)).get("missing") is None
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = PDFCache(max_bytes=10_000, disk_dir=str(tmp_path), disk_max_bytes=250)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(key, pdf(100))
+        os.utime(tmp_path / f"{key}.pdf", (1000 + i, 1000 + i))
+    assert disk_files(tmp_path) == ["b.pdf", "c.pdf"]
+    assert cache._disk_bytes == 200
+    # Rewriting a key replaces its size rather than adding to it
+    cache.put("c", pdf(50))
+    assert cache._disk_bytes == 150
+
+
+def test_put_does_not_scan_the_directory_while_under_budget(tmp_path, monkeypatch):
+    cache = PDFCache(max_bytes=10_000, disk_dir=str(tmp_path), disk_max_bytes=10_000)
+    cache.put("first", pdf(10))
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(pdf_cache.os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+    for i in range(20):
+        cache.put(f"k{i}", pdf(10))
+    assert scans == []
+
+
+def test_files_removed_during_a_scan_are_skipped(tmp_path):
+    cache = PDFCache(max_bytes=10_000, disk_dir=str(tmp_path), disk_max_bytes=150)
+    # Listed by scandir but gone by the time it is stat()ed, like a file another process deleted
+    os.symlink(tmp_path / "deleted.pdf", tmp_path / "gone.pdf")
+    cache.put("a", pdf(100))
+    cache.put("b", pdf(100))
+    assert cache.get("b") == pdf(100)
+    assert cache._disk_bytes <= 150
@@ -0,0 +1,124 @@
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from pricing import _div_round, format_money, money, price_lines, price_quotation, to_piasters
+from quotation import LineItem
+
+
+def old_totals(lines, overall_discount=0.0, shipping_fee=0.0, installation_fee=0.0, vat_rate=0.14):
+    """The float arithmetic the editor used before the pricing engine (lines are (qty, price, discount))."""
+    total_sum, has_discount = 0.0, False
+    for qty, price, discount in lines:
+        valid_discount = 0.0 if discount > 20 else discount
+        has_discount = has_discount or valid_discount > 0
+        total_sum += price * (1 - valid_discount / 100) * qty
+    final_total = total_sum if has_discount else total_sum * (1 - overall_discount / 100)
+    vat = (final_total + shipping_fee) * vat_rate
+    return {"subtotal_after": total_sum, "final_total": final_total, "vat": vat,
+            "grand_total": final_total + shipping_fee + installation_fee + vat}
+
+
+def _cents(value, step=Decimal("0.01")):
+    return Decimal(str(value)).quantize(step, rounding=ROUND_HALF_UP)
+
+
+def decimal_totals(lines, overall_discount=0.0, shipping_fee=0.0, installation_fee=0.0, vat_rate=0.14):
+    """Exact reference in Decimal: every line total and quotation figure rounded half up to the piaster once."""
+    subtotal, has_discount = Decimal(0), False
+    for qty, price, discount in lines:
+        discount = _cents(discount) if 0 < discount <= 20 else Decimal(0)
+        has_discount = has_discount or discount > 0
+        subtotal += _cents(_cents(price) * qty * (100 - discount) / 100)
+    final_total = subtotal
+    if not has_discount and overall_discount > 0:
+        final_total -= _cents(subtotal * _cents(overall_discount) / 100)
+    shipping = _cents(shipping_fee)
+    vat = _cents((final_total + shipping) * _cents(vat_rate * 100) / 100)
+    return {"subtotal_after": float(subtotal), "final_total": float(final_total), "vat": float(vat),
+            "grand_total": float(final_total + shipping + _cents(installation_fee) + vat)}
+
+
+def new_totals(lines, **kwargs):
+    totals = price_lines(*zip(*lines)).apply(**kwargs)
+    return {name: money(getattr(totals, name)) for name in ("subtotal_after", "final_total", "vat", "grand_total")}
+
+
+def test_to_piasters_rounds_half_up():
+    assert to_piasters(2.675) == 268          # 267.49999... as a float
+    assert to_piasters(0.005) == 1
+    assert to_piasters(-2.675) == -268
+    assert to_piasters(1.004) == 100
+    assert list(to_piasters([0.125, 0.135, 10])) == [13, 14, 1000]
+
+
+def test_div_round_rounds_half_up():
+    assert _div_round(5, 10) == 1
+    assert _div_round(4, 10) == 0
+    assert _div_round(15, 10) == 2
+    assert _div_round(25, 10) == 3            # Not banker's rounding
+    assert list(_div_round(np.array([5, 14, 15]), 10)) == [1, 1, 2]
+
+
+def test_line_total_rounds_once_to_piasters():
+    totals = price_quotation([LineItem("Desk", quantity=3, price=12.35, discount=10)])
+    assert int(totals.unit_net[0]) == 1112    # 11.115 rounds up, for display only
+    assert int(totals.line_totals[0]) == 3335   # 33.345, not 3 x 11.12
+    assert format_money(totals.line_totals[0]) == "33.35"
+    assert totals.item_discount == 3705 - 3335
+
+
+def test_rounding_does_not_grow_with_quantity():
+    totals = price_quotation([LineItem("x", quantity=1000, price=10.01, discount=15)])
+    assert format_money(totals.line_totals[0]) == "8508.50"
+
+
+def test_totals_match_the_old_float_results():
+    lines = [(2, 1250.0, 10.0), (1, 899.5, 0.0), (4, 45.0, 5.0)]
+    for kwargs in ({}, {"shipping_fee": 150.0, "installation_fee": 300.0}, {"vat_rate": 0.0}):
+        old = old_totals(lines, **kwargs)
+        assert new_totals(lines, **kwargs) == {name: round(value, 2) for name, value in old.items()}
+
+
+def test_overall_discount_matches_the_old_float_results():
+    lines = [(2, 1250.0, 0.0), (3, 333.33, 0.0)]
+    old = old_totals(lines, overall_discount=12.5, shipping_fee=99.99, installation_fee=50.0)
+    new = new_totals(lines, overall_discount=12.5, shipping_fee=99.99, installation_fee=50.0)
+    assert new == {name: round(value, 2) for name, value in old.items()}
+
+
+def test_random_quotations_match_the_decimal_reference_exactly():
+    rnd = random.Random(17)
+    for _ in range(500):
+        lines = [(rnd.randint(1, 5000), round(rnd.uniform(0.01, 20_000), 2),
+                  rnd.choice([0, 0, 5, 7.5, 12, 12.35, 20, 25]))
+                 for _ in range(rnd.randint(1, 30))]
+        kwargs = {"overall_discount": rnd.choice([0.0, 3.0, 17.3]), "shipping_fee": rnd.choice([0.0, 250.0, 99.99]),
+                  "installation_fee": 100.0, "vat_rate": rnd.choice([0.14, 0.0, 0.05])}
+        assert new_totals(lines, **kwargs) == decimal_totals(lines, **kwargs), (lines, kwargs)
+
+
+def test_discount_rules():
+    # Line discounts above the limit are ignored, and any line discount switches the overall one off
+    totals = price_quotation([LineItem("A", quantity=1, price=100.0, discount=25),
+                              LineItem("B", quantity=1, price=100.0, discount=10)], overall_discount=50)
+    assert totals.line_totals.tolist() == [10000, 9000]
+    assert (totals.overall_discount, totals.overall_discount_amount) == (0.0, 0)
+    assert totals.final_total == 19000
+
+
+def test_vat_is_charged_on_goods_and_shipping_only():
+    totals = price_quotation([LineItem("A", quantity=1, price=1000.0)], shipping_fee=100.0,
+                             installation_fee=500.0, vat_rate=0.14)
+    assert totals.vat == 15400
+    assert totals.grand_total == 100000 + 10000 + 50000 + 15400
+
+
+def test_final_total_sets_the_overall_discount():
+    lines = price_lines([2], [500.0], [0.0])
+    totals = lines.apply(final_total=900.0)
+    assert totals.overall_discount_amount == 10000
+    assert totals.overall_discount == 10.0
+    # A one-piaster gap is rounding, not a discount
+    assert lines.apply(final_total=999.99).overall_discount_amount == 0
@@ -0,0 +1,49 @@
+import math
+
+import numpy as np
+
+from quotation import canonical_value, quotation_hash
+
+ITEMS = [{"Item": "Chair", "Quantity": 2, "Price per item": 1250.0, "Discount %": 0}]
+DETAILS = {"company_name": "Acme", "contact_person": "Mona", "shipping_fee": 0.0,
+           "current_date": "Monday, August 25, 2025", "valid_till": "Thursday, September 04, 2025"}
+
+
+def test_canonical_value_ignores_key_order():
+    assert canonical_value({"a": 1, "b": [1, 2]}) == canonical_value({"b": [1, 2], "a": 1})
+
+
+def test_canonical_value_numbers():
+    assert canonical_value(2) == canonical_value(2.0) == canonical_value(np.int64(2)) == "2"
+    assert canonical_value(0.1 + 0.2) == canonical_value(0.3) == "0.3"
+    assert canonical_value(-0.0) == "0"
+
+
+def test_canonical_value_nan_and_blank_text():
+    assert canonical_value(math.nan) is None
+    assert canonical_value(np.float64("nan")) is None
+    assert canonical_value("nan") is None
+    assert canonical_value("  Chair ") == "Chair"
+
+
+def test_quotation_hash_is_stable_across_key_order_and_number_forms():
+    reordered = [{"Discount %": 0.0, "Price per item": 1250, "Quantity": 2.0, "Item": "Chair"}]
+    details = dict(reversed(list(DETAILS.items())))
+    assert quotation_hash(ITEMS, 2500, DETAILS) == quotation_hash(reordered, 2500.0, details)
+
+
+def test_quotation_hash_ignores_printed_dates():
+    later = dict(DETAILS, current_date="Tuesday, August 26, 2025", valid_till="Friday, September 05, 2025")
+    assert quotation_hash(ITEMS, 2500, DETAILS) == quotation_hash(ITEMS, 2500, later)
+
+
+def test_quotation_hash_changes_with_content():
+    more = [dict(ITEMS[0], Quantity=3)]
+    assert quotation_hash(ITEMS, 2500, DETAILS) != quotation_hash(more, 3750, DETAILS)
+
+
+def test_quotation_hash_depends_on_pdf_kind():
+    financial = quotation_hash(ITEMS, 2500, DETAILS, kind="financial")
+    technical = quotation_hash(ITEMS, 2500, DETAILS, kind="technical")
+    assert financial != technical
+    assert financial == quotation_hash(ITEMS, 2500.0, DETAILS, kind="financial")